@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark for drawing numeric text from the glyph atlas
+
+Draws the clock time, the temperature and the forecast labels with
+draw.text (FreeType rasterizes every glyph on every call) and with
+GlyphAtlas.draw (masks rasterized once, then pasted), after checking
+that both give identical pixels. Also reports the one-off cost of
+building each atlas.
+
+Usage: python3 benchmarks/bench_glyph_atlas.py [--iterations N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from PIL import Image, ImageChops, ImageDraw
+
+from fonts import FontRegistry
+from glyph_atlas import GlyphAtlas
+
+COLOR = (255, 200, 0)
+
+# (name, font variant, size, strings drawn per frame)
+CASES = [
+    ('clock', 'bold', 60, ["12:34"]),
+    ('temperature', 'bold', 50, ["-3.4°C"]),
+    ('forecast', 'regular', 9, ["12°", "9°", "7°", "11°", "06h", "12h", "18h", "00h"]
+     + [f"{h:02d}h" for h in range(0, 24, 2)]
+     + [f"{p}%" for p in range(0, 120, 10)]
+     + [f"{w / 3:.1f}" for w in range(12)]),
+]
+
+
+def timed(func, iterations):
+    func()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=500)
+    iterations = parser.parse_args().iterations
+    registry = FontRegistry()
+    img = Image.new('RGB', (480, 320))
+    draw = ImageDraw.Draw(img)
+
+    print(f"{'case':<12} {'strings':>8} {'build':>10} {'draw.text':>11} {'atlas':>10} "
+          f"{'speedup':>8}")
+    print("-" * 64)
+
+    for name, variant, size, texts in CASES:
+        font = registry.get(variant, size)
+        start = time.perf_counter()
+        atlas = GlyphAtlas(font)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        for text in texts:
+            expected = Image.new('RGB', (300, 100))
+            ImageDraw.Draw(expected).text((10, 10), text, font=font, fill=COLOR)
+            actual = Image.new('RGB', (300, 100))
+            atlas.draw(actual, (10, 10), text, COLOR)
+            if ImageChops.difference(expected, actual).getbbox() is not None:
+                print(f"ERROR: atlas output differs from draw.text for {text!r} ({name})")
+                sys.exit(1)
+
+        def with_draw_text():
+            for text in texts:
+                draw.text((10, 10), text, font=font, fill=COLOR)
+
+        def with_atlas():
+            for text in texts:
+                atlas.draw(img, (10, 10), text, COLOR)
+
+        text_ms = timed(with_draw_text, iterations)
+        atlas_ms = timed(with_atlas, iterations)
+        print(f"{name:<12} {len(texts):>8} {build_ms:>8.3f}ms {text_ms:>9.3f}ms "
+              f"{atlas_ms:>8.3f}ms {text_ms / atlas_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
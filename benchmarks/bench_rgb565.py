@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for RGB888 -> RGB565 packing of a 480x320 frame
+
+Compares a per-pixel Python loop, Image.tobytes + struct packing and the
+preallocated pixel_format.RGB565Packer (numpy or PIL fallback path).
+
+Usage: python3 benchmarks/bench_rgb565.py [--iterations N]
+"""
+
+import argparse
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from PIL import Image, ImageDraw
+
+import pixel_format
+
+WIDTH = 480
+HEIGHT = 320
+
+
+def make_frame():
+    """Build a frame with gradients and text so packing is not trivially uniform"""
+    img = Image.new('RGB', (WIDTH, HEIGHT))
+    draw = ImageDraw.Draw(img)
+    for x in range(WIDTH):
+        draw.line([(x, 0), (x, HEIGHT // 2)], fill=(x * 255 // WIDTH, 128, 255 - x * 255 // WIDTH))
+    draw.rectangle([0, HEIGHT // 2, WIDTH, HEIGHT], fill=(26, 26, 46))
+    draw.text((20, HEIGHT // 2 + 40), "12:34  -3.5°C", fill=(234, 234, 234))
+    return img
+
+
+def pack_per_pixel(img):
+    """Reference: one Python call per pixel"""
+    out = bytearray(WIDTH * HEIGHT * 2)
+    pixels = img.load()
+    i = 0
+    for y in range(HEIGHT):
+        for x in range(WIDTH):
+            r, g, b = pixels[x, y]
+            value = ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+            out[i] = value & 0xFF
+            out[i + 1] = value >> 8
+            i += 2
+    return out
+
+
+def pack_tobytes_struct(img):
+    """Image.tobytes then pack every pixel with struct"""
+    raw = img.tobytes()
+    values = [((raw[i] & 0xF8) << 8) | ((raw[i + 1] & 0xFC) << 3) | (raw[i + 2] >> 3)
+              for i in range(0, len(raw), 3)]
+    return struct.pack(f'<{len(values)}H', *values)
+
+
+def bench(name, func, img, iterations):
+    func(img)  # warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = func(img)
+    elapsed = (time.perf_counter() - start) / iterations
+    print(f"{name:<32} {elapsed * 1000:9.2f} ms/frame")
+    return bytes(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=50)
+    iterations = parser.parse_args().iterations
+    slow_iterations = max(1, iterations // 25)
+    img = make_frame()
+
+    print(f"RGB565 packing, {WIDTH}x{HEIGHT}, numpy: {pixel_format.load_numpy() is not None}")
+    print("-" * 52)
+
+    reference = bench("per-pixel loop", pack_per_pixel, img, slow_iterations)
+    via_struct = bench("tobytes + struct.pack", pack_tobytes_struct, img, slow_iterations)
+
+    packer = pixel_format.RGB565Packer(WIDTH, HEIGHT)
+    packed = bench("RGB565Packer", packer.pack, img, iterations)
+
+    dither_packer = pixel_format.RGB565Packer(WIDTH, HEIGHT, dither=True)
+    bench("RGB565Packer (dither)", dither_packer.pack, img, iterations)
+
+    fallback = packed
+    if pixel_format.np is not None:
+        saved, pixel_format.np = pixel_format.np, None
+        try:
+            pil_packer = pixel_format.RGB565Packer(WIDTH, HEIGHT)
+            fallback = bench("RGB565Packer (PIL fallback)", pil_packer.pack, img, iterations)
+        finally:
+            pixel_format.np = saved
+
+    if not (reference == via_struct == packed == fallback):
+        print("ERROR: packed output differs between implementations")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
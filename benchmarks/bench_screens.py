@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Headless benchmark for the three screen builders and the display path
+
+Loads canned weather (Open-Meteo, or MET Norway with --provider) and
+joke responses from benchmarks/fixtures, then
+times create_display_image, create_advisor_image and create_forecast_image
+both warm (layer and text caches filled, the steady state) and cold
+(caches cleared before every frame, as after a data or theme change).
+The output stage is timed by running display_image against a plain file
+standing in for the framebuffer: full repaints, screen switches (real
+damage), rotation through the frame cache (frames and their packed bytes
+reused) and unchanged frames (skipped). Animation frames (crossfade,
+slide, seconds bar) are timed on their own.
+
+For every case it reports latency percentiles and tracemalloc peak /
+retained bytes per frame (Python objects only; PIL pixel buffers are
+allocated outside tracemalloc), and peak RSS for the whole run.
+Results are written as JSON so runs can be compared across commits.
+
+Usage: python3 benchmarks/bench_screens.py [--iterations N] [--bpp 16|32]
+                                           [--provider open-meteo|met-norway]
+                                           [--output results.json]
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+
+import PIL
+
+import clock_weather_fbi as app
+import pixel_format
+import text_layout
+from animation import SecondsBar, Transition
+from fb_output import FramebufferBackend
+from weather_providers import create_provider
+
+FIXTURES = os.path.join(BENCH_DIR, 'fixtures')
+# Fixed fetch time so 'Updated' labels do not change between runs
+FIXTURE_TIME = time.mktime((2026, 1, 15, 10, 50, 0, 0, 0, -1))
+
+WEATHER_FIXTURES = {
+    'open-meteo': 'weather.json',
+    'met-norway': 'met_norway.json',
+}
+
+
+def load_fixtures(provider_name='open-meteo'):
+    """Publish the canned weather, advice and joke snapshots to the app"""
+    with open(os.path.join(FIXTURES, WEATHER_FIXTURES[provider_name]), encoding='utf-8') as f:
+        weather = json.load(f)
+    with open(os.path.join(FIXTURES, 'joke.json'), encoding='utf-8') as f:
+        joke = json.load(f)
+
+    provider = create_provider(provider_name, None, None)
+    report = provider.parse(weather, app.HOME, FIXTURE_TIME)
+    # Forecast windows start at the current hour; move the fixture's time
+    # axis so that hour is the one FIXTURE_TIME falls in
+    shift = int(time.time() - FIXTURE_TIME) // 3600 * 3600
+    report = report._replace(hourly={**report.hourly,
+                                     'time': [t + shift for t in report.hourly['time']]})
+    app.weather_data = app.parse_weather(report)
+    app.clothing_advice = app.build_clothing_advice(app.weather_data)
+    app.joke_data = app.parse_joke(joke, FIXTURE_TIME)
+
+
+def clear_caches():
+    app.layers.clear()
+    text_layout.cache_clear()
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples_ns):
+    samples = sorted(ns / 1e6 for ns in samples_ns)
+    return {
+        'frames': len(samples),
+        'mean_ms': round(sum(samples) / len(samples), 3),
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p90_ms': round(percentile(samples, 90), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+        'max_ms': round(samples[-1], 3),
+    }
+
+
+def measure_allocations(func, iterations, setup=None):
+    """tracemalloc peak and retained bytes per frame"""
+    func()  # keep first-use allocations out of the numbers
+    tracemalloc.start()
+    try:
+        peaks = []
+        baseline = tracemalloc.get_traced_memory()[0]
+        for _ in range(iterations):
+            if setup:
+                setup()
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            func()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'peak_bytes_per_frame': max(peaks),
+        'retained_bytes': retained,
+    }
+
+
+def run_case(func, iterations, setup=None):
+    """Time func() iterations times after a warm-up, then measure its allocations"""
+    if setup:
+        setup()
+    func()
+
+    samples = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter_ns()
+        func()
+        samples.append(time.perf_counter_ns() - start)
+
+    result = summarize(samples)
+    result.update(measure_allocations(func, max(1, iterations // 10), setup))
+    return result
+
+
+def bench_screens(iterations):
+    results = {}
+    for name, _, create_image, _ in app.SCREENS:
+        results[f"{name}/warm"] = run_case(create_image, iterations)
+        results[f"{name}/cold"] = run_case(create_image, iterations, setup=clear_caches)
+    return results
+
+
+def bench_output(iterations, bits_per_pixel):
+    """Time display_image against a file-backed fake framebuffer"""
+    frames = [create_image() for _, _, create_image, _ in app.SCREENS]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        device = os.path.join(tmp, 'fb')
+        open(device, 'wb').close()
+        backend = FramebufferBackend(device, app.SCREEN_WIDTH,
+                                     app.SCREEN_HEIGHT, bits_per_pixel,
+                                     dither=app.FRAMEBUFFER_DITHER, frame_store=app.frames)
+        backend.open()
+        app.display_backend = backend
+        try:
+            cycle = itertools.count()
+
+            def full_repaint():
+                app.damage_tracker.reset()
+                app.display_image(frames[0])
+
+            def switch_screen():
+                app.display_image(frames[next(cycle) % len(frames)])
+
+            def rotate_cached():
+                app.current_screen = next(cycle) % len(app.SCREENS)
+                app.request_render()
+                app.render_current_screen()
+
+            def unchanged():
+                app.display_image(frames[0])
+
+            def prime_unchanged():
+                app.damage_tracker.update(frames[0])
+
+            results = {
+                'display/full': run_case(full_repaint, iterations),
+                'display/switch': run_case(switch_screen, iterations),
+                'display/cached': run_case(rotate_cached, iterations),
+                'display/unchanged': run_case(unchanged, iterations, setup=prime_unchanged),
+            }
+        finally:
+            app.display_backend = None
+            backend.close()
+
+    return results
+
+
+def bench_animation(iterations):
+    """Time one transition frame of each kind and a seconds-bar frame"""
+    start, end = app.SCREENS[0][2](), app.SCREENS[1][2]()
+    results = {}
+    for kind in ('crossfade', 'slide'):
+        transition = Transition(kind, start, end)
+        progress = itertools.cycle([i / 10 for i in range(1, 10)])
+        results[f"animate/{kind}"] = run_case(lambda: transition.frame(next(progress)), iterations)
+
+    bar = SecondsBar((0, app.SCREEN_HEIGHT - 3, app.SCREEN_WIDTH, app.SCREEN_HEIGHT),
+                     app.ACCENT_COLOR)
+    results['animate/seconds'] = run_case(lambda: bar.frame(start, time.time()), iterations)
+    return results
+
+
+def default_output(tool):
+    """Results file for tool unless --output says otherwise, outside the work tree"""
+    return os.path.join(tempfile.gettempdir(), f"{tool}.json")
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--bpp', type=int, choices=(16, 32), default=16)
+    parser.add_argument('--provider', choices=sorted(WEATHER_FIXTURES), default='open-meteo')
+    parser.add_argument('--output', default=default_output('bench_screens'),
+                        help='results file (default: %(default)s)')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    app.fonts.preload(app.SCREEN_FONTS)
+    load_fixtures(args.provider)
+
+    cases = bench_screens(args.iterations)
+    cases.update(bench_output(args.iterations, args.bpp))
+    cases.update(bench_animation(args.iterations))
+
+    report = {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'iterations': args.iterations,
+        'bits_per_pixel': args.bpp,
+        'provider': args.provider,
+        'python': platform.python_version(),
+        'pillow': PIL.__version__,
+        'numpy': pixel_format.load_numpy() is not None,
+        'machine': platform.machine(),
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'cases': cases,
+    }
+
+    print(f"Screens {app.SCREEN_WIDTH}x{app.SCREEN_HEIGHT}, {args.iterations} frames, "
+          f"{args.bpp} bpp, numpy: {report['numpy']}")
+    print(f"{'case':<20} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8} {'peak KB':>9}")
+    print("-" * 66)
+    for name, case in cases.items():
+        print(f"{name:<20} {case['p50_ms']:8.2f} {case['p90_ms']:8.2f} {case['p99_ms']:8.2f} "
+              f"{case['max_ms']:8.2f} {case['peak_bytes_per_frame'] / 1024:9.1f}")
+    print(f"peak RSS: {report['peak_rss_kb'] / 1024:.1f} MB")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark for word wrapping long advice and joke strings
+
+Compares the old per-screen wrap loop (draw.textbbox on every growing
+prefix, repeated every frame) with text_layout.wrap() cold (caches
+cleared before each call) and warm (the steady state between data
+refreshes).
+
+Usage: python3 benchmarks/bench_text_layout.py [--iterations N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from PIL import Image, ImageDraw
+
+import text_layout
+from fonts import FontRegistry
+
+WRAP_WIDTH = 440
+
+TEXTS = {
+    'advice': ("Winter coat • Raincoat + umbrella • Windproof layer • "
+               "Layers for temp changes • Waterproof boots and a warm hat"),
+    'reason': "Because: Cold weather (2°C) • 85% rain chance • Windy (12.4 m/s)",
+    'long joke': ("A meteorologist, a physicist and a programmer are stuck on a "
+                  "Rogaland ferry in a storm. The meteorologist says the low "
+                  "pressure will pass by noon, the physicist calculates the "
+                  "wave period, and the programmer asks whether anyone has "
+                  "tried turning the weather off and on again. " * 3),
+}
+
+
+def legacy_wrap(draw, text, font, max_width):
+    """The wrap loop create_advisor_image used before text_layout"""
+    words = text.split()
+    lines = []
+    current_line = []
+    for word in words:
+        test_line = ' '.join(current_line + [word])
+        bbox = draw.textbbox((0, 0), test_line, font=font)
+        if bbox[2] - bbox[0] > max_width:
+            if current_line:
+                lines.append(' '.join(current_line))
+                current_line = [word]
+            else:
+                lines.append(word)
+        else:
+            current_line.append(word)
+    if current_line:
+        lines.append(' '.join(current_line))
+    return lines
+
+
+def timed(func, iterations):
+    func()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    iterations = parser.parse_args().iterations
+    font = FontRegistry().get('regular', 14)
+    draw = ImageDraw.Draw(Image.new('RGB', (480, 320)))
+
+    print(f"{'text':<12} {'chars':>6} {'lines':>6} {'legacy':>10} {'cold':>10} {'warm':>10}")
+    print("-" * 58)
+
+    for name, text in TEXTS.items():
+        expected = legacy_wrap(draw, text, font, WRAP_WIDTH)
+        lines = [box.text for box in text_layout.wrap(text, font, WRAP_WIDTH)]
+        if lines != expected:
+            print(f"ERROR: wrap() output differs from legacy wrap for '{name}'")
+            sys.exit(1)
+
+        legacy_ms = timed(lambda: legacy_wrap(draw, text, font, WRAP_WIDTH), iterations)
+
+        def cold():
+            text_layout.cache_clear()
+            text_layout.wrap(text, font, WRAP_WIDTH)
+
+        cold_ms = timed(cold, iterations)
+        warm_ms = timed(lambda: text_layout.wrap(text, font, WRAP_WIDTH), iterations)
+
+        print(f"{name:<12} {len(text):>6} {len(lines):>6} "
+              f"{legacy_ms:>8.3f}ms {cold_ms:>8.3f}ms {warm_ms:>8.4f}ms")
+
+    print()
+    print(text_layout.cache_info())
+
+
+if __name__ == '__main__':
+    main()
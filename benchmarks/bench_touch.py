@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Touch-to-frame latency through the real display loop
+
+Replays touch input through TouchReader into the app's scheduler and
+display loop, against a plain file standing in for the framebuffer, and
+reports the time from each recognized gesture to its first frame on
+screen (the app's touch_to_frame metric), plus how many gestures were
+recognized as what.
+
+By default a scripted session of taps and swipes is generated; --replay
+plays a raw recording instead (`cat /dev/input/event0 > touches.bin` on
+the Pi, then the same --calibration the app uses).
+
+Usage: python3 benchmarks/bench_touch.py [--replay FILE] [--speed N]
+                                         [--transition none|crossfade|slide]
+                                         [--output results.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+import clock_weather_fbi as app
+from bench_screens import default_output, git_revision, load_fixtures, percentile
+from fb_output import FramebufferBackend
+from touch import (BTN_TOUCH, DEFAULT_CALIBRATION, EV_ABS, EV_KEY, EV_SYN, ABS_X, ABS_Y,
+                   SYN_REPORT, Calibration, TouchReader, write_events)
+
+# (start x, start y, end x, end y, seconds held), one every GESTURE_GAP
+SCRIPT = [
+    (400, 160, 400, 160, 0.08),   # tap right: next
+    (400, 160, 402, 161, 0.10),   # tap right: next
+    (80, 160, 80, 160, 0.08),     # tap left: previous
+    (380, 150, 120, 155, 0.25),   # swipe left: next
+    (100, 170, 360, 160, 0.25),   # swipe right: previous
+    (420, 200, 419, 198, 0.12),   # tap right: next
+]
+GESTURE_GAP = 0.6
+SAMPLE_INTERVAL = 0.01  # panel report rate while touching
+
+
+def to_raw(calibration, x, y):
+    """Inverse of Calibration.to_screen (without swap_xy)"""
+    (x_min, x_max), (y_min, y_max) = calibration.x_range, calibration.y_range
+    return (round(x_min + x * (x_max - x_min) / (calibration.width - 1)),
+            round(y_min + y * (y_max - y_min) / (calibration.height - 1)))
+
+
+def scripted_events(calibration, repeat):
+    """Raw (seconds, type, code, value) events for SCRIPT, repeat times over"""
+    events = []
+    t = 1000.0
+    for _ in range(repeat):
+        for x0, y0, x1, y1, held in SCRIPT:
+            steps = max(1, round(held / SAMPLE_INTERVAL))
+            for step in range(steps + 1):
+                x = x0 + (x1 - x0) * step / steps
+                y = y0 + (y1 - y0) * step / steps
+                raw_x, raw_y = to_raw(calibration, x, y)
+                if step == 0:
+                    events.append((t, EV_KEY, BTN_TOUCH, 1))
+                events.append((t, EV_ABS, ABS_X, raw_x))
+                events.append((t, EV_ABS, ABS_Y, raw_y))
+                events.append((t, EV_SYN, SYN_REPORT, 0))
+                t += SAMPLE_INTERVAL
+            events.append((t, EV_KEY, BTN_TOUCH, 0))
+            events.append((t, EV_SYN, SYN_REPORT, 0))
+            t += GESTURE_GAP
+    return events
+
+
+def run_session(path, calibration, speed):
+    """Drive the display loop while path is replayed; returns latencies and gesture counts"""
+    latencies = []
+    kinds = {}
+    original_note = app.note_touch_latency
+
+    def note_touch_latency():
+        if app.touch_received is not None:
+            latencies.append(time.time() - app.touch_received)
+        original_note()
+
+    def on_gesture(gesture):
+        kinds[gesture.kind] = kinds.get(gesture.kind, 0) + 1
+        app.scheduler.post('touch', lambda: app.on_gesture(gesture))
+
+    def tick():
+        app.scheduler.call_later(0.1, 'bench-tick', tick)
+
+    app.note_touch_latency = note_touch_latency
+    reader = TouchReader(path, calibration, on_gesture, replay_speed=speed)
+    try:
+        app.current_screen = 0
+        app.request_render()
+        tick()
+        reader.start()
+        while reader.thread.is_alive() or app.transition is not None:
+            app.render_current_screen()
+            app.scheduler.run_once()
+        app.render_current_screen()
+    finally:
+        reader.stop()
+        app.note_touch_latency = original_note
+    return latencies, kinds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--replay', help='raw input_event recording to play back')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay speed factor')
+    parser.add_argument('--repeat', type=int, default=5, help='times to run the scripted session')
+    parser.add_argument('--calibration', default=DEFAULT_CALIBRATION)
+    parser.add_argument('--transition', choices=('none', 'crossfade', 'slide'), default='none')
+    parser.add_argument('--output', default=default_output('bench_touch'),
+                        help='results file (default: %(default)s)')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    app.fonts.preload(app.SCREEN_FONTS)
+    load_fixtures()
+    app.SCREEN_TRANSITION = args.transition
+    calibration = Calibration.parse(args.calibration, app.SCREEN_WIDTH, app.SCREEN_HEIGHT)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.replay
+        if path is None:
+            path = os.path.join(tmp, 'touches.bin')
+            write_events(path, scripted_events(calibration, args.repeat))
+
+        device = os.path.join(tmp, 'fb')
+        open(device, 'wb').close()
+        backend = FramebufferBackend(device, app.SCREEN_WIDTH, app.SCREEN_HEIGHT, 16)
+        backend.open()
+        app.display_backend = backend
+        try:
+            latencies, kinds = run_session(path, calibration, args.speed)
+        finally:
+            app.display_backend = None
+            backend.close()
+
+    samples = sorted(latency * 1000 for latency in latencies)
+    report = {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'transition': args.transition,
+        'gestures': kinds,
+        'frames': len(samples),
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p90_ms': round(percentile(samples, 90), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+        'max_ms': round(samples[-1], 3) if samples else 0.0,
+        'scheduler_wakeups': app.scheduler.wakeups,
+    }
+
+    print(f"Gestures: {kinds}")
+    print(f"touch-to-frame over {report['frames']} screen changes: "
+          f"p50 {report['p50_ms']:.2f} ms, p90 {report['p90_ms']:.2f} ms, "
+          f"p99 {report['p99_ms']:.2f} ms, max {report['max_ms']:.2f} ms")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Conditional GET and freshness against a local stub server
+
+Serves a weather fixture from a local HTTP server that behaves like the
+real upstreams: gzip when asked, an ETag and Last-Modified on every
+response, Cache-Control: max-age, and 304 Not Modified when the
+client's If-None-Match still matches. conditional_get_json() then runs
+through the refresh cycle with a real requests session and DiskCache:
+
+- cold: 200 with a gzip body -> 'fetched', compressed bytes counted;
+- within max-age: no request at all -> 'fresh', 0 bytes;
+- forced within max-age (a touchscreen refresh): revalidated anyway ->
+  304 -> 'not_modified', 0 bytes;
+- after max-age: revalidated -> 304 -> 'not_modified', 0 bytes;
+- after the server's data changed: 200 -> 'fetched', new payload.
+
+For each step it checks the status, the bytes reported against what
+the server sent, the number of requests the server saw and the
+validators sent. Exits with status 1 if any check failed.
+
+Usage: python3 benchmarks/conditional_fetch.py [--max-age S] [--output results.json]
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+import requests
+
+from bench_screens import FIXTURES, default_output, git_revision
+from data_cache import DiskCache
+from http_fetch import conditional_get_json
+
+
+class StubServer(ThreadingHTTPServer):
+    """Serves one JSON document with validators, max-age and optional gzip"""
+
+    daemon_threads = True
+
+    def __init__(self, payload, max_age):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.max_age = max_age
+        self.requests = []  # (If-None-Match sent, status, body bytes sent)
+        self.lock = threading.Lock()
+        self.version = 0
+        self.publish(payload)
+
+    def publish(self, payload):
+        """Serve a new version of the document"""
+        with self.lock:
+            self.version += 1
+            self.body = json.dumps(payload).encode()
+            self.gzipped = gzip.compress(self.body)
+            self.etag = f'"v{self.version}"'
+            self.last_modified = formatdate(time.time(), usegmt=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/forecast"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            body, gzipped, etag = server.body, server.gzipped, server.etag
+            last_modified = server.last_modified
+        validator = self.headers.get('If-None-Match')
+
+        if validator == etag:
+            status, sent = 304, b''
+        else:
+            status = 200
+            use_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+            sent = gzipped if use_gzip else body
+        # Recorded before answering, so the client never gets ahead of it
+        with server.lock:
+            server.requests.append((validator, status, len(sent)))
+        self.send_response(status)
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        self.send_header('Cache-Control', f"max-age={server.max_age}")
+        if status == 200:
+            self.send_header('Content-Type', 'application/json')
+            if sent is gzipped:
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(sent)))
+        self.end_headers()
+        self.wfile.write(sent)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_step(name, server, session, cache, expected_status, expected_payload, force=False):
+    """One conditional_get_json() call; returns (report, problems)"""
+    seen = len(server.requests)
+    result = conditional_get_json(session, server.url, cache, 'stub-forecast', timeout=5,
+                                  force=force)
+    requests_made = server.requests[seen:]
+    sent = sum(size for _, _, size in requests_made)
+
+    problems = []
+    if result.status != expected_status:
+        problems.append(f"{name}: status {result.status}, expected {expected_status}")
+    if result.payload != expected_payload:
+        problems.append(f"{name}: payload differs from what the server published")
+    if result.bytes_transferred != sent:
+        problems.append(f"{name}: {result.bytes_transferred} bytes reported, server sent {sent}")
+    expected_requests = 0 if expected_status == 'fresh' else 1
+    if len(requests_made) != expected_requests:
+        problems.append(f"{name}: {len(requests_made)} requests, expected {expected_requests}")
+    if expected_status == 'not_modified' and requests_made and requests_made[0][0] != server.etag:
+        problems.append(f"{name}: revalidated with If-None-Match {requests_made[0][0]!r}, "
+                        f"expected {server.etag!r}")
+
+    return {
+        'step': name,
+        'status': result.status,
+        'http_status': requests_made[0][1] if requests_made else None,
+        'requests': len(requests_made),
+        'bytes_transferred': result.bytes_transferred,
+        'bytes_sent': sent,
+        'encoding': result.encoding,
+    }, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--max-age', type=int, default=1,
+                        help='Cache-Control max-age the server sends, seconds')
+    parser.add_argument('--output', default=default_output('conditional_fetch'),
+                        help='results file (default: %(default)s)')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    with open(os.path.join(FIXTURES, 'met_norway.json'), encoding='utf-8') as f:
+        payload = json.load(f)
+    changed = {**payload, 'type': 'Changed'}
+
+    server = StubServer(payload, args.max_age)
+    threading.Thread(target=server.serve_forever, name='stub-server', daemon=True).start()
+    session = requests.Session()
+    steps, problems = [], []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = DiskCache(tmp)
+            plan = [
+                ('cold', 'fetched', payload, None),
+                ('within max-age', 'fresh', payload, None),
+                ('forced', 'not_modified', payload, 'force'),
+                ('after max-age', 'not_modified', payload, 'expire'),
+                ('data changed', 'fetched', changed, 'change'),
+            ]
+            for name, expected_status, expected_payload, before in plan:
+                if before == 'change':
+                    server.publish(changed)
+                if before in ('expire', 'change'):
+                    time.sleep(args.max_age + 0.2)
+                report, step_problems = run_step(name, server, session, cache,
+                                                 expected_status, expected_payload,
+                                                 force=before == 'force')
+                steps.append(report)
+                problems += step_problems
+    finally:
+        session.close()
+        server.shutdown()
+        server.server_close()
+
+    print(f"Uncompressed body {len(server.body)} bytes")
+    for report in steps:
+        encoding = f" {report['encoding']}" if report['encoding'] else ''
+        print(f"{report['step']:<15} {report['status']:<13} HTTP {report['http_status'] or '-':<4} "
+              f"requests {report['requests']}  bytes {report['bytes_transferred']:6d} "
+              f"(server sent {report['bytes_sent']}){encoding}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'settings': vars(args),
+            'steps': steps,
+            'problems': problems,
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if problems:
+        for problem in problems:
+            print(f"FAIL: {problem}")
+        sys.exit(1)
+    print("PASS")
+
+
+if __name__ == '__main__':
+    main()
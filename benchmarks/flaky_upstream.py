@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Upstream failure policy against a local server that flaps
+
+Starts an HTTP server on localhost that alternates between up (200 with
+a small JSON body) and down (503, or dropping the connection with
+--failure reset) and polls it at a fixed interval through two clients
+built on ResilientSession with the same timings, scaled down to seconds:
+
+- naive: retries every call like the old urllib3 Retry(total=3), no
+  breaker and no retry budget;
+- policy: the app's settings (breaker, budget, backoff with jitter).
+
+For each it reports how many requests reached the server while it was
+down, how calls ended (ok, failed, refused by an open breaker) and how
+long after each recovery the first call succeeded again. It exits with
+status 1 if the policy client missed a recovery or did not send fewer
+requests to the dead server than the naive one.
+
+Usage: python3 benchmarks/flaky_upstream.py [--up S] [--down S] [--cycles N]
+                                            [--interval S] [--failure 503|reset]
+                                            [--verbose] [--output results.json]
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+import requests
+
+from bench_screens import default_output, git_revision
+from http_policy import CircuitOpenError, ResilientSession, RetryBudget
+
+BODY = b'{"setup": "ok", "punchline": "ok"}'
+
+# The app's policy with minutes turned into fractions of a second
+TIMINGS = {
+    'retries': 3,
+    'backoff_base': 0.02,
+    'backoff_cap': 0.16,
+}
+BREAKER = {'failure_threshold': 3, 'reset_timeout': 0.2, 'max_reset_timeout': 1.0}
+
+
+class FlappingServer(ThreadingHTTPServer):
+    """Up for `up` seconds, then down for `down` seconds, repeating"""
+
+    daemon_threads = True
+
+    def __init__(self, up, down, failure):
+        super().__init__(('127.0.0.1', 0), FlappingHandler)
+        self.up = up
+        self.down = down
+        self.failure = failure
+        self.started = time.monotonic()
+        self.hits = {'up': 0, 'down': 0}
+        self.lock = threading.Lock()
+
+    def is_up(self, now=None):
+        now = time.monotonic() if now is None else now
+        return (now - self.started) % (self.up + self.down) < self.up
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/joke"
+
+
+class FlappingHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        up = server.is_up()
+        with server.lock:
+            server.hits['up' if up else 'down'] += 1
+        if up:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY)
+        elif server.failure == 'reset':
+            self.close_connection = True  # no response at all
+        else:
+            self.send_error(503)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_client(kind, session):
+    if kind == 'naive':
+        return ResilientSession(session, budget=RetryBudget(max_tokens=math.inf),
+                                breaker_options={'failure_threshold': math.inf}, **TIMINGS)
+    return ResilientSession(session, breaker_options=BREAKER, **TIMINGS)
+
+
+def run_client(kind, args):
+    """Poll a fresh flapping server for args.cycles periods; returns the report"""
+    server = FlappingServer(args.up, args.down, args.failure)
+    threading.Thread(target=server.serve_forever, name='flaky-server', daemon=True).start()
+    client = make_client(kind, requests.Session())
+    outcomes = {'ok': 0, 'failed': 0, 'refused': 0}
+    recoveries = []  # seconds from each up phase starting to the first success in it
+    period = args.up + args.down
+    end = server.started + args.cycles * period
+    recovered_cycle = -1
+
+    try:
+        while True:
+            now = time.monotonic()
+            if now >= end:
+                break
+            try:
+                response = client.get(server.url, timeout=0.5)
+                response.raise_for_status()
+                response.close()
+                outcomes['ok'] += 1
+                cycle = int((now - server.started) // period)
+                if cycle > recovered_cycle and cycle > 0:
+                    recoveries.append(now - server.started - cycle * period)
+                recovered_cycle = max(recovered_cycle, cycle)
+            except CircuitOpenError:
+                outcomes['refused'] += 1
+            except requests.RequestException:
+                outcomes['failed'] += 1
+            time.sleep(max(0.0, args.interval - (time.monotonic() - now)))
+    finally:
+        server.shutdown()
+        server.server_close()
+        client.close()
+
+    return {
+        'server_hits_up': server.hits['up'],
+        'server_hits_down': server.hits['down'],
+        'calls': outcomes,
+        'recoveries_s': [round(r, 3) for r in recoveries],
+        'missed_recoveries': args.cycles - 1 - len(recoveries),
+        'breaker_opens': sum(b.opens for b in client.breakers.values()),
+        'retry_tokens_left': round(client.budget.tokens, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--up', type=float, default=2.0, help='seconds the server is up per cycle')
+    parser.add_argument('--down', type=float, default=4.0, help='seconds it is down per cycle')
+    parser.add_argument('--cycles', type=int, default=3)
+    parser.add_argument('--interval', type=float, default=0.05, help='seconds between client calls')
+    parser.add_argument('--failure', choices=('503', 'reset'), default='503')
+    parser.add_argument('--verbose', action='store_true', help='show breaker transitions')
+    parser.add_argument('--output', default=default_output('flaky_upstream'),
+                        help='results file (default: %(default)s)')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.CRITICAL)
+
+    results = {}
+    for kind in ('naive', 'policy'):
+        results[kind] = report = run_client(kind, args)
+        recoveries = report['recoveries_s']
+        worst = f"{max(recoveries):.2f}s" if recoveries else "-"
+        print(f"{kind:<7} server hits while down {report['server_hits_down']:5d}, "
+              f"while up {report['server_hits_up']:5d}; calls {report['calls']}; "
+              f"breaker opens {report['breaker_opens']}; slowest recovery {worst}")
+
+    failures = []
+    if results['policy']['missed_recoveries'] > 0:
+        failures.append(f"policy client missed {results['policy']['missed_recoveries']} recoveries")
+    if results['policy']['server_hits_down'] >= results['naive']['server_hits_down']:
+        failures.append("policy client did not spare the dead server")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'settings': vars(args),
+            'results': results,
+            'failures': failures,
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print("PASS")
+
+
+if __name__ == '__main__':
+    main()
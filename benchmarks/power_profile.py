@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Quiet-hours power profile at accelerated simulated time
+
+Runs the app's display loop like soak_display.py (simulated clock,
+canned fetches, a plain file as the framebuffer) with quiet hours set
+and the backlight pointed at a fake /sys/class/backlight tree. A touch
+is injected during the quiet hours of every simulated day. The fake
+backlight starts out dimmed, as left by a run that died in quiet mode.
+
+It checks that:
+- the backlight is dimmed in quiet mode and restored in full mode;
+- only the clock screen is shown in quiet mode;
+- no joke is fetched in quiet mode;
+- a touch wakes the display for the wake time.
+
+It then prints average display loop wakeups and CPU seconds per
+simulated hour in each mode (CPU is what the process actually used to
+handle each hour's events). Exits with status 1 if a check failed.
+
+Usage: python3 benchmarks/power_profile.py [--days N] [--quiet-hours HH:MM-HH:MM]
+                                           [--brightness PCT] [--touch-at HH:MM]
+                                           [--seconds] [--output results.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+import clock_weather_fbi as app
+from bench_screens import default_output, git_revision
+from fb_output import FramebufferBackend
+from fetcher import BackgroundFetcher
+from power import MODES, QUIET, QuietHours
+from scheduler import Scheduler
+from soak_display import CannedFetches, SimClock, sim_datetime, wait_for_fetches
+from touch import Gesture
+
+MAX_BRIGHTNESS = 255
+DIMMED_AT_START = 26
+
+
+def fake_backlight(root):
+    """A PiTFT-like backlight under root, left dimmed"""
+    path = os.path.join(root, 'soc:backlight')
+    os.makedirs(path)
+    for attribute, value in (('max_brightness', MAX_BRIGHTNESS),
+                             ('brightness', DIMMED_AT_START), ('bl_power', 0)):
+        with open(os.path.join(path, attribute), 'w') as f:
+            f.write(f"{value}\n")
+    return path
+
+
+def read_attribute(path, attribute):
+    with open(os.path.join(path, attribute)) as f:
+        return int(f.read())
+
+
+def local_time(day_start, hhmm, days=0):
+    hour, minute = (int(part) for part in hhmm.split(':'))
+    when = day_start + timedelta(days=days, hours=hour, minutes=minute)
+    return time.mktime(when.timetuple())
+
+
+def run(args, backlight_path):
+    day_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    clock = SimClock(local_time(day_start, '12:00'))
+    app.time = clock
+    app.datetime = sim_datetime(clock)
+    app.scheduler = Scheduler(clock=clock.time, wall_clock=clock.time)
+    app.fetcher = BackgroundFetcher(app.scheduler)
+    canned = CannedFetches(clock, fail_every=0)
+    app.fetch_weather = canned.fetch_weather
+    joke_fetches = []
+
+    def fetch_joke():
+        joke_fetches.append((clock.now, app.power.mode))
+        return canned.fetch_joke()
+
+    app.fetch_joke = fetch_joke
+    app.SHOW_SECONDS = args.seconds
+    app.QUIET_HOURS = args.quiet_hours
+    app.QUIET_BRIGHTNESS = args.brightness
+    app.BACKLIGHT_DIR = os.path.dirname(backlight_path)
+
+    touches = [local_time(day_start, args.touch_at, days=day + 1) for day in range(int(args.days))]
+    for when in touches:
+        app.scheduler.call_at(when, f"sim-touch-{when}", lambda: app.on_gesture(
+            Gesture('tap', app.SCREEN_WIDTH - 40, 160, 0, 0, 0.1, clock.now)))
+
+    start = clock.now
+    end = start + args.days * 86400
+    app.current_screen = 0
+    app.start_power()
+    app.request_render()
+    app.scheduler.call_later(app.SCREENS[0][1], 'rotate', app.on_rotate)
+    app.schedule_next_minute()
+    app.schedule_next_hour()
+    app.on_weather_due()
+    app.on_joke_due()
+
+    changes = []  # (time, mode, brightness, bl_power) after every mode change
+    problems = []
+    mode = None
+    wall_start = time.perf_counter()
+    while clock.now < end:
+        app.render_current_screen()
+        wait_for_fetches()
+
+        if app.power.mode != mode:
+            mode = app.power.mode
+            changes.append((clock.now, mode, read_attribute(backlight_path, 'brightness'),
+                            read_attribute(backlight_path, 'bl_power')))
+        if mode == QUIET and app.shown_screen not in (0, None):
+            problems.append(f"{datetime.fromtimestamp(clock.now):%a %H:%M} screen "
+                            f"{app.SCREENS[app.shown_screen][0]} shown in quiet mode")
+
+        deadline = app.scheduler.next_deadline()
+        if deadline is not None and deadline > clock.now:
+            clock.now = min(deadline, end)
+        app.scheduler.run_once()
+
+    usage = {m: app.power.per_hour(m, clock.now) for m in MODES}
+    return changes, problems, joke_fetches, touches, usage, time.perf_counter() - wall_start
+
+
+def check(args, changes, joke_fetches, touches):
+    """Problems with backlight levels, wake-ups and joke fetches"""
+    problems = []
+    quiet_hours = QuietHours.parse(args.quiet_hours)
+    dim = max(1, round(args.brightness / 100 * MAX_BRIGHTNESS)) if args.brightness > 0 else 0
+    for when, mode, brightness, bl_power in changes:
+        expected = (dim, 4 if dim == 0 else 0) if mode == QUIET else (MAX_BRIGHTNESS, 0)
+        if (brightness, bl_power) != expected:
+            problems.append(f"{datetime.fromtimestamp(when):%a %H:%M} {mode}: brightness "
+                            f"{brightness}, bl_power {bl_power}, expected {expected}")
+    for when in touches:
+        woke = [c for c in changes if c[1] != QUIET and 0 <= c[0] - when < 1]
+        slept = [c for c in changes if c[1] == QUIET and 0 <= c[0] - when - app.WAKE_TIME < 1]
+        if not woke or not slept:
+            problems.append(f"touch at {datetime.fromtimestamp(when):%a %H:%M} did not wake "
+                            f"the display for {app.WAKE_TIME}s")
+    for when, mode in joke_fetches:
+        if mode == QUIET or quiet_hours.contains(when) and not any(0 <= when - t < app.WAKE_TIME
+                                                                   for t in touches):
+            problems.append(f"joke fetched at {datetime.fromtimestamp(when):%a %H:%M} "
+                            f"in quiet hours")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=float, default=2.0, help='simulated days, from noon')
+    parser.add_argument('--quiet-hours', default='23:00-06:30')
+    parser.add_argument('--brightness', type=int, default=10, help='quiet backlight, percent')
+    parser.add_argument('--touch-at', default='02:00', help='local time of the nightly touch')
+    parser.add_argument('--seconds', action='store_true', help='run the seconds bar in full mode')
+    parser.add_argument('--output', default=default_output('power_profile'),
+                        help='results file (default: %(default)s)')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.CRITICAL)
+    app.fonts.preload(app.SCREEN_FONTS)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backlight_path = fake_backlight(os.path.join(tmp, 'backlight'))
+        device = os.path.join(tmp, 'fb')
+        open(device, 'wb').close()
+        backend = FramebufferBackend(device, app.SCREEN_WIDTH, app.SCREEN_HEIGHT, 16)
+        backend.open()
+        app.display_backend = backend
+        try:
+            changes, problems, joke_fetches, touches, usage, wall = run(args, backlight_path)
+        finally:
+            app.display_backend = None
+            backend.close()
+    problems += check(args, changes, joke_fetches, touches)
+
+    print(f"{args.days:g} simulated days in {wall:.0f}s, quiet hours {args.quiet_hours}, "
+          f"{len(joke_fetches)} joke fetches")
+    for when, mode, brightness, bl_power in changes:
+        print(f"  {datetime.fromtimestamp(when):%a %H:%M}  {mode:<6} brightness {brightness:3d}"
+              f"  bl_power {bl_power}")
+    print(f"{'mode':<6} {'hours':>7} {'wakeups/h':>10} {'CPU s/h':>9}")
+    for mode, (hours, wakeups, cpu) in usage.items():
+        if wakeups is not None:
+            print(f"{mode:<6} {hours:>7.1f} {wakeups:>10.1f} {cpu:>9.3f}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'settings': vars(args),
+            'mode_changes': [{'time': datetime.fromtimestamp(when).isoformat(), 'mode': mode,
+                              'brightness': brightness, 'bl_power': bl_power}
+                             for when, mode, brightness, bl_power in changes],
+            'per_hour': {mode: {'hours': round(hours, 2), 'wakeups': wakeups, 'cpu_seconds': cpu}
+                         for mode, (hours, wakeups, cpu) in usage.items()},
+            'joke_fetches': len(joke_fetches),
+            'problems': problems,
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if problems:
+        for problem in problems:
+            print(f"FAIL: {problem}")
+        sys.exit(1)
+    print("PASS")
+
+
+if __name__ == '__main__':
+    main()
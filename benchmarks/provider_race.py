@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Multi-provider weather refresh against local stub providers
+
+Serves the Open-Meteo and MET Norway fixtures from a local HTTP server,
+with their time axes moved to the current hour, and points three
+providers at it: Open-Meteo, MET Norway and a second MET Norway
+instance. Each path can answer at once, answer slowly, hang until
+released, or answer 503. fetch_reports() (on its own ProviderWorkers)
+and choose_report() then run through these steps:
+
+- race: Open-Meteo answers, MET hangs, the second MET fails -> returns
+  within the grace period with Open-Meteo's report, the failure as an
+  error and the hung provider counted late, not as an error;
+- busy: refreshes while MET still hangs -> MET is refused as still busy
+  and the provider threads stay at one per provider;
+- no answer: every provider hangs or fails -> returns at the deadline
+  with an error for each and no reports;
+- fallback: Open-Meteo fails -> choose_report() uses MET's report;
+- merge: all answer, Open-Meteo fastest but with gaps -> its report is
+  used, with humidity and missing hourly values filled in from MET.
+
+Exits with status 1 if any check failed.
+
+Usage: python3 benchmarks/provider_race.py [--deadline S] [--grace S] [--output results.json]
+"""
+
+import argparse
+import copy
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+import requests
+
+from bench_screens import FIXTURES, WEATHER_FIXTURES, default_output, git_revision
+from data_cache import DiskCache
+from metrics import metrics
+from weather_providers import (Location, MetNorwayProvider, OpenMeteoProvider, ProviderWorkers,
+                               choose_report, fetch_reports)
+
+HOME = Location('Stub', 59.9139, 10.7522)
+SLOW = 0.2  # seconds a 'slow' answer takes
+
+
+class SecondMetProvider(MetNorwayProvider):
+    """Another MET Norway client, so three providers race"""
+
+    name = 'met-norway-2'
+
+
+class StubServer(ThreadingHTTPServer):
+    """Serves a document per path; each path is ok, slow, hang or 503"""
+
+    daemon_threads = True
+
+    def __init__(self, documents):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.documents = documents  # path -> body
+        self.modes = {path: 'ok' for path in documents}
+        self.hits = {path: 0 for path in documents}
+        self.release = threading.Event()  # set to free the hung handlers
+        self.lock = threading.Lock()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+    def set_modes(self, **modes):
+        """Switch paths (given without the slash) to new modes"""
+        if 'hang' not in modes.values():
+            self.release.set()
+        elif self.release.is_set():
+            self.release = threading.Event()
+        for name, mode in modes.items():
+            self.modes[f"/{name}"] = mode
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        path = self.path.split('?')[0]
+        with server.lock:
+            mode = server.modes[path]
+            release = server.release
+            server.hits[path] += 1
+        if mode == 'hang':
+            release.wait()
+            self.close_connection = True
+            return
+        if mode == '503':
+            self.send_error(503)
+            return
+        if mode == 'slow':
+            time.sleep(SLOW)
+        body = server.documents[path]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def load_documents(hour):
+    """The fixtures on a time axis starting at hour, Open-Meteo's with gaps"""
+    with open(os.path.join(FIXTURES, WEATHER_FIXTURES['open-meteo']), encoding='utf-8') as f:
+        open_meteo = json.load(f)
+    with open(os.path.join(FIXTURES, WEATHER_FIXTURES['met-norway']), encoding='utf-8') as f:
+        met = json.load(f)
+
+    hourly = open_meteo['hourly']
+    hourly['time'] = [hour + i * 3600 for i in range(len(hourly['time']))]
+    # Gaps for merge_reports() to fill: no current humidity, every other
+    # precipitation probability missing
+    del open_meteo['current']['relative_humidity_2m']
+    hourly['precipitation_probability'] = [None if i % 2 else p for i, p in
+                                           enumerate(hourly['precipitation_probability'])]
+
+    met = copy.deepcopy(met)
+    steps = met['properties']['timeseries']
+    shift = hour - int(datetime.fromisoformat(steps[0]['time'].replace('Z', '+00:00')).timestamp())
+    for step in steps:
+        when = datetime.fromisoformat(step['time'].replace('Z', '+00:00')).timestamp() + shift
+        step['time'] = datetime.fromtimestamp(when, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    met_body = json.dumps(met).encode()
+    return {'/open-meteo': json.dumps(open_meteo).encode(),
+            '/met-norway': met_body, '/met-norway-2': met_body}
+
+
+def provider_threads():
+    return sum(1 for thread in threading.enumerate() if thread.name.startswith('weather-'))
+
+
+class Checker:
+    """Runs refreshes and collects per-step reports and problems"""
+
+    def __init__(self, args, providers, pool):
+        self.args = args
+        self.providers = providers
+        self.pool = pool
+        self.steps = []
+        self.problems = []
+        self.max_threads = 0
+
+    def refresh(self, step):
+        """One fetch_reports() call: (reports, errors, elapsed, late providers)"""
+        late_before = {p.name: metrics.counter_value('weather_provider_late', provider=p.name)
+                       for p in self.providers}
+        start = time.monotonic()
+        by_location, errors = fetch_reports(self.providers, [HOME], self.args.deadline,
+                                            grace=self.args.grace, pool=self.pool)
+        elapsed = time.monotonic() - start
+        self.max_threads = max(self.max_threads, provider_threads())
+        late = sorted(p.name for p in self.providers
+                      if metrics.counter_value('weather_provider_late', provider=p.name)
+                      > late_before[p.name])
+        reports = by_location[HOME]
+        self.steps.append({
+            'step': step,
+            'elapsed_s': round(elapsed, 3),
+            'answered': sorted(r.provider for r in reports),
+            'errors': {name: f"{type(e).__name__}: {e}" for name, e in sorted(errors.items())},
+            'late': late,
+        })
+        return reports, errors, elapsed, late
+
+    def expect(self, step, condition, message):
+        if not condition:
+            self.problems.append(f"{step}: {message}")
+
+    def expect_refresh(self, step, result, answered, failed, late, within):
+        """Check who answered, failed and was late, and that it returned within (lo, hi) s"""
+        reports, errors, elapsed, late_names = result
+        names = sorted(r.provider for r in reports)
+        self.expect(step, names == sorted(answered),
+                    f"answers from {names}, expected {sorted(answered)}")
+        self.expect(step, sorted(errors) == sorted(failed),
+                    f"errors from {sorted(errors)}, expected {sorted(failed)}")
+        self.expect(step, late_names == sorted(late),
+                    f"late {late_names}, expected {sorted(late)}")
+        low, high = within
+        self.expect(step, low <= elapsed <= high,
+                    f"returned after {elapsed:.2f}s, expected {low:.2f}-{high:.2f}s")
+
+
+def wait_idle(pool, providers, timeout=5.0):
+    """Wait for every provider's worker to finish its job"""
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if not any(pool.busy(provider) for provider in providers):
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def run(args, server, cache):
+    session = requests.Session()
+    providers = []
+    for cls in (OpenMeteoProvider, MetNorwayProvider, SecondMetProvider):
+        provider = cls(session, cache, timeout=(1.0, args.deadline * 5))
+        provider.url = server.url(f"/{provider.name}")
+        providers.append(provider)
+    open_meteo, met, met2 = providers
+    checker = Checker(args, providers, ProviderWorkers())
+    grace, deadline, slack = args.grace, args.deadline, 0.5
+
+    try:
+        server.set_modes(**{'open-meteo': 'ok', 'met-norway': 'hang', 'met-norway-2': '503'})
+        result = checker.refresh('race')
+        checker.expect_refresh('race', result, answered=[open_meteo.name], failed=[met2.name],
+                               late=[met.name], within=(grace, grace + slack))
+        error = result[1].get(met2.name)
+        checker.expect('race', isinstance(error, requests.HTTPError),
+                       f"{met2.name} failed with {error!r}, expected an HTTP error")
+
+        for index in range(args.refreshes):
+            step = f"busy {index + 1}"
+            result = checker.refresh(step)
+            checker.expect_refresh(step, result, answered=[open_meteo.name],
+                                   failed=[met.name, met2.name], late=[], within=(0, slack))
+            error = result[1].get(met.name)
+            checker.expect(step, isinstance(error, TimeoutError) and 'busy' in str(error),
+                           f"{met.name} failed with {error!r}, expected still busy")
+        checker.expect('busy', server.hits['/met-norway'] == 1,
+                       f"hung provider asked {server.hits['/met-norway']} times, expected once")
+
+        server.set_modes(**{'open-meteo': '503', 'met-norway': 'ok', 'met-norway-2': '503'})
+        checker.expect('release', wait_idle(checker.pool, providers), "workers still busy")
+        server.set_modes(**{'met-norway': 'hang'})
+        result = checker.refresh('no answer')
+        checker.expect_refresh('no answer', result, answered=[],
+                               failed=[p.name for p in providers], late=[],
+                               within=(deadline, deadline + slack))
+        error = result[1].get(met.name)
+        checker.expect('no answer', isinstance(error, TimeoutError) and 'in time' in str(error),
+                       f"{met.name} failed with {error!r}, expected a timeout")
+
+        server.set_modes(**{'met-norway': 'ok'})
+        checker.expect('release', wait_idle(checker.pool, providers), "workers still busy")
+        reports, _, _, _ = result = checker.refresh('fallback')
+        checker.expect_refresh('fallback', result, answered=[met.name],
+                               failed=[open_meteo.name, met2.name], late=[], within=(0, slack))
+        if reports:
+            chosen = choose_report(reports)
+            checker.expect('fallback', chosen.provider == met.name,
+                           f"chose {chosen.provider}, expected {met.name}")
+            checker.expect('fallback', chosen.current == reports[0].current,
+                           f"current {chosen.current}, expected MET's {reports[0].current}")
+
+        server.set_modes(**{'open-meteo': 'ok', 'met-norway': 'slow', 'met-norway-2': 'slow'})
+        reports, _, _, _ = result = checker.refresh('merge')
+        checker.expect_refresh('merge', result, answered=[p.name for p in providers],
+                               failed=[], late=[], within=(SLOW, grace + slack))
+        if len(reports) == len(providers):
+            check_merge(checker, reports)
+    finally:
+        server.release.set()
+        session.close()
+
+    checker.expect('threads', checker.max_threads <= len(providers),
+                   f"{checker.max_threads} provider threads, expected at most {len(providers)}")
+    return checker
+
+
+def check_merge(checker, reports):
+    """Open-Meteo's report is chosen, its gaps filled from MET by time"""
+    by_name = {report.provider: report for report in reports}
+    primary, met = by_name['open-meteo'], by_name['met-norway']
+    chosen = choose_report(reports)
+    checker.expect('merge', chosen.provider == 'open-meteo',
+                   f"chose {chosen.provider}, expected the fastest, open-meteo")
+    checker.expect('merge', primary.current.humidity is None and
+                   chosen.current.humidity == met.current.humidity,
+                   f"humidity {chosen.current.humidity}, expected MET's {met.current.humidity}")
+    checker.expect('merge', chosen.current.temperature == primary.current.temperature,
+                   f"temperature {chosen.current.temperature}, expected "
+                   f"Open-Meteo's {primary.current.temperature}")
+
+    met_precip = dict(zip(met.hourly['time'], met.hourly['precipitation_probability']))
+    own = primary.hourly['precipitation_probability']
+    filled = kept = 0
+    for when, mine, merged in zip(primary.hourly['time'], own,
+                                  chosen.hourly['precipitation_probability']):
+        if mine is not None:
+            kept += merged == mine
+        elif when in met_precip:
+            filled += 1
+            checker.expect('merge', merged == met_precip[when],
+                           f"precipitation at {when} is {merged}, "
+                           f"expected MET's {met_precip[when]}")
+    checker.expect('merge', filled > 0, "no hourly gap overlapped MET's forecast")
+    checker.expect('merge', kept == sum(value is not None for value in own),
+                   "Open-Meteo's own hourly values were replaced")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--deadline', type=float, default=2.0,
+                        help='fetch_reports() deadline, seconds')
+    parser.add_argument('--grace', type=float, default=0.5,
+                        help='wait after the first answer, seconds')
+    parser.add_argument('--refreshes', type=int, default=5,
+                        help='refreshes while a provider hangs')
+    parser.add_argument('--output', default=default_output('provider_race'),
+                        help='results file (default: %(default)s)')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    now = int(time.time())
+    server = StubServer(load_documents(now - now % 3600))
+    threading.Thread(target=server.serve_forever, name='stub-server', daemon=True).start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            checker = run(args, server, DiskCache(tmp))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    for step in checker.steps:
+        errors = ', '.join(f"{name} ({error.split(':')[0]})"
+                           for name, error in step['errors'].items())
+        print(f"{step['step']:<10} {step['elapsed_s']:6.2f}s  "
+              f"answered {', '.join(step['answered']) or '-'}"
+              f"  failed {errors or '-'}  late {', '.join(step['late']) or '-'}")
+    print(f"At most {checker.max_threads} provider threads at once")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'settings': vars(args),
+            'steps': checker.steps,
+            'max_provider_threads': checker.max_threads,
+            'problems': checker.problems,
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if checker.problems:
+        for problem in checker.problems:
+            print(f"FAIL: {problem}")
+        sys.exit(1)
+    print("PASS")
+
+
+if __name__ == '__main__':
+    main()
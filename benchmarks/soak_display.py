@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Soak test for the display loop at accelerated simulated time
+
+Runs the app's real scheduler, screen rotation, frame cache and display
+path against a plain file standing in for the framebuffer, for days of
+simulated time. The clock jumps straight to the next deadline instead of
+sleeping. Weather and joke fetches return canned fixtures (a new snapshot
+each time, with every Nth weather fetch failing) so every publish/render
+path keeps churning without the network.
+
+After a warm-up, RSS, open fds, Python heap and object counts by type
+are sampled every simulated hour. At the end it prints the growth since
+the warm-up: top tracemalloc allocation sites and object types. It exits
+with status 1 if RSS or the fd count grew beyond the limits.
+
+Usage: python3 benchmarks/soak_display.py [--days N] [--max-rss-growth MB]
+                                          [--max-fd-growth N] [--fail-every N]
+                                          [--transition none|crossfade|slide]
+                                          [--output results.json]
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+import requests
+
+import clock_weather_fbi as app
+from bench_screens import FIXTURE_TIME, FIXTURES, WEATHER_FIXTURES, default_output, git_revision
+from fb_output import FramebufferBackend
+from fetcher import BackgroundFetcher
+from http_fetch import FetchResult
+from metrics import open_fds, rss_bytes
+from scheduler import Scheduler
+from weather_providers import create_provider
+
+HOUR = 3600
+WARMUP = 2 * HOUR  # simulated time before the baseline is taken
+TOP = 10
+
+
+class SimClock:
+    """Stands in for the time module in the app; time() is simulated"""
+
+    def __init__(self, start):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+def sim_datetime(clock):
+    class SimDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.fromtimestamp(clock.now, tz)
+    return SimDatetime
+
+
+class CannedFetches:
+    """Fixture-backed replacements for fetch_weather and fetch_joke"""
+
+    def __init__(self, clock, fail_every):
+        self.clock = clock
+        self.fail_every = fail_every
+        self.weather_fetches = 0
+        self.provider = create_provider('open-meteo', None, None)
+        with open(os.path.join(FIXTURES, WEATHER_FIXTURES['open-meteo']), encoding='utf-8') as f:
+            self.weather = json.load(f)
+        with open(os.path.join(FIXTURES, 'joke.json'), encoding='utf-8') as f:
+            self.joke = json.load(f)
+
+    def fetch_weather(self, force=False):
+        self.weather_fetches += 1
+        if self.fail_every and self.weather_fetches % self.fail_every == 0:
+            raise requests.exceptions.ConnectionError("simulated outage")
+
+        now = self.clock.now
+        report = self.provider.parse(self.weather, app.HOME, now)
+        # Keep the fixture's forecast lined up with the simulated hour
+        shift = int(now - FIXTURE_TIME) // HOUR * HOUR
+        report = report._replace(
+            hourly={**report.hourly, 'time': [t + shift for t in report.hourly['time']]},
+            latency=0.0,
+            fetch=FetchResult(self.weather, 'fetched', now, 0, 0, None))
+        snapshots = {location: app.parse_weather(report) for location in app.LOCATIONS}
+        return snapshots, [report], 0
+
+    def fetch_joke(self):
+        return app.parse_joke(self.joke, self.clock.now)
+
+
+def type_counts():
+    gc.collect()
+    return Counter(type(obj).__name__ for obj in gc.get_objects())
+
+
+def wait_for_fetches():
+    """Let fetch threads post their results so they land at a known simulated time"""
+    while any(thread.name.startswith('fetch-') for thread in threading.enumerate()):
+        time.sleep(0.001)
+
+
+def run(days, transition, fail_every):
+    clock = SimClock(time.time())
+    app.time = clock
+    app.datetime = sim_datetime(clock)
+    app.scheduler = Scheduler(clock=clock.time, wall_clock=clock.time)
+    app.fetcher = BackgroundFetcher(app.scheduler)
+    canned = CannedFetches(clock, fail_every)
+    app.fetch_weather = canned.fetch_weather
+    app.fetch_joke = canned.fetch_joke
+    app.SCREEN_TRANSITION = transition
+
+    start = clock.now
+    end = start + days * 86400
+    samples = []
+    baseline = None
+    next_sample = start + WARMUP
+
+    app.current_screen = 0
+    app.request_render()
+    app.scheduler.call_later(app.SCREENS[0][1], 'rotate', app.on_rotate)
+    app.schedule_next_minute()
+    app.schedule_next_hour()
+    app.on_weather_due()
+    app.on_joke_due()
+
+    wall_start = time.perf_counter()
+    while clock.now < end:
+        app.render_current_screen()
+        wait_for_fetches()
+        deadline = app.scheduler.next_deadline()
+        if deadline is not None and deadline > clock.now:
+            clock.now = deadline
+        app.scheduler.run_once()
+
+        if clock.now >= next_sample:
+            gc.collect()
+            sample = {
+                'hours': round((clock.now - start) / HOUR, 2),
+                'rss_bytes': rss_bytes(),
+                'open_fds': open_fds(),
+                'traced_bytes': tracemalloc.get_traced_memory()[0] if baseline else 0,
+            }
+            if baseline is None:
+                tracemalloc.start()
+                baseline = (sample, tracemalloc.take_snapshot(), type_counts())
+                sample['traced_bytes'] = tracemalloc.get_traced_memory()[0]
+            samples.append(sample)
+            next_sample += HOUR
+
+    final = (samples[-1], tracemalloc.take_snapshot(), type_counts())
+    tracemalloc.stop()
+    return baseline, final, samples, time.perf_counter() - wall_start, canned.weather_fetches
+
+
+def growth_report(baseline, final):
+    (_, base_snapshot, base_types), (_, final_snapshot, final_types) = baseline, final
+    sites = [
+        {'site': str(stat.traceback), 'size_diff': stat.size_diff, 'count_diff': stat.count_diff}
+        for stat in final_snapshot.compare_to(base_snapshot, 'lineno')[:TOP]
+        if stat.size_diff > 0
+    ]
+    types = sorted(((name, count - base_types.get(name, 0)) for name, count in final_types.items()),
+                   key=lambda item: item[1], reverse=True)
+    return sites, [{'type': name, 'count_diff': diff} for name, diff in types[:TOP] if diff > 0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=float, default=2.0, help='simulated days to run')
+    parser.add_argument('--max-rss-growth', type=float, default=8.0,
+                        help='allowed RSS growth after warm-up, in MB')
+    parser.add_argument('--max-fd-growth', type=int, default=0,
+                        help='allowed growth in open file descriptors')
+    parser.add_argument('--fail-every', type=int, default=7,
+                        help='make every Nth weather fetch fail (0: never)')
+    parser.add_argument('--transition', choices=('none', 'crossfade', 'slide'), default='none')
+    parser.add_argument('--output', default=default_output('soak_display'),
+                        help='results file (default: %(default)s)')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    app.fonts.preload(app.SCREEN_FONTS)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        device = os.path.join(tmp, 'fb')
+        open(device, 'wb').close()
+        backend = FramebufferBackend(device, app.SCREEN_WIDTH, app.SCREEN_HEIGHT, 16,
+                                     frame_store=app.frames)
+        backend.open()
+        app.display_backend = backend
+        try:
+            baseline, final, samples, wall, fetches = run(args.days, args.transition,
+                                                          args.fail_every)
+        finally:
+            app.display_backend = None
+            backend.close()
+
+    sites, types = growth_report(baseline, final)
+    first, last = baseline[0], final[0]
+    rss_growth = last['rss_bytes'] - first['rss_bytes']
+    fd_growth = last['open_fds'] - first['open_fds']
+    failures = []
+    if rss_growth > args.max_rss_growth * 1024 * 1024:
+        failures.append(f"RSS grew {rss_growth / 1048576:.1f} MB (limit {args.max_rss_growth} MB)")
+    if fd_growth > args.max_fd_growth:
+        failures.append(f"open fds grew by {fd_growth} (limit {args.max_fd_growth})")
+
+    report = {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'simulated_days': args.days,
+        'wall_seconds': round(wall, 1),
+        'frames_presented': app.metrics.counter_value('frames_presented'),
+        'frames_skipped': app.metrics.counter_value('frames_skipped'),
+        'weather_fetches': fetches,
+        'rss_growth_bytes': rss_growth,
+        'fd_growth': fd_growth,
+        'traced_growth_bytes': last['traced_bytes'] - first['traced_bytes'],
+        'top_allocation_growth': sites,
+        'top_type_growth': types,
+        'samples': samples,
+        'failures': failures,
+    }
+
+    print(f"{args.days:g} simulated days in {wall:.0f}s: "
+          f"{report['frames_presented']} frames presented, {fetches} weather fetches")
+    print(f"RSS {first['rss_bytes'] / 1048576:.1f} -> {last['rss_bytes'] / 1048576:.1f} MB, "
+          f"fds {first['open_fds']} -> {last['open_fds']}, "
+          f"Python heap +{report['traced_growth_bytes'] / 1024:.1f} KB after warm-up")
+    print("Growth by allocation site:")
+    for site in sites:
+        print(f"  {site['size_diff'] / 1024:+9.1f} KB {site['count_diff']:+6d}  {site['site']}")
+    print("Growth by type:")
+    for entry in types:
+        print(f"  {entry['count_diff']:+6d}  {entry['type']}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print("PASS")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Display loop against a weather upstream that hangs, then fails
+
+Points the app's weather refresh (BackgroundFetcher, fetch_weather and
+the upstream policy, with timings scaled down to seconds) at a local
+stub server that goes through four phases:
+
+- ok: serves the Open-Meteo fixture;
+- hang: accepts requests and never answers;
+- 5xx: answers 503 at once;
+- recovered: serves the fixture again.
+
+Meanwhile the real display loop runs (render_current_screen and
+scheduler.run_once against a file framebuffer) with a timer ticking at
+--tick-hz. For every phase it reports the ticks that ran against the
+number expected and how late they ran. On every tick during the hang
+and 5xx phases it checks that the displayed weather is still the last
+good snapshot. It checks that the fetch threads stay bounded and that
+the weather recovers. Exits with status 1 if a check failed.
+
+Usage: python3 benchmarks/stalled_upstream.py [--phase S] [--tick-hz N]
+                                              [--max-late S] [--output results.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+import requests
+
+import clock_weather_fbi as app
+from bench_screens import FIXTURES, WEATHER_FIXTURES, default_output, git_revision, percentile
+from data_cache import DiskCache
+from fb_output import FramebufferBackend
+from http_policy import ResilientSession
+from weather_providers import create_provider
+
+PHASES = ('ok', 'hang', '5xx', 'recovered')
+
+# The app's refresh and failure policy with minutes turned into seconds
+TIMEOUT = (0.5, 1.0)
+POLICY = {'retries': 1, 'backoff_base': 0.05, 'backoff_cap': 0.2,
+          'breaker_options': {'failure_threshold': 3, 'reset_timeout': 1.0,
+                              'max_reset_timeout': 2.0}}
+SCHEDULE = {'WEATHER_UPDATE_INTERVAL': 1.0, 'WEATHER_RETRY_INTERVAL': 0.5,
+            'WEATHER_RETRY_MAX': 2.0, 'PROVIDER_DEADLINE': 2.0}
+
+
+class StubServer(ThreadingHTTPServer):
+    """Serves the fixture, hangs or answers 503, depending on phase"""
+
+    daemon_threads = True
+
+    def __init__(self, body):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.body = body
+        self.phase = 'ok'
+        self.hits = {phase: 0 for phase in PHASES}
+        self.release = threading.Event()  # set on shutdown to free hung handlers
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/forecast"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        phase = server.phase
+        with server.lock:
+            server.hits[phase] += 1
+        if phase == 'hang':
+            server.release.wait()
+            self.close_connection = True
+            return
+        if phase == '5xx':
+            self.send_error(503)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(server.body)))
+        self.end_headers()
+        self.wfile.write(server.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def fetch_threads():
+    """Threads doing weather fetches: the fetcher's and the provider workers"""
+    return sum(1 for thread in threading.enumerate()
+               if thread.name.startswith(('fetch-', 'weather-')))
+
+
+def run(args, server, cache):
+    client = ResilientSession(requests.Session(), **POLICY)
+    provider = create_provider('open-meteo', client, cache, timeout=TIMEOUT)
+    provider.url = server.url
+    app.session = client
+    app.weather_providers = [provider]
+    for name, value in SCHEDULE.items():
+        setattr(app, name, value)
+
+    stats = {phase: {'ticks': 0, 'expected': 0, 'late': [], 'ok': 0, 'failed': 0}
+             for phase in PHASES}
+    problems = []
+    good = {}  # the last good snapshot when the upstream went bad
+    max_threads = [0]
+
+    on_weather_fetched = app.on_weather_fetched
+
+    def record_fetch(update, error):
+        stats[server.phase]['failed' if error else 'ok'] += 1
+        on_weather_fetched(update, error)
+
+    app.on_weather_fetched = record_fetch
+
+    clock = app.scheduler.clock
+    start = clock()
+    period = 1 / args.tick_hz
+    due = [start + period]
+
+    def on_tick():
+        now = clock()
+        phase = PHASES[min(int((now - start) // args.phase), len(PHASES) - 1)]
+        if phase != server.phase:
+            if phase == 'hang':
+                good['weather'] = app.weather_data
+            server.phase = phase
+        stats[phase]['ticks'] += 1
+        stats[phase]['late'].append(now - due[0])
+        max_threads[0] = max(max_threads[0], fetch_threads())
+
+        if phase in ('hang', '5xx'):
+            shown = app.weather_data
+            kept = good['weather']
+            if (shown['temperature'], shown['hourly']) != (kept['temperature'], kept['hourly']):
+                problems.append(f"{phase}: weather on screen changed from {kept['temperature']} "
+                                f"to {shown['temperature']} ({shown['description']})")
+
+        due[0] += period
+        app.scheduler.call_at(due[0], 'tick', on_tick)
+
+    app.current_screen = 0
+    app.request_render()
+    app.schedule_next_minute()
+    app.scheduler.call_at(due[0], 'tick', on_tick)
+    app.on_weather_due()
+
+    end = start + args.phase * len(PHASES)
+    while clock() < end:
+        app.render_current_screen()
+        app.scheduler.run_once()
+
+    for phase in PHASES:
+        stats[phase]['expected'] = int(args.phase * args.tick_hz)
+    return stats, problems, max_threads[0]
+
+
+def check(args, stats, max_threads):
+    problems = []
+    for phase, phase_stats in stats.items():
+        if phase_stats['ticks'] < 0.9 * phase_stats['expected']:
+            problems.append(f"{phase}: {phase_stats['ticks']} ticks, "
+                            f"expected {phase_stats['expected']}")
+        late = sorted(phase_stats['late'])
+        if late and percentile(late, 99) > args.max_late:
+            problems.append(f"{phase}: ticks p99 {percentile(late, 99) * 1000:.1f} ms late")
+    for phase in ('ok', 'recovered'):
+        if not stats[phase]['ok']:
+            problems.append(f"{phase}: no weather fetch succeeded")
+    if max_threads > 2:
+        problems.append(f"{max_threads} fetch threads at once, expected at most 2")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--phase', type=float, default=5.0, help='seconds per upstream phase')
+    parser.add_argument('--tick-hz', type=float, default=20.0, help='display loop tick rate')
+    parser.add_argument('--max-late', type=float, default=0.05,
+                        help='allowed p99 tick lateness, seconds')
+    parser.add_argument('--output', default=default_output('stalled_upstream'),
+                        help='results file (default: %(default)s)')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.CRITICAL)
+    app.fonts.preload(app.SCREEN_FONTS)
+
+    with open(os.path.join(FIXTURES, WEATHER_FIXTURES['open-meteo']), 'rb') as f:
+        server = StubServer(f.read())
+    threading.Thread(target=server.serve_forever, name='stub-server', daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        device = os.path.join(tmp, 'fb')
+        open(device, 'wb').close()
+        backend = FramebufferBackend(device, app.SCREEN_WIDTH, app.SCREEN_HEIGHT, 16)
+        backend.open()
+        app.display_backend = backend
+        try:
+            stats, problems, max_threads = run(args, server, DiskCache(os.path.join(tmp, 'cache')))
+        finally:
+            app.display_backend = None
+            backend.close()
+            server.release.set()
+            server.shutdown()
+            server.server_close()
+    problems += check(args, stats, max_threads)
+
+    print(f"{'phase':<10} {'ticks':>11} {'late p50':>9} {'p99':>8} {'max':>8} "
+          f"{'fetches ok/failed':>18} {'server hits':>12}")
+    results = {}
+    for phase in PHASES:
+        phase_stats = stats[phase]
+        late = sorted(phase_stats['late']) or [0.0]
+        results[phase] = {
+            'ticks': phase_stats['ticks'],
+            'expected_ticks': phase_stats['expected'],
+            'late_ms': {'p50': round(percentile(late, 50) * 1000, 2),
+                        'p99': round(percentile(late, 99) * 1000, 2),
+                        'max': round(late[-1] * 1000, 2)},
+            'fetches_ok': phase_stats['ok'],
+            'fetches_failed': phase_stats['failed'],
+            'server_hits': server.hits[phase],
+        }
+        report = results[phase]
+        print(f"{phase:<10} {report['ticks']:>5}/{report['expected_ticks']:<5} "
+              f"{report['late_ms']['p50']:>7.2f}ms {report['late_ms']['p99']:>6.2f}ms "
+              f"{report['late_ms']['max']:>6.2f}ms "
+              f"{report['fetches_ok']:>9}/{report['fetches_failed']:<8} "
+              f"{report['server_hits']:>12}")
+    print(f"At most {max_threads} fetch threads at once")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'settings': vars(args),
+            'phases': results,
+            'max_fetch_threads': max_threads,
+            'problems': problems,
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if problems:
+        for problem in problems[:20]:
+            print(f"FAIL: {problem}")
+        sys.exit(1)
+    print("PASS")
+
+
+if __name__ == '__main__':
+    main()
@@ -53,7 +53,28 @@ Write-Host "   [OK] Backup created in ~/$backupDir" -ForegroundColor Green
 # Deploy Python files
 Write-Host "2. Deploying Python application files..." -ForegroundColor Yellow
 $pythonFiles = @(
-    "src/clock_weather_fbi.py"
+    "src/clock_weather_fbi.py",
+    "src/fb_output.py",
+    "src/pixel_format.py",
+    "src/damage.py",
+    "src/fonts.py",
+    "src/layers.py",
+    "src/frame_cache.py",
+    "src/animation.py",
+    "src/touch.py",
+    "src/text_layout.py",
+    "src/glyph_atlas.py",
+    "src/scheduler.py",
+    "src/fetcher.py",
+    "src/data_cache.py",
+    "src/http_fetch.py",
+    "src/http_policy.py",
+    "src/metrics.py",
+    "src/log_pipeline.py",
+    "src/startup.py",
+    "src/power.py",
+    "src/weather_providers.py",
+    "src/hourly.py"
 )
 
 foreach ($file in $pythonFiles) {
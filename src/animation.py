@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Screen transitions and the live seconds bar
+
+Animation only works on the framebuffer backend, where a frame is a copy
+into mapped memory. Everything is built from frames that are already
+rendered (the frame cache's screens): a Transition blends or slides
+between two of them, and SecondsBar paints a thin progress bar over the
+clock screen. The numpy paths keep the source frames as arrays, so
+each animation frame is a few vectorized ops on them; without numpy,
+PIL's Image.blend and paste are used instead.
+
+FramePacer keeps the frame rate fixed: frame n is due at start + n/fps.
+A late tick shows the frame for the current time and counts the frames
+it skipped as dropped, so one slow frame never delays the rest.
+"""
+
+import math
+
+from PIL import Image
+
+from pixel_format import load_numpy
+
+MIN_FPS = 15
+MAX_FPS = 30
+TRANSITIONS = ('crossfade', 'slide')
+
+
+def clamp_fps(fps):
+    """fps limited to the supported MIN_FPS..MAX_FPS range"""
+    return max(MIN_FPS, min(MAX_FPS, fps))
+
+
+def ease(progress):
+    """Smoothstep easing for progress in 0..1"""
+    progress = max(0.0, min(1.0, progress))
+    return progress * progress * (3 - 2 * progress)
+
+
+class FramePacer:
+    """Fixed-rate frame slots indexed by time, for one animation"""
+
+    def __init__(self, fps, start):
+        self.interval = 1.0 / fps
+        self.start = start
+        self.index = -1
+        self.dropped = 0
+
+    def slot(self, now):
+        """Slot that now falls in"""
+        return int((now - self.start) / self.interval)
+
+    def advance(self, now):
+        """Slot to show at now; slots passed over since the last one count as dropped"""
+        index = max(self.index + 1, self.slot(now))
+        self.dropped += index - self.index - 1
+        self.index = index
+        return index
+
+    def due(self, index):
+        """Time slot index starts, on the clock the pacer was started from"""
+        return self.start + index * self.interval
+
+    def late(self, index, now):
+        """True once slot index is over, i.e. its frame missed the budget"""
+        return now >= self.due(index + 1)
+
+
+class Transition:
+    """
+    Crossfade or slide from start to end (same-sized RGB frames).
+
+    frame(progress) returns a new image each time, so it can be handed
+    to the display and kept by the damage tracker.
+    """
+
+    def __init__(self, kind, start, end):
+        if kind not in TRANSITIONS:
+            raise ValueError(f"Unknown transition '{kind}'")
+        if start.size != end.size:
+            raise ValueError("Transition frames differ in size")
+        self.kind = kind
+        self.start = start.convert('RGB')
+        self.end = end.convert('RGB')
+        self.width = start.size[0]
+        self._np = np = load_numpy()
+
+        if np is not None:
+            self._a = np.asarray(self.start)
+            self._b = np.asarray(self.end)
+            if kind == 'crossfade':
+                # Weighted sums in 16 bits: 255 * 256 still fits
+                self._a16 = self._a.astype(np.uint16)
+                self._b16 = self._b.astype(np.uint16)
+                self._acc = np.empty_like(self._a16)
+                self._tmp = np.empty_like(self._a16)
+
+    def frame(self, progress):
+        """Frame at progress 0..1 (eased)"""
+        progress = ease(progress)
+        if self.kind == 'crossfade':
+            return self._crossfade(progress)
+        return self._slide(progress)
+
+    def _crossfade(self, progress):
+        np = self._np
+        if np is None:
+            return Image.blend(self.start, self.end, progress)
+
+        weight = int(progress * 256)
+        np.multiply(self._a16, 256 - weight, out=self._acc)
+        np.multiply(self._b16, weight, out=self._tmp)
+        np.add(self._acc, self._tmp, out=self._acc)
+        np.right_shift(self._acc, 8, out=self._acc)
+        return Image.fromarray(self._acc.astype(np.uint8))
+
+    def _slide(self, progress):
+        """The new screen pushes the old one out to the left"""
+        offset = min(self.width, int(progress * self.width))
+        keep = self.width - offset
+
+        np = self._np
+        if np is None:
+            img = Image.new('RGB', self.start.size)
+            img.paste(self.start.crop((offset, 0, self.width, self.start.size[1])), (0, 0))
+            img.paste(self.end.crop((0, 0, offset, self.end.size[1])), (keep, 0))
+            return img
+
+        out = np.empty_like(self._a)
+        out[:, :keep] = self._a[:, offset:]
+        out[:, keep:] = self._b[:, :offset]
+        return Image.fromarray(out)
+
+
+class SecondsBar:
+    """
+    Bar along rect (left, top, right, bottom) that fills once per minute.
+
+    Only the bar's pixels change between frames, so callers present
+    just rect.
+    """
+
+    def __init__(self, rect, color):
+        self.rect = rect
+        self.color = color
+        self.length = rect[2] - rect[0]
+
+    def width_at(self, timestamp):
+        """Filled pixels at timestamp"""
+        return int(self.length * (timestamp % 60) / 60)
+
+    def next_change(self, timestamp):
+        """Earliest time after timestamp at which the filled width changes"""
+        width = self.width_at(timestamp)
+        minute = timestamp - timestamp % 60
+        return minute + math.ceil((width + 1) * 60 / self.length * 1000) / 1000
+
+    def frame(self, base, timestamp):
+        """Copy of base with the bar filled for timestamp"""
+        img = base.copy()
+        width = self.width_at(timestamp)
+        if width:
+            left, top, _, bottom = self.rect
+            img.paste(self.color, (left, top, left + width, bottom))
+        return img
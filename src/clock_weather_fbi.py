@@ -1,56 +1,133 @@
 #!/usr/bin/env python3
 """
-Clock + Weather Display using fbi (framebuffer image viewer)
-Generates PNG images and displays them on the PiTFT
+Clock + Weather Display for the PiTFT framebuffer
+Renders frames with PIL and blits them straight into the framebuffer,
+with fbi (framebuffer image viewer) kept as a fallback output backend
 Fixed version with proper error handling and resource management
 """
 
-from PIL import Image, ImageDraw, ImageFont
-import requests
+# Imported first so startup timing covers everything below
+from startup import profile as startup_profile
+
+from PIL import Image, ImageDraw
 from datetime import datetime
 import time
-import subprocess
 import os
 import signal
 import logging
+import math
 import sys
 import atexit
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import argparse
+import threading
+from functools import partial
+from types import MappingProxyType
+
+from animation import TRANSITIONS, FramePacer, SecondsBar, Transition, clamp_fps
+from damage import DamageTracker
+from data_cache import DiskCache
+from fetcher import BackgroundFetcher
+from fb_output import create_backend
+from http_fetch import ACCEPT_ENCODING, LazySession
+from http_policy import CircuitOpenError, ResilientSession, backoff_delay
+from fonts import DEFAULT_FONT_PATHS, FontRegistry
+from glyph_atlas import atlas_for
+from frame_cache import FrameCache
+from hourly import HourlyForecast
+from layers import LayerCache
+from log_pipeline import setup_logging
+from metrics import MetricsServer, cpu_seconds, metrics
+from power import BACKLIGHT_ROOT, FULL, MODES, QUIET, Backlight, PowerProfile, QuietHours
+from scheduler import Scheduler
+from text_layout import line_box, measure, wrap
+from touch import DEFAULT_CALIBRATION, Calibration, TouchReader, find_touch_device
+from weather_providers import (Location, choose_report, create_provider, default_providers,
+                               fetch_reports)
+
+startup_profile.mark('imports')
 
 # Logging configuration
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('/tmp/clock_weather_fbi.log'),
-        logging.StreamHandler()
-    ]
-)
+# Logging goes through a queue to a size-rotated file (tmpfs is RAM) and
+# stderr, rate limited per message; SIGUSR1 dumps the recent records
+LOG_FILE = os.environ.get('CLOCK_LOG_FILE', '/tmp/clock_weather_fbi.log')
+LOG_MAX_BYTES = int(os.environ.get('CLOCK_LOG_MAX_KB', '1024')) * 1024
+LOG_BACKUPS = 2
+LOG_BURST = 5  # records per message per LOG_BURST_INTERVAL before suppressing
+LOG_BURST_INTERVAL = 60
+
+log_pipeline = setup_logging(LOG_FILE, logging.INFO, LOG_MAX_BYTES, LOG_BACKUPS,
+                             burst=LOG_BURST, interval=LOG_BURST_INTERVAL)
+atexit.register(log_pipeline.stop)
 logger = logging.getLogger(__name__)
 
 # Configuration
 LOCATION = "Sandnes, Rogaland"
 LATITUDE = 58.8516
 LONGITUDE = 5.7351
+HOME = Location(LOCATION, LATITUDE, LONGITUDE)
+
+
+def parse_locations(spec):
+    """Locations from 'Name=lat,lon;Name=lat,lon', skipping malformed entries"""
+    locations = []
+    for entry in spec.split(';'):
+        if not entry.strip():
+            continue
+        name, _, coords = entry.rpartition('=')
+        try:
+            latitude, longitude = (float(value) for value in coords.split(','))
+        except ValueError:
+            logger.error(f"Ignoring malformed location '{entry}'")
+            continue
+        locations.append(Location(name.strip() or f"{latitude}, {longitude}", latitude, longitude))
+    return locations
+
+
+# Sites to show, each with its own weather screen. The first one also
+# drives the advisor and forecast screens.
+LOCATIONS = parse_locations(os.environ.get('CLOCK_LOCATIONS', '')) or [HOME]
+
+# Weather sources, queried in parallel: open-meteo, met-norway. By default
+# both for one location; with several, only Open-Meteo, which fetches all
+# of them in one request (MET Norway needs a request per location).
+WEATHER_PROVIDERS = (os.environ.get('CLOCK_WEATHER_PROVIDERS')
+                     or default_providers(len(LOCATIONS)))
 
 # Network configuration
 MAX_RETRIES = 3
 CONNECT_TIMEOUT = 5
 READ_TIMEOUT = 10
 WEATHER_UPDATE_INTERVAL = 600  # 10 minutes in seconds
+WEATHER_RETRY_INTERVAL = 60  # first retry after about a minute, then backing off
+WEATHER_RETRY_MAX = 1800  # ... to at most 30 minutes between attempts
+RETRY_BACKOFF_BASE = 1  # seconds before the first in-request retry, doubling
+RETRY_BACKOFF_CAP = 8
+CIRCUIT_FAILURES = 3  # consecutive failures that open an endpoint's breaker
+CIRCUIT_RESET = 60  # first open period, doubling on every failed probe
+CIRCUIT_RESET_MAX = 3600
 MAX_WEATHER_FAILURES = 5
+# Providers that have not answered by then are skipped for this refresh
+PROVIDER_DEADLINE = CONNECT_TIMEOUT + READ_TIMEOUT
 
 # Display configuration
 WEATHER_DISPLAY_TIME = 20  # seconds
 ADVISOR_DISPLAY_TIME = 10  # seconds
 FORECAST_DISPLAY_TIME = 10  # seconds
 TOTAL_CYCLE_TIME = WEATHER_DISPLAY_TIME + ADVISOR_DISPLAY_TIME + FORECAST_DISPLAY_TIME
+DISPLAY_RETRY_INTERVAL = 2  # seconds before retrying a failed frame
+ADVICE_HOURS = 12  # hours ahead the clothing advisor looks at
+FORECAST_HOURS = 24  # hours shown on the forecast screen
+FRAME_CACHE_BYTES = 4 * 1024 * 1024  # rendered frames kept across the rotation
 
 # Joke API configuration
 JOKE_API_URL = "https://official-joke-api.appspot.com/random_joke"
 JOKE_UPDATE_INTERVAL = 1800  # 30 minutes in seconds
 
+# Persistent cache of the last good API responses, survives reboots
+CACHE_DIR = os.environ.get('CLOCK_CACHE_DIR', '/var/cache/cerberusgo')
+CACHE_TTL = 86400  # cached data older than a day is not shown
+CACHE_MAX_BYTES = 1024 * 1024
+
 # Display settings (landscape for FBI)
 SCREEN_WIDTH = 480
 SCREEN_HEIGHT = 320
@@ -58,92 +135,229 @@ BG_COLOR = (26, 26, 46)
 TEXT_COLOR = (234, 234, 234)
 ACCENT_COLOR = (22, 199, 154)
 
-# Create session with connection pooling and retries
-session = requests.Session()
-retry_strategy = Retry(
-    total=MAX_RETRIES,
-    backoff_factor=1,
-    status_forcelist=[429, 500, 502, 503, 504],
-)
-adapter = HTTPAdapter(
-    max_retries=retry_strategy,
-    pool_connections=1,
-    pool_maxsize=1
+# Fonts: candidate files per variant, first one that loads wins.
+# CLOCK_FONT_REGULAR / CLOCK_FONT_BOLD put a preferred file in front.
+FONT_PATHS = {
+    'regular': [os.environ.get('CLOCK_FONT_REGULAR')] + DEFAULT_FONT_PATHS['regular'],
+    'bold': [os.environ.get('CLOCK_FONT_BOLD')] + DEFAULT_FONT_PATHS['bold'],
+}
+
+# Every (variant, size) used by the screens, loaded once at startup
+SCREEN_FONTS = [
+    ('bold', 60), ('bold', 50), ('bold', 24), ('bold', 18),
+    ('regular', 20), ('regular', 16), ('regular', 14), ('regular', 12),
+    ('regular', 11), ('regular', 9),
+]
+
+# Output backend: 'framebuffer' blits into the mmapped device directly,
+# 'fbi' saves a PNG and respawns fbi for every frame (legacy fallback)
+DISPLAY_BACKEND = os.environ.get('CLOCK_DISPLAY_BACKEND', 'framebuffer')
+FRAMEBUFFER_DEVICE = os.environ.get('FRAMEBUFFER', '/dev/fb0')
+# Ordered dithering smooths gradients when packing to 16-bit RGB565
+FRAMEBUFFER_DITHER = os.environ.get('FRAMEBUFFER_DITHER', '0') == '1'
+
+# Animation, framebuffer backend only. CLOCK_TRANSITION is 'none',
+# 'crossfade' or 'slide'; CLOCK_SECONDS=1 adds a bar along the bottom of
+# the clock screen that fills once a minute. Both run at CLOCK_FPS (15-30).
+SCREEN_TRANSITION = os.environ.get('CLOCK_TRANSITION', 'none')
+SHOW_SECONDS = os.environ.get('CLOCK_SECONDS', '0') == '1'
+ANIMATION_FPS = clamp_fps(int(os.environ.get('CLOCK_FPS', '20')))
+TRANSITION_TIME = 0.5  # seconds
+SECONDS_BAR_HEIGHT = 3
+
+# Touchscreen: device path ('' finds the STMPE panel, 'off' disables
+# touch; a regular file is replayed), and the raw-to-screen mapping in
+# xorg "Calibration" order (min x, max x, min y, max y)
+TOUCH_DEVICE = os.environ.get('CLOCK_TOUCH_DEVICE', '')
+TOUCH_CALIBRATION = os.environ.get('CLOCK_TOUCH_CALIBRATION', DEFAULT_CALIBRATION)
+TOUCH_SWAP_XY = os.environ.get('CLOCK_TOUCH_SWAP_XY', '0') == '1'
+
+# Quiet hours, e.g. '23:00-06:30' ('' for none): the backlight dims to
+# CLOCK_QUIET_BRIGHTNESS percent (0 turns it off), only the clock screen
+# is shown and the joke is not fetched. A touch wakes the display for
+# CLOCK_WAKE_MINUTES. CLOCK_BACKLIGHT picks a device under the sysfs root.
+QUIET_HOURS = os.environ.get('CLOCK_QUIET_HOURS', '')
+QUIET_BRIGHTNESS = int(os.environ.get('CLOCK_QUIET_BRIGHTNESS', '10'))
+WAKE_TIME = int(os.environ.get('CLOCK_WAKE_MINUTES', '2')) * 60
+BACKLIGHT_DIR = os.environ.get('CLOCK_BACKLIGHT_DIR', BACKLIGHT_ROOT)
+BACKLIGHT_NAME = os.environ.get('CLOCK_BACKLIGHT') or None
+
+# Prometheus endpoint: 'host:port', 'unix:/path/to.sock', or 'off'
+METRICS_LISTEN = os.environ.get('CLOCK_METRICS_LISTEN', '127.0.0.1:9105')
+
+
+def create_session():
+    """HTTP session with connection pooling (built on the first fetch)"""
+    # requests and urllib3 are slow to import; nothing needs them before then
+    import requests
+    from requests.adapters import HTTPAdapter
+    
+    new_session = requests.Session()
+    # No transport-level retries: ResilientSession retries within its budget
+    adapter = HTTPAdapter(
+        pool_connections=3,  # weather provider + joke hosts
+        pool_maxsize=1
+    )
+    new_session.mount("http://", adapter)
+    new_session.mount("https://", adapter)
+    # Compressed responses; brotli too when a decoder is installed
+    new_session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+    return new_session
+
+
+# Retries, retry budget and per-host circuit breakers for every upstream
+session = ResilientSession(
+    LazySession(create_session),
+    retries=MAX_RETRIES,
+    backoff_base=RETRY_BACKOFF_BASE,
+    backoff_cap=RETRY_BACKOFF_CAP,
+    breaker_options={
+        'failure_threshold': CIRCUIT_FAILURES,
+        'reset_timeout': CIRCUIT_RESET,
+        'max_reset_timeout': CIRCUIT_RESET_MAX,
+    },
 )
-session.mount("http://", adapter)
-session.mount("https://", adapter)
+
+# On-disk cache for weather and joke responses
+data_cache = DiskCache(CACHE_DIR, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES)
+
+
+def create_weather_providers(names):
+    """Weather providers for a comma-separated list of names, skipping unknown ones"""
+    providers = []
+    for name in names.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        try:
+            providers.append(create_provider(name, session, data_cache,
+                                             timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)))
+        except ValueError as e:
+            logger.error(f"{e}, ignoring")
+    return providers
+
+
+weather_providers = create_weather_providers(WEATHER_PROVIDERS)
+
+# Shared font cache for all screens
+fonts = FontRegistry(FONT_PATHS)
+
+# Wrapped text keeps a 20px margin on each side
+TEXT_WRAP_WIDTH = SCREEN_WIDTH - 40
+
+# Static background layer per screen
+layers = LayerCache()
+
+# Last rendered frame per screen, reused while its inputs are unchanged
+frames = FrameCache(FRAME_CACHE_BYTES)
+
+seconds_bar = SecondsBar((0, SCREEN_HEIGHT - SECONDS_BAR_HEIGHT, SCREEN_WIDTH, SCREEN_HEIGHT),
+                         ACCENT_COLOR)
 
 # Global state
-weather_data = {
+# weather_data, location_weather, clothing_advice and joke_data are
+# read-only snapshots.
+# Fetch results are published on the scheduler thread by replacing the
+# whole mapping, never by mutating it, so a frame always sees one
+# consistent version.
+# Shown for a location until weather for it has been fetched or loaded
+WEATHER_PLACEHOLDER = MappingProxyType({
     'temperature': '--',
     'description': 'Loading...',
     'humidity': '--',
     'wind_speed': '--',
     'last_update': '',
-    'forecast': {}  # Will store hourly forecast data
-}
+    'hourly': None  # HourlyForecast once fetched
+})
+weather_data = WEATHER_PLACEHOLDER
+
+# Weather snapshot per location; weather_data is the first location's.
+# A location missing here has no data of its own yet (see weather_for).
+location_weather = MappingProxyType({})
 
 # Clothing advisor data
-clothing_advice = {
+clothing_advice = MappingProxyType({
     'recommendation': 'Loading advice...',
     'reason': 'Analyzing weather...',
     'last_update': ''
-}
+})
 
 # Joke data
-joke_data = {
+joke_data = MappingProxyType({
     'setup': 'Loading joke...',
     'punchline': '',
     'last_update': 0
+})
+
+# Weather code descriptions
+WEATHER_CODES = {
+    0: 'Clear sky', 1: 'Mainly clear', 2: 'Partly cloudy',
+    3: 'Overcast', 45: 'Foggy', 48: 'Rime fog',
+    51: 'Light drizzle', 53: 'Drizzle', 55: 'Dense drizzle',
+    61: 'Slight rain', 63: 'Rain', 65: 'Heavy rain',
+    71: 'Slight snow', 73: 'Snow', 75: 'Heavy snow',
+    77: 'Snow grains', 80: 'Rain showers', 81: 'Rain showers',
+    82: 'Heavy rain showers', 85: 'Snow showers',
+    86: 'Heavy snow showers', 95: 'Thunderstorm',
+    96: 'Thunderstorm + hail', 99: 'Heavy thunderstorm'
 }
 
-fbi_process = None
+display_backend = None
+damage_tracker = DamageTracker()
+metrics_server = None
+touch_reader = None
+power = PowerProfile()  # always full mode until start_power() reads the quiet hours
+touch_received = None  # when the gesture behind the pending render arrived
 running = True
+profile_startup = False
 weather_failures = 0
 last_weather_update = 0
+weather_fresh_until = 0  # server says the cached forecast is good until then
+weather_bytes_total = 0
 last_joke_update = 0
-display_start_time = 0
-show_advisor_screen = False
+
+# Display loop state
+scheduler = Scheduler()
+fetcher = BackgroundFetcher(scheduler)
+current_screen = 0
+render_pending = False
+shown_screen = None  # screen index of the frame on the display
+shown_frame = None  # that screen's frame, without animation overlays
+transition = None  # (Transition, FramePacer) while one is running
+seconds_pacer = None
 
 
-def analyze_forecast(hourly_data):
-    """Analyze hourly forecast data for clothing recommendations"""
-    if not hourly_data:
+def analyze_forecast(hourly, now=None):
+    """Stats for clothing recommendations over the next ADVICE_HOURS hours"""
+    if not hourly:
         return {}
     
-    temps = hourly_data.get('temperature_2m', [])
-    precip = hourly_data.get('precipitation_probability', [])
-    codes = hourly_data.get('weather_code', [])
-    
-    # Analyze next 12 hours (or available data)
-    analysis_hours = min(12, len(temps))
+    window = hourly.window_at(time.time() if now is None else now, ADVICE_HOURS)
+    if not window.times:
+        return {}
     
     analysis = {
-        'temp_range': (min(temps[:analysis_hours]),
-                       max(temps[:analysis_hours])) if temps else (0, 0),
-        'rain_chance': max(precip[:analysis_hours]) if precip else 0,
-        'rain_hours': sum(1 for p in precip[:analysis_hours]
-                          if p > 30) if precip else 0,
-        'weather_codes': codes[:analysis_hours] if codes else []
+        'temp_range': ((window.temp_min, window.temp_max)
+                       if window.temp_min is not None else (0, 0)),
+        'rain_chance': window.rain_chance,
+        'rain_hours': window.rain_hours,
+        'weather_codes': window.weather_code
     }
     
     return analysis
 
 
-def update_clothing_advice():
-    """Generate clothing recommendations based on weather forecast"""
-    global clothing_advice
-    
-    forecast = weather_data.get('forecast', {})
-    current_temp = float(weather_data.get('temperature', 0) or 0)
+def build_clothing_advice(weather):
+    """Generate clothing recommendations based on a weather snapshot"""
+    forecast = analyze_forecast(weather.get('hourly'))
+    current_temp = float(weather.get('temperature', 0) or 0)
     
     if not forecast:
-        clothing_advice = {
+        return MappingProxyType({
             'recommendation': 'Check weather manually',
             'reason': 'Weather forecast unavailable',
             'last_update': datetime.now().strftime("%H:%M")
-        }
-        return
+        })
     
     temp_min, temp_max = forecast.get('temp_range',
                                        (current_temp, current_temp))
@@ -177,7 +391,7 @@ def update_clothing_advice():
         reasons.append(f"{rain_chance}% rain chance")
     
     # Wind recommendations
-    wind_speed = weather_data.get('wind_speed', '--')
+    wind_speed = weather.get('wind_speed', '--')
     if wind_speed != '--' and float(wind_speed) > 8:
         recommendations.append("Windproof layer")
         reasons.append(f"Windy ({wind_speed} m/s)")
@@ -188,295 +402,389 @@ def update_clothing_advice():
         recommendations.append("Layers for temp changes")
         reasons.append(f"{temp_diff:.0f}°C temperature swing")
     
-    clothing_advice = {
+    return MappingProxyType({
         'recommendation': (" • ".join(recommendations[:3])
                           if recommendations else "Dress comfortably"),
         'reason': (" • ".join(reasons[:2])
                   if reasons else "Normal weather conditions"),
         'last_update': datetime.now().strftime("%H:%M")
-    }
+    })
 
 
 def fetch_joke():
-    """Fetch a random joke from the internet"""
-    global joke_data, last_joke_update
-    
-    try:
-        logger.info("Fetching joke...")
+    """Fetch a random joke from the internet (runs on a fetcher thread)"""
+    logger.info("Fetching joke...")
+    with metrics.time('fetch', source='joke'):
         response = session.get(
             JOKE_API_URL,
             timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
         )
         response.raise_for_status()
         data = response.json()
-        
-        joke_data = {
-            'setup': data.get('setup', 'Why did the weather app break?'),
-            'punchline': data.get('punchline',
-                                 'It had too many cloud storage issues!'),
-            'last_update': time.time()
-        }
-        
-        # Update the global last_joke_update timestamp
-        last_joke_update = time.time()
-        
+    metrics.inc('http_bytes', len(response.content), source='joke')
+    with metrics.time('parse', source='joke'):
+        joke = parse_joke(data, time.time())
+    data_cache.put('joke', data, response.headers)
+    
+    return joke
+
+
+def parse_joke(data, fetched_at):
+    """Build a joke snapshot from a decoded joke API response"""
+    return MappingProxyType({
+        'setup': data.get('setup', 'Why did the weather app break?'),
+        'punchline': data.get('punchline',
+                             'It had too many cloud storage issues!'),
+        'last_update': fetched_at
+    })
+
+
+def apply_joke(joke, error):
+    """Publish a joke fetch result to the renderer (scheduler thread)"""
+    global joke_data, last_joke_update
+    
+    if error is None:
+        joke_data = joke
         logger.info("Joke fetched successfully")
-        
-    except Exception as e:
-        logger.warning(f"Failed to fetch joke: {e}")
+    else:
+        logger.warning(f"Failed to fetch joke: {error}")
         # Use a fallback weather-related joke
-        joke_data = {
+        joke_data = MappingProxyType({
             'setup': 'What do you call a grumpy meteorologist?',
             'punchline': 'A person with a stormy disposition!',
             'last_update': time.time()
-        }
-        # Still update the timestamp even for fallback
-        last_joke_update = time.time()
+        })
+    
+    # Update the timestamp even for the fallback
+    last_joke_update = time.time()
+
 
+def fetch_weather(force=False):
+    """
+    Fetch weather from all providers in parallel (runs on a fetcher thread).
+    
+    Each provider revalidates its cached response rather than downloading
+    it again, and skips the request while the server says it is still
+    fresh, unless force is set; Open-Meteo covers all LOCATIONS in one
+    request. Returns
+    (snapshots by location, reports, fresh_until), where fresh_until is
+    the earliest time any provider wants to be asked again.
+    """
+    logger.info("Fetching weather data...")
+    
+    with metrics.time('fetch', source='weather'):
+        by_location, errors = fetch_reports(weather_providers, LOCATIONS, PROVIDER_DEADLINE,
+                                            force=force)
+    
+    for name, error in errors.items():
+        logger.warning(f"Weather provider {name} failed: {error}")
+        metrics.inc('weather_provider_errors', provider=name)
+    reports = [report for location_reports in by_location.values() for report in location_reports]
+    if not reports:
+        if errors:
+            raise next(iter(errors.values()))
+        raise RuntimeError("No weather providers configured")
+    
+    for report in reports:
+        metrics.inc('http_bytes', report.fetch.bytes_transferred, source=report.provider)
+        metrics.inc('weather_refreshes', status=report.fetch.status, provider=report.provider)
+    
+    with metrics.time('parse', source='weather'):
+        snapshots = {location: parse_weather(choose_report(location_reports))
+                     for location, location_reports in by_location.items()}
+    
+    # A provider that failed has to be asked again on the normal schedule
+    fresh_until = 0 if errors else min(r.fetch.fresh_until or 0 for r in reports)
+    
+    return snapshots, reports, fresh_until
 
-def fetch_weather():
-    """Fetch weather from Open-Meteo API with proper error handling"""
-    global weather_data, weather_failures, last_weather_update
+
+def format_update_time(timestamp):
+    """HH:MM for today, with the date in front for anything older"""
+    when = datetime.fromtimestamp(timestamp)
+    if when.date() == datetime.now().date():
+        return when.strftime("%H:%M")
+    return when.strftime("%d.%m %H:%M")
+
+
+def parse_weather(report, stale=False):
+    """
+    Build a weather snapshot from a normalized WeatherReport.
+    
+    stale marks data loaded from the disk cache rather than fetched now.
+    """
+    current = report.current
+    
+    wind_ms = round(current.wind_speed, 1) if current.wind_speed else '--'
+    
+    # Typed arrays instead of JSON lists; this hour's window stats are
+    # computed here, on the fetch thread, so frames only read them
+    hourly = HourlyForecast(report.hourly)
+    now = time.time()
+    hourly.window_at(now, ADVICE_HOURS)
+    hourly.window_at(now, FORECAST_HOURS)
+    
+    return MappingProxyType({
+        'temperature': f"{_or_dashes(current.temperature)}",
+        'description': WEATHER_CODES.get(current.weather_code, 'Unknown'),
+        'humidity': f"{_or_dashes(current.humidity)}",
+        'wind_speed': f"{wind_ms}",
+        'last_update': format_update_time(report.fetched_at),
+        'hourly': hourly,  # HourlyForecast for the forecast screen
+        'provider': report.title,
+        'stale': stale
+    })
+
+
+def _or_dashes(value):
+    return '--' if value is None else value
+
+
+def load_cached_data():
+    """Show the last good weather and joke from disk until fresh data arrives"""
+    global weather_data, location_weather, clothing_advice, joke_data, last_joke_update
+    
+    snapshots = {}
+    for location in LOCATIONS:
+        reports = [r for r in (p.load_cached(location) for p in weather_providers) if r is not None]
+        if not reports:
+            continue
+        try:
+            snapshots[location] = parse_weather(choose_report(reports), stale=True)
+            logger.info(f"Loaded cached weather for {location.name} from "
+                        f"{snapshots[location]['last_update']} ({snapshots[location]['provider']})")
+        except Exception as e:
+            logger.warning(f"Cached weather for {location.name} unusable: {e}")
     
-    try:
-        logger.info("Fetching weather data...")
-        
-        response = session.get(
-            "https://api.open-meteo.com/v1/forecast",
-            params={
-                'latitude': LATITUDE,
-                'longitude': LONGITUDE,
-                'current': ('temperature_2m,relative_humidity_2m,'
-                           'wind_speed_10m,weather_code'),
-                'hourly': ('temperature_2m,precipitation_probability,'
-                          'wind_speed_10m,weather_code'),
-                'forecast_days': 1,
-                'timezone': 'Europe/Oslo'
-            },
-            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
-        )
-        response.raise_for_status()
-        data = response.json()
-        current = data.get('current', {})
-        hourly = data.get('hourly', {})
-        
-        # Weather code descriptions
-        codes = {
-            0: 'Clear sky', 1: 'Mainly clear', 2: 'Partly cloudy',
-            3: 'Overcast', 45: 'Foggy', 48: 'Rime fog',
-            51: 'Light drizzle', 53: 'Drizzle', 55: 'Dense drizzle',
-            61: 'Slight rain', 63: 'Rain', 65: 'Heavy rain',
-            71: 'Slight snow', 73: 'Snow', 75: 'Heavy snow',
-            77: 'Snow grains', 80: 'Rain showers', 81: 'Rain showers',
-            82: 'Heavy rain showers', 85: 'Snow showers',
-            86: 'Heavy snow showers', 95: 'Thunderstorm',
-            96: 'Thunderstorm + hail', 99: 'Heavy thunderstorm'
-        }
-        
-        weather_code = current.get('weather_code', 0)
-        
-        # Convert wind speed from km/h to m/s (divide by 3.6)
-        wind_kmh = current.get('wind_speed_10m', 0)
-        wind_ms = round(wind_kmh / 3.6, 1) if wind_kmh != 0 else '--'
-        
-        # Analyze forecast for clothing recommendations
-        forecast_analysis = analyze_forecast(hourly)
-        
-        weather_data = {
-            'temperature': f"{current.get('temperature_2m', '--')}",
-            'description': codes.get(weather_code, 'Unknown'),
-            'humidity': f"{current.get('relative_humidity_2m', '--')}",
-            'wind_speed': f"{wind_ms}",
-            'last_update': datetime.now().strftime("%H:%M"),
-            'forecast': forecast_analysis,
-            'hourly_raw': hourly  # Store raw hourly data for forecast screen
-        }
+    location_weather = MappingProxyType(snapshots)
+    if LOCATIONS[0] in snapshots:
+        weather_data = snapshots[LOCATIONS[0]]
+        clothing_advice = build_clothing_advice(weather_data)
+    
+    entry = data_cache.get('joke')
+    if entry is not None:
+        try:
+            joke_data = parse_joke(entry.payload, entry.stored_at)
+            # A joke is a joke; keep it until the normal refresh is due
+            last_joke_update = entry.stored_at
+            logger.info("Loaded cached joke")
+        except Exception as e:
+            logger.warning(f"Cached joke unusable: {e}")
+
+
+def apply_weather(update, error):
+    """Publish a weather fetch result to the renderer (scheduler thread)"""
+    global weather_data, location_weather, weather_failures, last_weather_update
+    global clothing_advice, weather_fresh_until, weather_bytes_total
+    
+    if error is None:
+        snapshots, reports, fresh_until = update
+        location_weather = MappingProxyType(snapshots)
+        weather_data = snapshots[LOCATIONS[0]]
+        clothing_advice = build_clothing_advice(weather_data)
         
         # Reset failure counter and update timestamp
         weather_failures = 0
         last_weather_update = time.time()
+        weather_fresh_until = fresh_until
+        transferred = sum(r.fetch.bytes_transferred for r in reports)
+        weather_bytes_total += transferred
         
-        # Update clothing advice based on new weather data
-        update_clothing_advice()
-        
-        logger.info("Weather data fetched successfully")
-        
-    except requests.exceptions.Timeout as e:
-        weather_failures += 1
-        logger.error(f"Weather fetch timeout (failure {weather_failures}/{MAX_WEATHER_FAILURES}): {e}")
-        weather_data['description'] = "Connection timeout"
-    
-    except requests.exceptions.RequestException as e:
-        weather_failures += 1
-        logger.error(f"Weather fetch error (failure {weather_failures}/{MAX_WEATHER_FAILURES}): {e}")
-        weather_data['description'] = "Connection error"
+        sources = ', '.join(f"{r.provider} {r.fetch.status} {r.latency:.2f}s" for r in reports)
+        logger.info(f"Weather data fetched successfully for {len(snapshots)} location(s) "
+                    f"({sources}; {transferred} bytes, {weather_bytes_total} total)")
+        return
     
-    except Exception as e:
-        weather_failures += 1
-        logger.error(f"Unexpected weather error (failure {weather_failures}/{MAX_WEATHER_FAILURES}): {e}")
-        weather_data['description'] = "Error loading weather"
+    # Only fetches raise requests errors, so it is imported by now
+    import requests
+    
+    weather_failures += 1
+    metrics.inc('weather_fetch_errors')
+    if isinstance(error, CircuitOpenError):
+        logger.warning(f"Weather fetch skipped (failure {weather_failures}): {error}")
+        description = "Connection error"
+    elif isinstance(error, requests.exceptions.Timeout):
+        logger.error(f"Weather fetch timeout "
+                     f"(failure {weather_failures}/{MAX_WEATHER_FAILURES}): {error}")
+        description = "Connection timeout"
+    elif isinstance(error, requests.exceptions.RequestException):
+        logger.error(f"Weather fetch error "
+                     f"(failure {weather_failures}/{MAX_WEATHER_FAILURES}): {error}")
+        description = "Connection error"
+    else:
+        logger.error(f"Unexpected weather error "
+                     f"(failure {weather_failures}/{MAX_WEATHER_FAILURES}): {error}")
+        description = "Error loading weather"
+    
+    # Every location keeps its own last data (or the placeholder) with the error
+    location_weather = MappingProxyType({
+        location: MappingProxyType({**weather_for(location), 'description': description})
+        for location in LOCATIONS
+    })
+    weather_data = location_weather[LOCATIONS[0]]
+
 
+def weather_for(location):
+    """The weather snapshot for location, or the placeholder if it has none yet"""
+    return location_weather.get(location, WEATHER_PLACEHOLDER)
 
-def create_display_image():
-    """Create the clock/weather display image"""
+
+def draw_centered(draw, text, y, font, fill):
+    """Draw one line of text centered horizontally at y and return its LineBox"""
+    box = line_box(text, font)
+    draw.text(((SCREEN_WIDTH - box.width) // 2, y), text, font=font, fill=fill)
+    return box
+
+
+def draw_numeric_centered(img, text, y, font, fill):
+    """draw_centered for digits and units, drawn from the font's glyph atlas"""
+    box = line_box(text, font)
+    atlas_for(font).draw(img, ((SCREEN_WIDTH - box.width) // 2, y), text, fill)
+    return box
+
+
+def draw_wrapped(draw, text, y, font, fill, spacing):
+    """Draw text word-wrapped and centered starting at y, return the next y"""
+    for box in wrap(text, font, TEXT_WRAP_WIDTH):
+        draw.text(((SCREEN_WIDTH - box.width) // 2, y), box.text, font=font, fill=fill)
+        y += box.height + spacing
+    return y
+
+
+def theme_key():
+    """Everything the static layers depend on besides per-screen content"""
+    return (SCREEN_WIDTH, SCREEN_HEIGHT, BG_COLOR, TEXT_COLOR, ACCENT_COLOR,
+            LOCATION, fonts.generation)
+
+
+def build_display_background(date_str, location_name):
+    """Static layer for the clock/weather screen: fill, date, separator, location"""
     img = Image.new('RGB', (SCREEN_WIDTH, SCREEN_HEIGHT), BG_COLOR)
     draw = ImageDraw.Draw(img)
     
-    try:
-        font_time = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 60)
-        font_date = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 20)
-        font_temp = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 50)
-        font_text = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 16)
-        font_small = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 12)
-    except:
-        font_time = font_date = font_temp = font_text = font_small = ImageFont.load_default()
+    font_time = fonts.get('bold', 60)
+    font_date = fonts.get('regular', 20)
+    font_small = fonts.get('regular', 12)
     
-    now = datetime.now()
     y = 20
+    time_y = y
     
-    # Time (without seconds)
-    time_str = now.strftime("%H:%M")
-    bbox = draw.textbbox((0, 0), time_str, font=font_time)
-    x = (SCREEN_WIDTH - (bbox[2] - bbox[0])) // 2
-    draw.text((x, y), time_str, font=font_time, fill=TEXT_COLOR)
+    # Room for the time; all digits share the same height
+    bbox = measure("00:00", font_time)
     y += bbox[3] - bbox[1] + 10
     
     # Date
-    date_str = now.strftime("%A, %B %d")
-    bbox = draw.textbbox((0, 0), date_str, font=font_date)
-    x = (SCREEN_WIDTH - (bbox[2] - bbox[0])) // 2
-    draw.text((x, y), date_str, font=font_date, fill=TEXT_COLOR)
-    y += bbox[3] - bbox[1] + 20
+    y += draw_centered(draw, date_str, y, font_date, TEXT_COLOR).height + 20
     
     # Separator
     draw.line([(30, y), (SCREEN_WIDTH - 30, y)], fill=ACCENT_COLOR, width=2)
     y += 20
     
     # Location
-    bbox = draw.textbbox((0, 0), LOCATION, font=font_small)
-    x = (SCREEN_WIDTH - (bbox[2] - bbox[0])) // 2
-    draw.text((x, y), LOCATION, font=font_small, fill=ACCENT_COLOR)
-    y += bbox[3] - bbox[1] + 15
+    y += draw_centered(draw, location_name, y, font_small, ACCENT_COLOR).height + 15
+    
+    return img, {'time_y': time_y, 'content_y': y}
+
+
+def display_inputs(location=None):
+    """What the clock/weather screen for location shows: its snapshot and the minute"""
+    location = location or LOCATIONS[0]
+    return (weather_for(location),
+            datetime.now().strftime("%Y-%m-%d %H:%M"))
+
+
+def create_display_image(location=None):
+    """Create the clock/weather display image for location (default: the first one)"""
+    location = location or LOCATIONS[0]
+    weather = weather_for(location)
+    now = datetime.now()
+    date_str = now.strftime("%A, %B %d")
+    background, layout = layers.get(f"weather:{location.name}", (theme_key(), date_str),
+                                    lambda: build_display_background(date_str, location.name))
+    img = background.copy()
+    draw = ImageDraw.Draw(img)
+    
+    font_time = fonts.get('bold', 60)
+    font_temp = fonts.get('bold', 50)
+    font_text = fonts.get('regular', 16)
+    font_small = fonts.get('regular', 12)
+    
+    # Time (without seconds)
+    time_str = now.strftime("%H:%M")
+    draw_numeric_centered(img, time_str, layout['time_y'], font_time, TEXT_COLOR)
+    
+    y = layout['content_y']
     
     # Temperature
-    temp_str = f"{weather_data['temperature']}°C"
-    bbox = draw.textbbox((0, 0), temp_str, font=font_temp)
-    x = (SCREEN_WIDTH - (bbox[2] - bbox[0])) // 2
-    draw.text((x, y), temp_str, font=font_temp, fill=ACCENT_COLOR)
-    y += bbox[3] - bbox[1] + 10
+    temp_str = f"{weather['temperature']}°C"
+    y += draw_numeric_centered(img, temp_str, y, font_temp, ACCENT_COLOR).height + 10
     
     # Weather description
-    desc = weather_data['description']
-    bbox = draw.textbbox((0, 0), desc, font=font_text)
-    x = (SCREEN_WIDTH - (bbox[2] - bbox[0])) // 2
-    draw.text((x, y), desc, font=font_text, fill=TEXT_COLOR)
-    y += bbox[3] - bbox[1] + 25
+    desc = weather['description']
+    y += draw_centered(draw, desc, y, font_text, TEXT_COLOR).height + 25
     
     # Details
     details = [
-        f"Humidity: {weather_data['humidity']}%",
-        f"Wind: {weather_data['wind_speed']} m/s"
+        f"Humidity: {weather['humidity']}%",
+        f"Wind: {weather['wind_speed']} m/s"
     ]
     for detail in details:
-        bbox = draw.textbbox((0, 0), detail, font=font_text)
-        x = (SCREEN_WIDTH - (bbox[2] - bbox[0])) // 2
-        draw.text((x, y), detail, font=font_text, fill=TEXT_COLOR)
-        y += bbox[3] - bbox[1] + 8
+        y += draw_centered(draw, detail, y, font_text, TEXT_COLOR).height + 8
     
     # Last update
-    if weather_data['last_update']:
-        update_str = f"Weather: {weather_data['last_update']}"
-        bbox = draw.textbbox((0, 0), update_str, font=font_small)
-        x = (SCREEN_WIDTH - (bbox[2] - bbox[0])) // 2
-        draw.text((x, SCREEN_HEIGHT - 25), update_str, font=font_small, fill=(100, 100, 100))
+    if weather['last_update']:
+        update_str = f"Weather: {weather['last_update']}"
+        if weather.get('stale'):
+            update_str += " (cached)"
+        draw_centered(draw, update_str, SCREEN_HEIGHT - 25, font_small, (100, 100, 100))
     
     return img
 
 
-def create_advisor_image():
-    """Create the clothing advisor display image with joke"""
+def build_advisor_background():
+    """Static layer for the advisor screen: fill, title, separator"""
     img = Image.new('RGB', (SCREEN_WIDTH, SCREEN_HEIGHT), BG_COLOR)
     draw = ImageDraw.Draw(img)
     
-    try:
-        font_title = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 24)
-        font_text = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 16)
-        font_small = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 12)
-        font_joke = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 14)
-    except:
-        font_title = font_text = font_small = font_joke = ImageFont.load_default()
+    font_title = fonts.get('bold', 24)
     
     y = 20
     
     # Title
     title = "What to Wear Today"
-    bbox = draw.textbbox((0, 0), title, font=font_title)
-    x = (SCREEN_WIDTH - (bbox[2] - bbox[0])) // 2
-    draw.text((x, y), title, font=font_title, fill=ACCENT_COLOR)
-    y += bbox[3] - bbox[1] + 20
+    y += draw_centered(draw, title, y, font_title, ACCENT_COLOR).height + 20
     
     # Separator
     draw.line([(30, y), (SCREEN_WIDTH - 30, y)], fill=ACCENT_COLOR, width=2)
     y += 25
     
-    # Clothing recommendation
-    recommendation = clothing_advice['recommendation']
-    # Wrap text for better display
-    words = recommendation.split()
-    lines = []
-    current_line = []
-    
-    for word in words:
-        test_line = ' '.join(current_line + [word])
-        bbox = draw.textbbox((0, 0), test_line, font=font_text)
-        if bbox[2] - bbox[0] > SCREEN_WIDTH - 40:  # Leave 20px margin on each side
-            if current_line:
-                lines.append(' '.join(current_line))
-                current_line = [word]
-            else:
-                lines.append(word)
-        else:
-            current_line.append(word)
+    return img, {'content_y': y}
+
+
+def advisor_inputs():
+    """What the advisor screen shows: the advice and joke snapshots"""
+    return (clothing_advice, joke_data)
+
+
+def create_advisor_image():
+    """Create the clothing advisor display image with joke"""
+    background, layout = layers.get('advisor', theme_key(), build_advisor_background)
+    img = background.copy()
+    draw = ImageDraw.Draw(img)
     
-    if current_line:
-        lines.append(' '.join(current_line))
+    font_text = fonts.get('regular', 16)
+    font_small = fonts.get('regular', 12)
+    font_joke = fonts.get('regular', 14)
     
-    # Draw recommendation lines
-    for line in lines:
-        bbox = draw.textbbox((0, 0), line, font=font_text)
-        x = (SCREEN_WIDTH - (bbox[2] - bbox[0])) // 2
-        draw.text((x, y), line, font=font_text, fill=TEXT_COLOR)
-        y += bbox[3] - bbox[1] + 8
+    y = layout['content_y']
     
+    # Clothing recommendation
+    y = draw_wrapped(draw, clothing_advice['recommendation'], y, font_text, TEXT_COLOR, 8)
     y += 10
     
     # Reason
     reason_text = f"Because: {clothing_advice['reason']}"
-    words = reason_text.split()
-    lines = []
-    current_line = []
-    
-    for word in words:
-        test_line = ' '.join(current_line + [word])
-        bbox = draw.textbbox((0, 0), test_line, font=font_small)
-        if bbox[2] - bbox[0] > SCREEN_WIDTH - 40:
-            if current_line:
-                lines.append(' '.join(current_line))
-                current_line = [word]
-            else:
-                lines.append(word)
-        else:
-            current_line.append(word)
-    
-    if current_line:
-        lines.append(' '.join(current_line))
-    
-    for line in lines:
-        bbox = draw.textbbox((0, 0), line, font=font_small)
-        x = (SCREEN_WIDTH - (bbox[2] - bbox[0])) // 2
-        draw.text((x, y), line, font=font_small, fill=(150, 150, 150))
-        y += bbox[3] - bbox[1] + 6
-    
+    y = draw_wrapped(draw, reason_text, y, font_small, (150, 150, 150), 6)
     y += 30
     
     # Separator for joke section
@@ -485,135 +793,112 @@ def create_advisor_image():
     
     # Joke section
     joke_title = "😄 Daily Smile"
-    bbox = draw.textbbox((0, 0), joke_title, font=font_text)
-    x = (SCREEN_WIDTH - (bbox[2] - bbox[0])) // 2
-    draw.text((x, y), joke_title, font=font_text, fill=ACCENT_COLOR)
-    y += bbox[3] - bbox[1] + 15
+    y += draw_centered(draw, joke_title, y, font_text, ACCENT_COLOR).height + 15
     
     # Joke setup
-    setup = joke_data['setup']
-    words = setup.split()
-    lines = []
-    current_line = []
-    
-    for word in words:
-        test_line = ' '.join(current_line + [word])
-        bbox = draw.textbbox((0, 0), test_line, font=font_joke)
-        if bbox[2] - bbox[0] > SCREEN_WIDTH - 40:
-            if current_line:
-                lines.append(' '.join(current_line))
-                current_line = [word]
-            else:
-                lines.append(word)
-        else:
-            current_line.append(word)
-    
-    if current_line:
-        lines.append(' '.join(current_line))
-    
-    for line in lines:
-        bbox = draw.textbbox((0, 0), line, font=font_joke)
-        x = (SCREEN_WIDTH - (bbox[2] - bbox[0])) // 2
-        draw.text((x, y), line, font=font_joke, fill=TEXT_COLOR)
-        y += bbox[3] - bbox[1] + 6
-    
+    y = draw_wrapped(draw, joke_data['setup'], y, font_joke, TEXT_COLOR, 6)
     y += 8
     
     # Joke punchline
-    punchline = joke_data['punchline']
-    words = punchline.split()
-    lines = []
-    current_line = []
-    
-    for word in words:
-        test_line = ' '.join(current_line + [word])
-        bbox = draw.textbbox((0, 0), test_line, font=font_joke)
-        if bbox[2] - bbox[0] > SCREEN_WIDTH - 40:
-            if current_line:
-                lines.append(' '.join(current_line))
-                current_line = [word]
-            else:
-                lines.append(word)
-        else:
-            current_line.append(word)
-    
-    if current_line:
-        lines.append(' '.join(current_line))
-    
-    for line in lines:
-        bbox = draw.textbbox((0, 0), line, font=font_joke)
-        x = (SCREEN_WIDTH - (bbox[2] - bbox[0])) // 2
-        draw.text((x, y), line, font=font_joke, fill=(200, 200, 200))
-        y += bbox[3] - bbox[1] + 6
+    y = draw_wrapped(draw, joke_data['punchline'], y, font_joke, (200, 200, 200), 6)
     
     # Update info at bottom
     update_str = f"Advice: {clothing_advice['last_update']}"
-    bbox = draw.textbbox((0, 0), update_str, font=font_small)
-    x = (SCREEN_WIDTH - (bbox[2] - bbox[0])) // 2
-    draw.text((x, SCREEN_HEIGHT - 25), update_str, font=font_small, fill=(100, 100, 100))
+    draw_centered(draw, update_str, SCREEN_HEIGHT - 25, font_small, (100, 100, 100))
     
     return img
 
 
-def create_forecast_image():
-    """Create the 24-hour forecast display with temperature graph"""
+def build_forecast_background(with_graph):
+    """Static layer for the forecast screen: fill, title and graph chrome"""
     img = Image.new('RGB', (SCREEN_WIDTH, SCREEN_HEIGHT), BG_COLOR)
     draw = ImageDraw.Draw(img)
     
-    try:
-        font_title = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 18)
-        font_text = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 14)
-        font_small = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 11)
-        font_tiny = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 9)
-    except:
-        font_title = font_text = font_small = font_tiny = ImageFont.load_default()
+    font_title = fonts.get('bold', 18)
+    font_text = fonts.get('regular', 14)
+    font_small = fonts.get('regular', 11)
     
     y = 10
     
     # Title
     title = "24-Hour Forecast"
-    bbox = draw.textbbox((0, 0), title, font=font_title)
-    x = (SCREEN_WIDTH - (bbox[2] - bbox[0])) // 2
-    draw.text((x, y), title, font=font_title, fill=ACCENT_COLOR)
+    y += draw_centered(draw, title, y, font_title, ACCENT_COLOR).height + 10
+    
+    layout = {'info_y': y}
+    if not with_graph:
+        return img, layout
+    
+    # Room for the high/low line; its height does not depend on the values
+    bbox = measure("High: 00.0°C    Low: -0.0°C", font_text)
     y += bbox[3] - bbox[1] + 10
     
-    # Get forecast data
-    hourly_data = weather_data.get('hourly_raw', {})
-    if not hourly_data:
+    graph_top = y
+    graph_bottom = SCREEN_HEIGHT - 80
+    separator_x = SCREEN_WIDTH // 2
+    right_start = separator_x + 10
+    
+    # Draw vertical separator
+    draw.line([(separator_x, graph_top), (separator_x, graph_bottom)], 
+              fill=(80, 80, 80), width=1)
+    
+    # Rain/wind headers
+    draw.text((right_start, graph_top), "Rain", font=font_small, fill=TEXT_COLOR)
+    draw.text((right_start + 60, graph_top), "Wind", font=font_small, fill=TEXT_COLOR)
+    
+    layout['graph_top'] = graph_top
+    return img, layout
+
+
+def forecast_inputs():
+    """What the forecast screen shows: the weather snapshot and the current hour"""
+    return (weather_data, datetime.now().strftime("%Y-%m-%d %H"))
+
+
+def create_forecast_image():
+    """Create the 24-hour forecast display with temperature graph"""
+    # Get forecast data from the current hour on; the window and its
+    # stats were built at fetch time or on the hour
+    hourly = weather_data.get('hourly')
+    window = hourly.window_at(time.time(), FORECAST_HOURS) if hourly else None
+    
+    with_graph = window is not None and window.temp_min is not None
+    background, layout = layers.get('forecast', (theme_key(), with_graph),
+                                    lambda: build_forecast_background(with_graph))
+    img = background.copy()
+    draw = ImageDraw.Draw(img)
+    
+    font_text = fonts.get('regular', 14)
+    font_tiny = fonts.get('regular', 9)
+    labels = atlas_for(font_tiny)
+    
+    y = layout['info_y']
+    
+    if not hourly or not window.times:
         error_msg = "Forecast data unavailable"
-        bbox = draw.textbbox((0, 0), error_msg, font=font_text)
-        x = (SCREEN_WIDTH - (bbox[2] - bbox[0])) // 2
-        draw.text((x, y + 50), error_msg, font=font_text, fill=(150, 150, 150))
+        draw_centered(draw, error_msg, y + 50, font_text, (150, 150, 150))
         return img
     
-    # Get hourly data
-    temps = hourly_data.get('temperature_2m', [])
-    precip = hourly_data.get('precipitation_probability', [])
-    wind_speeds = hourly_data.get('wind_speed_10m', [])
-    
-    if not temps:
+    if not with_graph:
         return img
     
-    # Use next 24 hours
-    hours_to_show = min(24, len(temps))
-    temps_display = temps[:hours_to_show]
-    precip_display = precip[:hours_to_show] if precip else [0] * hours_to_show
-    wind_display = wind_speeds[:hours_to_show] if wind_speeds else [0] * hours_to_show
+    # Next FORECAST_HOURS hours
+    hours_to_show = len(window.temperature)
+    temps_display = window.temperature
+    precip_display = window.precipitation_probability
+    wind_display = window.wind_speed
+    x_step_hours = max(hours_to_show - 1, 1)
     
-    # Calculate temperature range
-    temp_min = min(temps_display)
-    temp_max = max(temps_display)
+    # Temperature range
+    temp_min = window.temp_min
+    temp_max = window.temp_max
     temp_range = max(temp_max - temp_min, 5)  # Minimum 5 degree range
     
     # Display high/low temps
     temp_info = f"High: {temp_max:.1f}°C    Low: {temp_min:.1f}°C"
-    bbox = draw.textbbox((0, 0), temp_info, font=font_text)
-    x = (SCREEN_WIDTH - (bbox[2] - bbox[0])) // 2
-    draw.text((x, y), temp_info, font=font_text, fill=ACCENT_COLOR)
-    y += bbox[3] - bbox[1] + 10
+    draw_centered(draw, temp_info, y, font_text, ACCENT_COLOR)
     
     # Graph area setup
-    graph_top = y
+    graph_top = layout['graph_top']
     graph_bottom = SCREEN_HEIGHT - 80
     graph_height = graph_bottom - graph_top
     
@@ -622,55 +907,45 @@ def create_forecast_image():
     graph_width = SCREEN_WIDTH // 2 - 20
     separator_x = SCREEN_WIDTH // 2
     right_start = separator_x + 10
-    right_width = SCREEN_WIDTH // 2 - 20
-    
-    # Draw vertical separator
-    draw.line([(separator_x, graph_top), (separator_x, graph_bottom)], 
-              fill=(80, 80, 80), width=1)
     
     # LEFT SIDE: Temperature Graph
     # Draw temperature line graph
     points = []
+    point_hours = []
     for i, temp in enumerate(temps_display):
-        x_pos = graph_left + (i * graph_width // (hours_to_show - 1))
+        if math.isnan(temp):
+            continue
+        x_pos = graph_left + (i * graph_width // x_step_hours)
         # Normalize temperature to graph height
         y_pos = graph_bottom - int(((temp - temp_min) / temp_range) * graph_height)
         points.append((x_pos, y_pos))
+        point_hours.append(i)
     
     # Draw the temperature line
     if len(points) > 1:
         draw.line(points, fill=ACCENT_COLOR, width=2)
     
     # Draw points on the line
-    for i, (px, py) in enumerate(points):
+    for i, (px, py) in zip(point_hours, points):
         # Draw a small circle at each point
         draw.ellipse([px-2, py-2, px+2, py+2], fill=ACCENT_COLOR)
         
         # Show temperature every 4 hours
         if i % 4 == 0:
             temp_label = f"{temps_display[i]:.0f}°"
-            bbox = draw.textbbox((0, 0), temp_label, font=font_tiny)
+            bbox = measure(temp_label, font_tiny)
             label_x = px - (bbox[2] - bbox[0]) // 2
             label_y = py - 15 if py > graph_top + 20 else py + 5
-            draw.text((label_x, label_y), temp_label, 
-                     font=font_tiny, fill=TEXT_COLOR)
+            labels.draw(img, (label_x, label_y), temp_label, TEXT_COLOR)
     
     # Draw time labels on left (every 6 hours)
-    current_hour = datetime.now().hour
     for i in range(0, hours_to_show, 6):
-        hour = (current_hour + i) % 24
-        hour_label = f"{hour:02d}h"
-        x_pos = graph_left + (i * graph_width // (hours_to_show - 1))
-        draw.text((x_pos - 10, graph_bottom + 3), hour_label, 
-                 font=font_tiny, fill=(150, 150, 150))
-    
-    # RIGHT SIDE: Rain and Wind bars
-    right_y = graph_top
+        hour_label = f"{window.hours[i]:02d}h"
+        x_pos = graph_left + (i * graph_width // x_step_hours)
+        labels.draw(img, (x_pos - 10, graph_bottom + 3), hour_label, (150, 150, 150))
     
-    # Headers
-    draw.text((right_start, right_y), "Rain", font=font_small, fill=TEXT_COLOR)
-    draw.text((right_start + 60, right_y), "Wind", font=font_small, fill=TEXT_COLOR)
-    right_y += 18
+    # RIGHT SIDE: Rain and Wind bars (headers are in the background layer)
+    right_y = graph_top + 18
     
     # Show hourly rain/wind (every 2-3 hours to fit)
     step = max(2, hours_to_show // 12)  # Show ~12 entries
@@ -680,107 +955,184 @@ def create_forecast_image():
         if right_y + bar_height > graph_bottom:
             break
             
-        hour = (current_hour + i) % 24
-        
         # Hour label
-        draw.text((right_start, right_y), f"{hour:02d}h", 
-                 font=font_tiny, fill=(150, 150, 150))
+        labels.draw(img, (right_start, right_y), f"{window.hours[i]:02d}h", (150, 150, 150))
         
         # Rain bar (0-100%)
-        rain_val = precip_display[i] if i < len(precip_display) else 0
+        rain_val = precip_display[i]
+        if math.isnan(rain_val):
+            rain_val = 0
         rain_bar_width = int((rain_val / 100) * 35)
         if rain_bar_width > 0:
             draw.rectangle([right_start + 28, right_y + 1, 
                           right_start + 28 + rain_bar_width, right_y + bar_height - 1],
                          fill=(100, 150, 255))
-        draw.text((right_start + 66, right_y), f"{rain_val:.0f}%", 
-                 font=font_tiny, fill=TEXT_COLOR)
+        labels.draw(img, (right_start + 66, right_y), f"{rain_val:.0f}%", TEXT_COLOR)
         
-        # Wind indicator (converted to m/s)
-        wind_kmh = wind_display[i] if i < len(wind_display) else 0
-        wind_ms = wind_kmh / 3.6
+        # Wind indicator (m/s)
+        wind_ms = wind_display[i]
+        if math.isnan(wind_ms):
+            wind_ms = 0
         wind_bar_width = int(min(wind_ms / 15, 1) * 35)  # Max 15 m/s
         if wind_bar_width > 0:
             draw.rectangle([right_start + 105, right_y + 1,
                           right_start + 105 + wind_bar_width, right_y + bar_height - 1],
                          fill=(150, 255, 150))
-        draw.text((right_start + 143, right_y), f"{wind_ms:.1f}", 
-                 font=font_tiny, fill=TEXT_COLOR)
+        labels.draw(img, (right_start + 143, right_y), f"{wind_ms:.1f}", TEXT_COLOR)
         
         right_y += bar_height + 2
     
     # Update info at bottom
     update_str = f"Updated: {weather_data.get('last_update', '--')}"
-    bbox = draw.textbbox((0, 0), update_str, font=font_tiny)
-    x = (SCREEN_WIDTH - (bbox[2] - bbox[0])) // 2
-    draw.text((x, SCREEN_HEIGHT - 15), update_str, 
-             font=font_tiny, fill=(100, 100, 100))
+    if weather_data.get('stale'):
+        update_str += " (cached)"
+    # Attribution; MET Norway data is CC BY 4.0
+    if weather_data.get('provider'):
+        update_str += f" · {weather_data['provider']}"
+    draw_centered(draw, update_str, SCREEN_HEIGHT - 15, font_tiny, (100, 100, 100))
     
     return img
 
 
-def display_image(img, filename='/tmp/clock_display.png'):
-    """Display image using fbi with proper error handling"""
-    global fbi_process
+# Screen rotation: (name, seconds on screen, builder, inputs).
+# inputs() returns everything the builder reads besides the theme; the
+# frame is rebuilt only when that changes. Snapshots are replaced, never
+# mutated, so comparing them is an identity check.
+SCREENS = [
+    ('weather', WEATHER_DISPLAY_TIME, partial(create_display_image, location),
+     partial(display_inputs, location))
+    for location in LOCATIONS
+] + [
+    ('advisor', ADVISOR_DISPLAY_TIME, create_advisor_image, advisor_inputs),
+    ('forecast', FORECAST_DISPLAY_TIME, create_forecast_image, forecast_inputs),
+]
+
+
+def display_image(img):
+    """Present only the regions of img that changed since the last frame"""
+    if display_backend is None:
+        logger.error("No display backend available")
+        return False
     
-    try:
-        # Save image
-        img.save(filename)
-        logger.debug(f"Image saved to {filename}")
-        
-        # Kill existing fbi process
-        if fbi_process and fbi_process.poll() is None:
-            try:
-                fbi_process.terminate()
-                fbi_process.wait(timeout=2)
-            except subprocess.TimeoutExpired:
-                fbi_process.kill()
-                fbi_process.wait()
-            except Exception as e:
-                logger.warning(f"Error terminating FBI process: {e}")
-        
-        # Ensure framebuffer device exists
-        if not os.path.exists('/dev/fb0'):
-            logger.error("Framebuffer device /dev/fb0 not found")
-            return False
-        
-        # Display with fbi
-        fbi_process = subprocess.Popen([
-            'fbi', '-T', '1', '-d', '/dev/fb0', '-noverbose', '-a', filename
-        ], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
-        
-        # Check if fbi started successfully
-        time.sleep(0.1)
-        if fbi_process.poll() is not None:
-            stderr_output = fbi_process.stderr.read().decode() if fbi_process.stderr else ""
-            logger.error(f"FBI failed to start: {stderr_output}")
-            return False
-        
+    with metrics.time('damage'):
+        rects = damage_tracker.update(img)
+    if not rects:
+        metrics.inc('frames_skipped')
+        logger.debug("Frame unchanged, skipping present")
         return True
-        
-    except Exception as e:
-        logger.error(f"Error displaying image: {e}")
+    
+    if not display_backend.present(img, rects):
+        # Framebuffer contents are unknown now, repaint everything next time
+        damage_tracker.reset()
+        metrics.inc('present_failures')
         return False
+    
+    metrics.inc('frames_presented')
+    return True
+
+
+def open_display_backend():
+    """Open the configured output backend, falling back to fbi if needed"""
+    global display_backend
+
+    names = [DISPLAY_BACKEND]
+    if DISPLAY_BACKEND != 'fbi':
+        names.append('fbi')
+
+    for name in names:
+        try:
+            if name == 'framebuffer':
+                backend = create_backend(name, FRAMEBUFFER_DEVICE,
+                                         dither=FRAMEBUFFER_DITHER, frame_store=frames)
+            else:
+                backend = create_backend(name, FRAMEBUFFER_DEVICE)
+            backend.open()
+            display_backend = backend
+            damage_tracker.reset()
+            logger.info(f"Using '{name}' display backend on {FRAMEBUFFER_DEVICE}")
+            return True
+        except Exception as e:
+            logger.error(f"Display backend '{name}' unavailable: {e}")
+
+    return False
+
+
+def start_metrics():
+    """Register app gauges and serve metrics on METRICS_LISTEN"""
+    global metrics_server
+    
+    metrics.gauge('weather_failures', lambda: weather_failures,
+                  'Consecutive failed weather fetches')
+    metrics.gauge('weather_age_seconds',
+                  lambda: round(time.time() - last_weather_update) if last_weather_update else None,
+                  'Seconds since the last successful weather fetch')
+    metrics.gauge('scheduler_wakeups', lambda: scheduler.wakeups,
+                  'Display loop wakeups since start')
+    metrics.gauge('frame_cache_hits', lambda: frames.hits,
+                  'Screens shown from a cached frame')
+    metrics.gauge('frame_cache_misses', lambda: frames.misses,
+                  'Screens rendered because their inputs changed')
+    metrics.gauge('frame_cache_bytes', lambda: frames.total_bytes,
+                  'Memory held by cached frames')
+    metrics.gauge('circuit_state', session.states)
+    metrics.gauge('power_mode', lambda: MODES.index(power.mode),
+                  'Power profile mode (0 full, 1 quiet hours)')
+    metrics.gauge('power_wakeups_per_hour', partial(power_usage, 1),
+                  'Average display loop wakeups per hour, by power mode')
+    metrics.gauge('power_cpu_seconds_per_hour', partial(power_usage, 2),
+                  'Average CPU seconds used per hour, by power mode')
+    metrics.gauge('log_records_suppressed', lambda: log_pipeline.suppressed,
+                  'Log records held back by the per-message rate limit')
+    metrics.gauge('log_records_dropped', lambda: log_pipeline.dropped,
+                  'Log records dropped because the log queue was full')
+    
+    if METRICS_LISTEN in ('', 'off'):
+        return
+    try:
+        server = MetricsServer(METRICS_LISTEN)
+        server.start()
+        metrics_server = server
+    except (OSError, ValueError) as e:
+        logger.warning(f"Metrics endpoint {METRICS_LISTEN} unavailable: {e}")
+
 
+def dump_recent_logs(reason):
+    """Write the in-memory log ring buffer out next to the log file"""
+    where = log_pipeline.dump_recent(reason)
+    logger.info(f"Recent log records ({reason}) written to {where}")
 
-def cleanup(signum=None, frame=None):
+
+def on_thread_crash(args):
+    """threading.excepthook: log the traceback and keep the context before it"""
+    logger.error(f"Uncaught exception in thread {args.thread.name if args.thread else '?'}",
+                 exc_info=(args.exc_type, args.exc_value, args.exc_traceback))
+    dump_recent_logs(f"crash in thread {args.thread.name if args.thread else '?'}")
+
+
+def stop():
+    """Leave the display loop (SIGTERM/SIGINT); main() cleans up on the way out"""
+    global running
+    
+    logger.info("Shutdown requested")
+    running = False
+
+
+def cleanup():
     """Cleanup on exit with proper resource management"""
-    global fbi_process, running
+    global display_backend, running, metrics_server, touch_reader
     
     logger.info("Shutting down gracefully...")
     running = False
     
-    # Kill FBI process
-    if fbi_process and fbi_process.poll() is None:
-        try:
-            fbi_process.terminate()
-            fbi_process.wait(timeout=5)
-        except subprocess.TimeoutExpired:
-            logger.warning("FBI process did not terminate, killing...")
-            fbi_process.kill()
-            fbi_process.wait()
-        except Exception as e:
-            logger.error(f"Error terminating FBI process: {e}")
+    if metrics_server is not None:
+        metrics_server.stop()
+        metrics_server = None
+    
+    if touch_reader is not None:
+        touch_reader.stop()
+        touch_reader = None
+    
+    power.restore()
     
     # Close session
     try:
@@ -788,142 +1140,498 @@ def cleanup(signum=None, frame=None):
     except Exception as e:
         logger.error(f"Error closing session: {e}")
     
-    # Clear framebuffer
-    try:
-        if os.path.exists('/dev/fb0'):
-            subprocess.run(['sudo', 'dd', 'if=/dev/zero', 'of=/dev/fb0', 'bs=1M', 'count=1'], 
-                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=5)
-            logger.info("Framebuffer cleared")
-    except Exception as e:
-        logger.warning(f"Could not clear framebuffer: {e}")
+    # Clear framebuffer and release the output backend
+    if display_backend is not None:
+        display_backend.clear()
+        display_backend.close()
+        display_backend = None
     
     logger.info("Cleanup completed")
     sys.exit(0)
 
 
-def should_update_joke():
-    """Check if joke should be updated"""
-    current_time = time.time()
-    time_since_last = current_time - last_joke_update
-    
-    # Update joke every 30 minutes, or if it's the first time
-    if last_joke_update == 0 or time_since_last >= JOKE_UPDATE_INTERVAL:
-        return True
+def next_joke_update():
+    """Wall-clock time the joke is next due for a refresh"""
+    # Update joke every 30 minutes, or right away if it's the first time
+    if last_joke_update == 0:
+        return time.time()
+    # ... but not while the joke API's breaker is open
+    return max(last_joke_update + JOKE_UPDATE_INTERVAL, session.next_attempt([JOKE_API_URL]))
+
+
+def next_weather_update():
+    """Wall-clock time the weather is next due for a refresh"""
+    # If the last attempt failed, try again sooner, backing off while it
+    # keeps failing and waiting for at least one provider's breaker to close
+    if weather_failures > 0:
+        retry = time.time() + backoff_delay(weather_failures - 1, WEATHER_RETRY_INTERVAL,
+                                            WEATHER_RETRY_MAX)
+        return max(retry, session.next_attempt([p.url for p in weather_providers]))
+    
+    # Update weather every 10 minutes, or right away if it's the first time
+    if last_weather_update == 0:
+        return time.time()
+    
+    # Don't ask again while the server says our copy is still fresh
+    return max(last_weather_update + WEATHER_UPDATE_INTERVAL, weather_fresh_until)
+
+
+def request_render():
+    """Mark the current screen as needing a redraw"""
+    global render_pending
+    render_pending = True
+
+
+def on_weather_due(force=False):
+    """Start a background weather refresh (asking the servers even if still fresh with force)"""
+    logger.info("Updating weather data...")
+    fetcher.submit('weather', partial(fetch_weather, force=force), on_weather_fetched)
+
+
+def on_weather_fetched(update, error):
+    """Publish new weather, redraw, and schedule the next refresh"""
+    apply_weather(update, error)
+    request_render()
+    scheduler.call_later(max(next_weather_update() - time.time(), 0), 'weather', on_weather_due)
+
+
+def on_joke_due():
+    """Start a background joke refresh (paused in quiet mode, resumed on wake)"""
+    if power.mode == QUIET:
+        logger.debug("Joke refresh paused for quiet hours")
+        return
+    logger.info("Updating joke...")
+    fetcher.submit('joke', fetch_joke, on_joke_fetched)
+
+
+def on_joke_fetched(joke, error):
+    """Publish the new joke, redraw if it is on screen, and schedule the next refresh"""
+    apply_joke(joke, error)
+    if SCREENS[current_screen][0] == 'advisor':
+        request_render()
+    scheduler.call_later(max(next_joke_update() - time.time(), 0), 'joke', on_joke_due)
+
+
+def on_minute():
+    """Redraw the clock on every minute boundary (not while the backlight is off)"""
+    if SCREENS[current_screen][0] == 'weather' and not power.blanked:
+        request_render()
+    schedule_next_minute()
+
+
+def schedule_next_minute():
+    """Arm the clock timer for the start of the next minute"""
+    now = time.time()
+    scheduler.call_at_wall(now - (now % 60) + 60, 'minute', on_minute)
+
+
+def on_hour():
+    """Move the forecast and advice windows on by an hour, without refetching"""
+    global clothing_advice
     
-    return False
+    hourly = weather_data.get('hourly')
+    if hourly:
+        hourly.window_at(time.time(), FORECAST_HOURS)
+        clothing_advice = build_clothing_advice(weather_data)
+    if SCREENS[current_screen][0] in ('advisor', 'forecast'):
+        request_render()
+    schedule_next_hour()
+
+
+def schedule_next_hour():
+    """Arm the forecast timer for the start of the next hour"""
+    now = time.time()
+    scheduler.call_at_wall(now - (now % 3600) + 3600, 'hour', on_hour)
 
 
-def should_update_weather():
-    """Check if weather should be updated"""
-    current_time = time.time()
-    time_since_last = current_time - last_weather_update
+def on_rotate():
+    """Switch to the next screen in the rotation"""
+    if power.mode == QUIET:
+        return  # the clock screen stays up; waking re-arms the rotation
+    switch_screen(current_screen + 1)
+
+
+def switch_screen(index):
+    """Show screen index (wrapping) for its full duration"""
+    global current_screen
+    
+    current_screen = index % len(SCREENS)
+    name, duration, _, _ = SCREENS[current_screen]
+    logger.debug(f"Switching to {name} display")
+    request_render()
+    scheduler.call_later(duration, 'rotate', on_rotate)
+
+
+def on_gesture(gesture):
+    """
+    Act on a touch gesture (scheduler thread).
+    
+    Swipe left or tap the right half for the next screen, swipe right or
+    tap the left half for the previous one; swipe down or long-press to
+    refetch weather and joke now.
+    """
+    global touch_received
+    
+    kind = gesture.kind
+    metrics.inc('touch_gestures', kind=kind)
+    
+    # In quiet hours a touch wakes the display; the first one only wakes it
+    now = time.time()
+    power.touched(now)
+    if update_power_mode(now):
+        touch_received = gesture.received
+        return
     
-    # Update weather every 10 minutes, or if it's the first time
-    if last_weather_update == 0 or time_since_last >= WEATHER_UPDATE_INTERVAL:
-        return True
+    if kind == 'swipe_left' or (kind == 'tap' and gesture.x >= SCREEN_WIDTH // 2):
+        step = 1
+    elif kind == 'swipe_right' or kind == 'tap':
+        step = -1
+    elif kind in ('swipe_down', 'long_press'):
+        logger.info("Refresh requested from the touchscreen")
+        on_weather_due(force=True)
+        on_joke_due()
+        return
+    else:
+        return
     
-    # If there were failures, try again sooner
-    if weather_failures > 0 and time_since_last >= 60:  # Retry after 1 minute on failure
-        return True
+    touch_received = gesture.received
+    switch_screen(current_screen + step)
+
+
+def update_power_mode(now):
+    """Apply the power mode for now and arm the next change; True if it changed"""
+    changed = power.update(now)
+    if changed:
+        if power.mode == QUIET:
+            enter_quiet_mode()
+        else:
+            leave_quiet_mode()
+    next_change = power.next_change(now)
+    if next_change is not None:
+        scheduler.call_at_wall(next_change, 'power', lambda: update_power_mode(time.time()))
+    return changed
+
+
+def enter_quiet_mode():
+    """Clock screen only, redrawn each minute; no rotation, animation or jokes"""
+    global current_screen, transition
+    
+    logger.info(f"Quiet mode until {datetime.fromtimestamp(power.next_change(time.time())):%H:%M}"
+                f" (backlight {QUIET_BRIGHTNESS}%)")
+    for timer in ('rotate', 'joke', 'transition', 'seconds'):
+        scheduler.cancel(timer)
+    transition = None
+    current_screen = 0
+    request_render()
+
+
+def leave_quiet_mode():
+    """Back to the rotation, catching up on the joke if it came due"""
+    hours, wakeups, cpu = power.per_hour(QUIET)
+    if wakeups is not None:
+        logger.info(f"Full mode; quiet mode so far: {hours:.1f} h, "
+                    f"{wakeups:.0f} wakeups/h, {cpu:.2f} s CPU/h")
+    switch_screen(current_screen)
+    scheduler.call_later(max(next_joke_update() - time.time(), 0), 'joke', on_joke_due)
+
+
+def start_power():
+    """Read the quiet hours and find the backlight, then apply the current mode"""
+    global power
     
-    return False
+    if not QUIET_HOURS:
+        return
+    try:
+        quiet_hours = QuietHours.parse(QUIET_HOURS)
+    except ValueError as e:
+        logger.error(f"{e}; quiet hours disabled")
+        return
+    backlight = Backlight.find(BACKLIGHT_DIR, BACKLIGHT_NAME)
+    if backlight is None:
+        logger.warning(f"No backlight under {BACKLIGHT_DIR}, quiet hours will not dim the display")
+    power = PowerProfile(quiet_hours, backlight, QUIET_BRIGHTNESS / 100, WAKE_TIME,
+                         usage=lambda: (scheduler.wakeups, cpu_seconds()))
+    logger.info(f"Quiet hours {quiet_hours}")
+    update_power_mode(time.time())
+
+
+def power_usage(index):
+    """Per-mode samples for the power gauges: 1 for wakeups/h, 2 for CPU s/h"""
+    now = time.time()
+    samples = []
+    for mode in MODES:
+        value = power.per_hour(mode, now)[index]
+        if value is not None:
+            samples.append(({'mode': mode}, round(value, 3)))
+    return samples
+
+
+def note_touch_latency():
+    """Record time from the gesture to its first frame on screen"""
+    global touch_received
+    
+    if touch_received is not None:
+        metrics.observe('touch_to_frame', time.time() - touch_received)
+        touch_received = None
 
 
-def ensure_fbi_available():
-    """Check if FBI is available on the system"""
+def start_touch():
+    """Read gestures from the touchscreen, if there is one"""
+    global touch_reader
+    
+    if TOUCH_DEVICE == 'off':
+        return
+    path = TOUCH_DEVICE or find_touch_device()
+    if not path:
+        logger.info("No touchscreen found, screens rotate on timers only")
+        return
     try:
-        result = subprocess.run(['which', 'fbi'], capture_output=True, text=True)
-        if result.returncode == 0:
-            logger.info(f"FBI found at: {result.stdout.strip()}")
-            return True
-        else:
-            logger.error("FBI not found. Install with: sudo apt-get install fbi")
-            return False
-    except Exception as e:
-        logger.error(f"Error checking for FBI: {e}")
+        calibration = Calibration.parse(TOUCH_CALIBRATION, SCREEN_WIDTH, SCREEN_HEIGHT,
+                                        TOUCH_SWAP_XY)
+        reader = TouchReader(path, calibration,
+                             lambda gesture: scheduler.post('touch', partial(on_gesture, gesture)))
+        reader.start()
+        touch_reader = reader
+    except (OSError, ValueError) as e:
+        logger.warning(f"Touch input unavailable: {e}")
+
+
+def animation_enabled():
+    """True if the display backend is fast enough for animation frames (not in quiet mode)"""
+    return getattr(display_backend, 'animated', False) and power.mode == FULL
+
+
+def present_frame(img, rects=None):
+    """Write a one-off animation frame straight to the display, without diffing"""
+    if not display_backend.present(img, rects, keep_packed=False):
+        damage_tracker.reset()
+        metrics.inc('present_failures')
         return False
+    damage_tracker.mark_presented(img)
+    return True
+
+
+def present_in_budget(pacer, index, img, rects=None):
+    """Present an animation frame unless its slot is already over"""
+    if pacer.late(index, scheduler.clock()):
+        metrics.inc('animation_frames_dropped')
+        return
+    if present_frame(img, rects):
+        metrics.inc('animation_frames')
+
+
+def start_transition(index, start, end):
+    """Animate from the frame on screen to screen index's frame end"""
+    global transition
+    
+    transition = (Transition(SCREEN_TRANSITION, start, end),
+                  FramePacer(ANIMATION_FPS, scheduler.clock()), index)
+    on_transition_frame()
+    note_touch_latency()
+
+
+def on_transition_frame():
+    """Show the next transition frame, or the new screen once it is over"""
+    global transition
+    
+    effect, pacer, index = transition
+    dropped = pacer.dropped
+    slot = pacer.advance(scheduler.clock())
+    if pacer.dropped > dropped:
+        metrics.inc('animation_frames_dropped', pacer.dropped - dropped)
+    
+    progress = slot * pacer.interval / TRANSITION_TIME
+    if progress >= 1:
+        transition = None
+        show_screen(index, effect.end)
+        return
+    
+    with metrics.time('animate', effect=effect.kind):
+        img = effect.frame(progress)
+    present_in_budget(pacer, slot, img)
+    scheduler.call_at(pacer.due(slot + 1), 'transition', on_transition_frame)
+
+
+def seconds_bar_active():
+    """The seconds bar runs on the clock screen while nothing else animates"""
+    return (SHOW_SECONDS and transition is None and animation_enabled()
+            and shown_screen == current_screen and SCREENS[current_screen][0] == 'weather')
+
+
+def start_seconds_bar():
+    global seconds_pacer
+    
+    if seconds_bar_active():
+        seconds_pacer = FramePacer(ANIMATION_FPS, scheduler.clock())
+        on_seconds_frame()
+
+
+def on_seconds_frame():
+    """Redraw the seconds bar, then sleep until it next grows by a pixel"""
+    if not seconds_bar_active():
+        return
+    
+    now, wall = scheduler.clock(), time.time()
+    slot = seconds_pacer.slot(now)
+    with metrics.time('animate', effect='seconds'):
+        img = seconds_bar.frame(shown_frame, wall)
+    present_in_budget(seconds_pacer, slot, img, [seconds_bar.rect])
+    
+    # The bar follows the wall clock, the frame slots the scheduler's
+    next_frame = max(seconds_pacer.due(slot + 1), now + seconds_bar.next_change(wall) - wall)
+    scheduler.call_at(next_frame, 'seconds', on_seconds_frame)
+
+
+def show_screen(index, img):
+    """Present screen index's frame through the damage tracker"""
+    global shown_screen, shown_frame
+    
+    if not display_image(img):
+        logger.warning("Failed to display image, retrying...")
+        scheduler.call_later(DISPLAY_RETRY_INTERVAL, 'render_retry', request_render)
+        return
+    shown_screen, shown_frame = index, img
+    if not startup_profile.finished:
+        report_first_frame()
+    note_touch_latency()
+    start_seconds_bar()
+
+
+def show_placeholder():
+    """Paint the background and a separator directly while fonts and data load"""
+    if display_backend.fill(BG_COLOR):
+        middle = SCREEN_HEIGHT // 2
+        display_backend.fill(ACCENT_COLOR, [(30, middle - 1, SCREEN_WIDTH - 30, middle + 1)])
+
+
+def report_first_frame():
+    """Log time-to-first-frame, with the phase breakdown if --profile-startup"""
+    startup_profile.finish('first frame')
+    metrics.gauge('time_to_first_frame_seconds', startup_profile.elapsed,
+                  "Seconds from process start to the first frame on screen")
+    logger.info(f"First frame {startup_profile.elapsed() * 1000:.0f} ms after process start")
+    if profile_startup:
+        print(startup_profile.report(), flush=True)
+
+
+def render_current_screen():
+    """Render and present the current screen if anything on it changed"""
+    global render_pending
+    
+    if not render_pending:
+        return
+    # A transition to this screen finishes first; the render stays pending
+    if transition is not None and transition[2] == current_screen:
+        return
+    render_pending = False
+    
+    name, _, create_image, inputs = SCREENS[current_screen]
+    
+    def render():
+        with metrics.time('render', screen=name):
+            return create_image()
+    
+    img = frames.get(current_screen, (theme_key(), inputs()), render)
+    
+    # Animate screen changes, and restart from whatever is on screen if
+    # the target changes mid-transition (e.g. two quick swipes)
+    on_screen = damage_tracker.last_frame
+    if (SCREEN_TRANSITION in TRANSITIONS and animation_enabled() and on_screen is not None
+            and (transition is not None
+                 or (shown_screen is not None and shown_screen != current_screen))):
+        start_transition(current_screen, on_screen, img)
+        return
+    show_screen(current_screen, img)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Clock and weather display for the PiTFT")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="print the time spent in each startup phase "
+                             "once the first frame is up")
+    return parser.parse_args(argv)
+
+
+startup_profile.mark('module setup')
 
 
 def main():
     """Main function with proper error handling and resource management"""
-    global running, display_start_time, show_advisor_screen, last_joke_update
+    global current_screen, profile_startup
+    
+    profile_startup = parse_args().profile_startup
     
     try:
-        logger.info("Starting Clock Weather FBI Application")
+        logger.info("Starting Clock Weather Application")
         
-        # Setup signal handlers
-        signal.signal(signal.SIGTERM, cleanup)
-        signal.signal(signal.SIGINT, cleanup)
+        # Signals are handled on the display loop, not in signal context
+        scheduler.on_signal(signal.SIGTERM, 'shutdown', stop)
+        scheduler.on_signal(signal.SIGINT, 'shutdown', stop)
+        scheduler.on_signal(signal.SIGUSR1, 'dump-log', lambda: dump_recent_logs('SIGUSR1'))
+        threading.excepthook = on_thread_crash
         atexit.register(cleanup)
         
-        # Check if FBI is available
-        if not ensure_fbi_available():
-            logger.error("FBI not available, cannot start display")
+        # Check framebuffer access
+        if not os.path.exists(FRAMEBUFFER_DEVICE):
+            logger.error(f"Framebuffer device {FRAMEBUFFER_DEVICE} not found")
             sys.exit(1)
         
-        # Check framebuffer access
-        if not os.path.exists('/dev/fb0'):
-            logger.error("Framebuffer device /dev/fb0 not found")
+        # Open the output backend
+        if not open_display_backend():
+            logger.error("No display backend available, cannot start display")
             sys.exit(1)
+        startup_profile.mark('display open')
         
-        # Initial weather fetch
-        logger.info("Fetching initial weather data...")
-        fetch_weather()
+        # Something on screen right away, before fonts and data are loaded
+        show_placeholder()
+        startup_profile.mark('placeholder')
         
-        # Initial joke fetch
-        logger.info("Fetching initial joke...")
-        fetch_joke()
+        if SCREEN_TRANSITION not in TRANSITIONS + ('none',):
+            logger.warning(f"Unknown CLOCK_TRANSITION '{SCREEN_TRANSITION}', using none")
+        elif (SCREEN_TRANSITION != 'none' or SHOW_SECONDS) and not animation_enabled():
+            logger.warning(f"Animation needs the framebuffer backend, "
+                           f"'{display_backend.name}' shows screens without it")
         
-        # Initialize display timing
-        display_start_time = time.time()
-        show_advisor_screen = False
+        # Serve in-process metrics
+        start_metrics()
+        startup_profile.mark('metrics')
+        
+        # Load all screen fonts once
+        fonts.preload(SCREEN_FONTS)
+        startup_profile.mark('fonts')
+        
+        # Taps and swipes arrive as scheduler events
+        start_touch()
+        startup_profile.mark('touch')
+        
+        # Dim and slow down during quiet hours
+        start_power()
+        
+        # Warm start from the last good data on disk
+        load_cached_data()
+        startup_profile.mark('cached data')
+        
+        # Start on the weather screen and arm all timers. The first
+        # weather and joke fetches are posted, so they start in the
+        # background just after the first frame: the frame does not wait
+        # for the network, nor share the CPU with importing requests.
+        current_screen = 0
+        request_render()
+        if power.mode == FULL:
+            scheduler.call_later(SCREENS[0][1], 'rotate', on_rotate)
+        schedule_next_minute()
+        schedule_next_hour()
+        scheduler.post('weather', on_weather_due)
+        scheduler.post('joke', on_joke_due)
         
         logger.info("Starting main display loop...")
         
         while running:
             try:
-                current_time = time.time()
-                
-                # Update weather if needed
-                if should_update_weather():
-                    logger.info("Updating weather data...")
-                    fetch_weather()
-                
-                # Update joke if needed
-                if should_update_joke():
-                    logger.info("Updating joke...")
-                    fetch_joke()
-                
-                # Determine which screen to show based on timing
-                time_in_cycle = ((current_time - display_start_time) %
-                                 TOTAL_CYCLE_TIME)
-                
-                if time_in_cycle < WEATHER_DISPLAY_TIME:
-                    # Show weather screen
-                    if show_advisor_screen:
-                        show_advisor_screen = False
-                        logger.debug("Switching to weather display")
-                    img = create_display_image()
-                elif time_in_cycle < WEATHER_DISPLAY_TIME + ADVISOR_DISPLAY_TIME:
-                    # Show advisor screen
-                    if not show_advisor_screen:
-                        show_advisor_screen = True
-                        logger.debug("Switching to advisor display")
-                    img = create_advisor_image()
-                else:
-                    # Show forecast screen
-                    if show_advisor_screen:
-                        show_advisor_screen = False
-                        logger.debug("Switching to forecast display")
-                    img = create_forecast_image()
-                
-                if not display_image(img):
-                    logger.warning("Failed to display image, retrying...")
-                    time.sleep(2)
-                    continue
+                render_current_screen()
                 
-                # Sleep for a short time to avoid excessive updates
-                time.sleep(1)
+                # Sleep until the next deadline or event
+                scheduler.run_once()
                 
             except KeyboardInterrupt:
                 logger.info("Interrupted by user")
@@ -934,7 +1642,8 @@ def main():
                 time.sleep(2)
         
     except Exception as e:
-        logger.error(f"Fatal error: {e}")
+        logger.exception(f"Fatal error: {e}")
+        dump_recent_logs('crash')
         sys.exit(1)
     finally:
         cleanup()
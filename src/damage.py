@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Damage tracking for partial display updates
+
+DamageTracker compares each new frame with the last one presented and
+returns the rectangles that changed, so the output backend only writes
+those rows/spans. Diffing runs in PIL's C code (ImageChops.difference
+and getbbox); no per-pixel Python is involved.
+"""
+
+from PIL import ImageChops
+
+# Rows per strip when splitting the changed area into rectangles
+DAMAGE_STRIP_HEIGHT = 8
+
+
+class DamageTracker:
+    """
+    Track the last presented frame and report damaged rectangles.
+
+    Rectangles are (left, top, right, bottom) with exclusive right/bottom,
+    the same convention as PIL bounding boxes. Frames passed to update()
+    are kept by reference and must not be modified afterwards.
+    """
+
+    def __init__(self, strip_height=DAMAGE_STRIP_HEIGHT):
+        self.strip_height = strip_height
+        self.last_frame = None
+
+    def reset(self):
+        """Forget the last frame so the next update reports a full redraw"""
+        self.last_frame = None
+
+    def mark_presented(self, img):
+        """Record img as the frame on screen without diffing (it was written directly)"""
+        self.last_frame = img
+
+    def update(self, img):
+        """Return the rectangles that differ from the last frame and remember img"""
+        last, self.last_frame = self.last_frame, img
+
+        if last is None or last.size != img.size or last.mode != img.mode:
+            return [(0, 0, img.size[0], img.size[1])]
+
+        diff = ImageChops.difference(last, img)
+        bbox = diff.getbbox()
+        if bbox is None:
+            return []
+
+        return self._split(diff, bbox)
+
+    def _split(self, diff, bbox):
+        """Split the overall bounding box into rectangles around changed strips"""
+        left, top, right, bottom = bbox
+        rects = []
+        current = None
+
+        for y in range(top, bottom, self.strip_height):
+            y_end = min(y + self.strip_height, bottom)
+            strip_bbox = diff.crop((left, y, right, y_end)).getbbox()
+
+            if strip_bbox is None:
+                if current:
+                    rects.append(tuple(current))
+                    current = None
+                continue
+
+            x0 = left + strip_bbox[0]
+            x1 = left + strip_bbox[2]
+            y0 = y + strip_bbox[1]
+            y1 = y + strip_bbox[3]
+            if current is None:
+                current = [x0, y0, x1, y1]
+            else:
+                current[0] = min(current[0], x0)
+                current[2] = max(current[2], x1)
+                current[3] = y1
+
+        if current:
+            rects.append(tuple(current))
+        return rects
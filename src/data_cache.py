@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Persistent on-disk cache for API responses
+
+Keeps the last good weather and joke responses across restarts so the
+first frame after a reboot can show real data, even without network.
+Each key is one small JSON file, written atomically (temp file, fsync,
+rename), stamped with the time it was stored, the response's ETag /
+Last-Modified validators and how long the server said it stays fresh.
+Entries expire after a TTL, and the oldest ones are evicted when the
+directory grows past a size limit.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_SUFFIX = '.json'
+
+CacheEntry = namedtuple('CacheEntry', ['payload', 'stored_at', 'etag', 'last_modified',
+                                       'fresh_until'])
+
+
+class DiskCache:
+    """Directory of JSON cache files with a TTL and a total size limit"""
+
+    def __init__(self, directory, ttl=86400, max_bytes=1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def get(self, key, max_age=None):
+        """Return the CacheEntry for key, or None if missing, expired or unreadable"""
+        max_age = self.ttl if max_age is None else max_age
+        path = self._path(key)
+
+        try:
+            with open(path, encoding='utf-8') as f:
+                record = json.load(f)
+            entry = CacheEntry(record['payload'], float(record['stored_at']),
+                               record.get('etag'), record.get('last_modified'),
+                               record.get('fresh_until'))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Discarding unreadable cache entry {path}: {e}")
+            self._remove(path)
+            return None
+
+        age = time.time() - entry.stored_at
+        if age > max_age:
+            logger.info(f"Cache entry '{key}' expired ({age / 3600:.1f} h old)")
+            return None
+
+        return entry
+
+    def put(self, key, payload, headers=None, fresh_until=None):
+        """
+        Store payload (JSON-serializable) for key; return True on success.
+
+        fresh_until is the time until which the payload may be reused
+        without revalidating, as derived from Cache-Control/Expires.
+        """
+        headers = headers or {}
+        record = {
+            'key': key,
+            'stored_at': time.time(),
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'fresh_until': fresh_until,
+            'payload': payload,
+        }
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=f".{key}.", suffix='.tmp',
+                                            dir=self.directory)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(record, f, separators=(',', ':'))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self._path(key))
+            except BaseException:
+                self._remove(tmp_path)
+                raise
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not write cache entry '{key}': {e}")
+            return False
+
+        self.evict()
+        return True
+
+    def evict(self):
+        """Delete expired entries, then the oldest ones until under max_bytes"""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+
+        now = time.time()
+        entries = []
+        for name in names:
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if now - st.st_mtime > self.ttl:
+                self._remove(path)
+            else:
+                entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            logger.info(f"Evicting cache entry {path} ({size} bytes)")
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
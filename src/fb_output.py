@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Display output backends for the clock/weather app
+
+FramebufferBackend writes PIL images straight into a memory-mapped
+framebuffer device (/dev/fb0, /dev/fb1). FbiBackend keeps the old
+behaviour of saving a PNG and handing it to an fbi process.
+"""
+
+import fcntl
+import logging
+import mmap
+import os
+import shutil
+import stat
+import struct
+import subprocess
+import tempfile
+import time
+
+from metrics import metrics
+from pixel_format import (
+    PIXEL_FORMAT_BGR565,
+    PIXEL_FORMAT_RGB565,
+    PIXEL_FORMAT_XBGR8888,
+    PIXEL_FORMAT_XRGB8888,
+    create_packer,
+    pack_color,
+)
+
+logger = logging.getLogger(__name__)
+
+# linux/fb.h ioctls
+FBIOGET_VSCREENINFO = 0x4600
+FBIOGET_FSCREENINFO = 0x4602
+
+# struct fb_var_screeninfo is 160 bytes; only the first 20 __u32 are needed:
+# xres, yres, xres_virtual, yres_virtual, xoffset, yoffset, bits_per_pixel,
+# grayscale, then (offset, length, msb_right) for red, green, blue, transp.
+FB_VAR_SCREENINFO_SIZE = 160
+FB_VAR_FORMAT = '20I'
+
+# struct fb_fix_screeninfo uses unsigned long fields, so its size depends on
+# the architecture. Native struct alignment matches the kernel layout.
+FB_FIX_FORMAT = '@16sLIIIIHHHILIIHHH'
+FB_FIX_SCREENINFO_SIZE = struct.calcsize(FB_FIX_FORMAT)
+
+class FramebufferInfo:
+    """Geometry and pixel layout of a framebuffer"""
+
+    def __init__(self, width, height, bits_per_pixel, line_length=None,
+                 red_offset=None, blue_offset=None):
+        self.width = width
+        self.height = height
+        self.bits_per_pixel = bits_per_pixel
+        self.bytes_per_pixel = bits_per_pixel // 8
+        self.line_length = line_length or width * self.bytes_per_pixel
+
+        if bits_per_pixel == 16:
+            red_offset = 11 if red_offset is None else red_offset
+            blue_offset = 0 if blue_offset is None else blue_offset
+            self.pixel_format = (PIXEL_FORMAT_RGB565 if red_offset > blue_offset
+                                 else PIXEL_FORMAT_BGR565)
+        elif bits_per_pixel == 32:
+            red_offset = 16 if red_offset is None else red_offset
+            blue_offset = 0 if blue_offset is None else blue_offset
+            self.pixel_format = (PIXEL_FORMAT_XRGB8888 if red_offset > blue_offset
+                                 else PIXEL_FORMAT_XBGR8888)
+        else:
+            raise ValueError(f"Unsupported framebuffer depth: {bits_per_pixel} bpp")
+
+    @property
+    def size(self):
+        """Number of bytes needed to map the visible screen"""
+        return self.line_length * self.height
+
+    def __repr__(self):
+        return (f"FramebufferInfo({self.width}x{self.height}, "
+                f"{self.pixel_format}, stride={self.line_length})")
+
+
+def query_framebuffer_info(fd):
+    """Read geometry and pixel format from a framebuffer fd via ioctl"""
+    var_buf = bytearray(FB_VAR_SCREENINFO_SIZE)
+    fcntl.ioctl(fd, FBIOGET_VSCREENINFO, var_buf, True)
+    var = struct.unpack_from(FB_VAR_FORMAT, var_buf)
+
+    fix_buf = bytearray(FB_FIX_SCREENINFO_SIZE)
+    fcntl.ioctl(fd, FBIOGET_FSCREENINFO, fix_buf, True)
+    fix = struct.unpack(FB_FIX_FORMAT, fix_buf)
+
+    xres, yres, bits_per_pixel = var[0], var[1], var[6]
+    red_offset, blue_offset = var[8], var[14]
+    line_length = fix[9]
+
+    return FramebufferInfo(xres, yres, bits_per_pixel, line_length,
+                           red_offset=red_offset, blue_offset=blue_offset)
+
+
+class FramebufferBackend:
+    """
+    Blit PIL images straight into a memory-mapped framebuffer.
+
+    The device can be a real fbdev node or a plain file standing in for
+    one. Plain files do not answer the fbdev ioctls, so their geometry
+    must be passed in explicitly (width, height, bits_per_pixel).
+    Frames are packed by a pixel_format packer that is created for the
+    screen geometry on the first frame and reused for every frame after;
+    a frame is packed into the packer's own buffer, with no copy.
+
+    frame_store (the app's FrameCache) keeps a packed copy of a cached
+    frame once it is shown a second time, within the cache's byte
+    budget, so later showings skip packing. Frames shown only once are
+    never copied.
+    """
+
+    name = 'framebuffer'
+    animated = True  # frames are cheap enough for transitions
+
+    def __init__(self, device='/dev/fb0', width=None, height=None,
+                 bits_per_pixel=None, line_length=None, dither=False, frame_store=None):
+        self.device = device
+        self.dither = dither
+        self.frame_store = frame_store
+        self.fd = None
+        self.fbmem = None
+        self.info = None
+        self.packer = None
+        self._override = (width, height, bits_per_pixel, line_length)
+
+    def open(self):
+        """Open and mmap the framebuffer"""
+        if self.fbmem is not None:
+            return
+
+        fd = os.open(self.device, os.O_RDWR)
+        try:
+            self.info = self._read_info(fd)
+
+            # A regular file standing in for the framebuffer may be empty
+            if stat.S_ISREG(os.fstat(fd).st_mode) and os.fstat(fd).st_size < self.info.size:
+                os.ftruncate(fd, self.info.size)
+
+            self.fbmem = mmap.mmap(fd, self.info.size, mmap.MAP_SHARED,
+                                   mmap.PROT_READ | mmap.PROT_WRITE)
+        except Exception:
+            os.close(fd)
+            raise
+
+        self.fd = fd
+        logger.info(f"Framebuffer {self.device} opened: {self.info}")
+
+    def _read_info(self, fd):
+        width, height, bits_per_pixel, line_length = self._override
+        if width and height and bits_per_pixel:
+            return FramebufferInfo(width, height, bits_per_pixel, line_length)
+
+        try:
+            return query_framebuffer_info(fd)
+        except OSError as e:
+            raise OSError(f"{self.device} is not a framebuffer and no geometry "
+                          f"was given: {e}") from e
+
+    def present(self, img, rects=None, keep_packed=True):
+        """
+        Write a frame to the framebuffer.
+
+        If rects is given, only those (left, top, right, bottom) regions are
+        copied into the framebuffer; everything else is left untouched.
+        On SPI panels (fbtft deferred I/O) only the touched pages are
+        flushed, so this also limits bus traffic. keep_packed=False is
+        for one-off animation frames that will not be shown again.
+        """
+        try:
+            self.open()
+            info = self.info
+
+            if img.size != (info.width, info.height):
+                img = img.resize((info.width, info.height))
+                rects = None
+
+            if self.packer is None:
+                self.packer = create_packer(info.pixel_format, info.width, info.height,
+                                            dither=self.dither)
+
+            if keep_packed and self.frame_store is not None:
+                data = self._pack(img)
+            else:
+                with metrics.time('encode', backend=self.name):
+                    data = self.packer.pack(img)
+            row_bytes = info.width * info.bytes_per_pixel
+
+            if rects is None:
+                rects = [(0, 0, info.width, info.height)]
+
+            with metrics.time('present', backend=self.name):
+                for rect in rects:
+                    self._write_rect(data, row_bytes, rect)
+
+            return True
+
+        except Exception as e:
+            logger.error(f"Error writing to framebuffer {self.device}: {e}")
+            return False
+
+    def fill(self, color, rects=None):
+        """
+        Fill rects (default: the whole screen) with a solid color.
+
+        Needs no PIL image and no packer, so a placeholder can be shown
+        before the heavier modules are loaded.
+        """
+        try:
+            self.open()
+            info = self.info
+            pixel = pack_color(info.pixel_format, color)
+            for left, top, right, bottom in rects or [(0, 0, info.width, info.height)]:
+                right, bottom = min(right, info.width), min(bottom, info.height)
+                span = pixel * max(0, right - left)
+                for row in range(top, bottom):
+                    offset = row * info.line_length + left * info.bytes_per_pixel
+                    self.fbmem[offset:offset + len(span)] = span
+            return True
+        except Exception as e:
+            logger.error(f"Error filling framebuffer {self.device}: {e}")
+            return False
+
+    def _pack(self, img):
+        """Packed bytes for img, from frame_store if it has them"""
+        data = self.frame_store.packed(img)
+        if data is not None:
+            metrics.inc('packed_frame_reuses', backend=self.name)
+            return data
+
+        with metrics.time('encode', backend=self.name):
+            data = self.packer.pack(img)
+            # RGB565 packers return a view of a buffer reused by the next
+            # pack, so a frame that is being shown again gets its own copy
+            if self.frame_store.wants_packed(img):
+                data = bytes(data)
+                self.frame_store.attach_packed(img, data)
+        return data
+
+    def _write_rect(self, data, row_bytes, rect):
+        """Copy one rectangle of packed pixels into the framebuffer"""
+        info = self.info
+        left, top, right, bottom = rect
+        bpp = info.bytes_per_pixel
+
+        if left == 0 and right == info.width and row_bytes == info.line_length:
+            # Full-width band with no padding: one contiguous copy
+            start = top * row_bytes
+            end = bottom * row_bytes
+            self.fbmem[start:end] = data[start:end]
+            return
+
+        span = (right - left) * bpp
+        for row in range(top, bottom):
+            src = row * row_bytes + left * bpp
+            dst = row * info.line_length + left * bpp
+            self.fbmem[dst:dst + span] = data[src:src + span]
+
+    def clear(self):
+        """Blank the framebuffer"""
+        try:
+            self.open()
+            self.fbmem[:] = bytes(len(self.fbmem))
+            logger.info("Framebuffer cleared")
+        except Exception as e:
+            logger.warning(f"Could not clear framebuffer: {e}")
+
+    def close(self):
+        """Unmap and close the framebuffer"""
+        if self.fbmem is not None:
+            try:
+                self.fbmem.close()
+            except Exception as e:
+                logger.warning(f"Error unmapping framebuffer: {e}")
+            self.fbmem = None
+        self.packer = None
+        if self.fd is not None:
+            try:
+                os.close(self.fd)
+            except OSError as e:
+                logger.warning(f"Error closing framebuffer: {e}")
+            self.fd = None
+
+
+class FbiBackend:
+    """
+    Display images by saving a PNG and respawning fbi on every frame.
+
+    fbi's stderr goes to one temporary file that is truncated for each
+    spawn and read only when fbi exits right away. A pipe nobody reads
+    would leave an fd per frame until collected, and block fbi once it
+    filled up.
+    """
+
+    name = 'fbi'
+    animated = False
+
+    def __init__(self, device='/dev/fb0', filename='/tmp/clock_display.png'):
+        self.device = device
+        self.filename = filename
+        self.process = None
+        self._stderr = None
+
+    def open(self):
+        """Check if FBI is available on the system"""
+        path = shutil.which('fbi')
+        if path is None:
+            raise RuntimeError("FBI not found. Install with: sudo apt-get install fbi")
+        logger.info(f"FBI found at: {path}")
+
+    def _stop_process(self, timeout=2):
+        if self.process and self.process.poll() is None:
+            try:
+                self.process.terminate()
+                self.process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                logger.warning("FBI process did not terminate, killing...")
+                self.process.kill()
+                self.process.wait()
+            except Exception as e:
+                logger.warning(f"Error terminating FBI process: {e}")
+
+    def present(self, img, rects=None, keep_packed=True):
+        """Display image using fbi with proper error handling (always a full frame)"""
+        try:
+            # Save image
+            with metrics.time('encode', backend=self.name):
+                img.save(self.filename)
+            logger.debug(f"Image saved to {self.filename}")
+
+            # Kill existing fbi process
+            self._stop_process()
+
+            # Ensure framebuffer device exists
+            if not os.path.exists(self.device):
+                logger.error(f"Framebuffer device {self.device} not found")
+                return False
+
+            if self._stderr is None:
+                self._stderr = tempfile.TemporaryFile()
+            else:
+                self._stderr.seek(0)
+                self._stderr.truncate()
+
+            # Display with fbi
+            metrics.inc('fbi_restarts')
+            with metrics.time('present', backend=self.name):
+                self.process = subprocess.Popen([
+                    'fbi', '-T', '1', '-d', self.device, '-noverbose', '-a', self.filename
+                ], stdout=subprocess.DEVNULL, stderr=self._stderr)
+
+                # Check if fbi started successfully
+                time.sleep(0.1)
+            if self.process.poll() is not None:
+                self._stderr.seek(0)
+                stderr_output = self._stderr.read(4096).decode(errors='replace').strip()
+                logger.error(f"FBI failed to start: {stderr_output}")
+                metrics.inc('fbi_start_failures')
+                return False
+
+            return True
+
+        except Exception as e:
+            logger.error(f"Error displaying image: {e}")
+            return False
+
+    def fill(self, color, rects=None):
+        """fbi only shows whole images; there is no cheap placeholder"""
+        return False
+
+    def clear(self):
+        """Stop fbi and blank the framebuffer with dd"""
+        self._stop_process(timeout=5)
+        try:
+            if os.path.exists(self.device):
+                subprocess.run(['sudo', 'dd', 'if=/dev/zero', f'of={self.device}',
+                                'bs=1M', 'count=1'],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=5)
+                logger.info("Framebuffer cleared")
+        except Exception as e:
+            logger.warning(f"Could not clear framebuffer: {e}")
+
+    def close(self):
+        """Stop the fbi process"""
+        self._stop_process(timeout=5)
+        self.process = None
+        if self._stderr is not None:
+            self._stderr.close()
+            self._stderr = None
+
+
+def create_backend(name, device='/dev/fb0', **kwargs):
+    """Create an output backend by name ('framebuffer' or 'fbi')"""
+    if name == FramebufferBackend.name:
+        return FramebufferBackend(device, **kwargs)
+    if name == FbiBackend.name:
+        return FbiBackend(device, **kwargs)
+    raise ValueError(f"Unknown display backend: {name}")
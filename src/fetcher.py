@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Background fetching for weather and joke providers
+
+Network calls run on worker threads so a slow or dead upstream never
+blocks rendering. Each result is handed back to the scheduler thread
+through Scheduler.post(), where it is published to the renderer as a
+new snapshot in a single assignment.
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundFetcher:
+    """
+    Run fetch jobs on daemon threads, at most one in flight per name.
+
+    submit() returns immediately. When the job finishes, on_done(result,
+    error) runs on the scheduler thread; exactly one of result/error is
+    meaningful. A job that hangs only ties up its own thread, and a new
+    submit() for the same name is refused until it returns.
+    """
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def submit(self, name, fetch, on_done):
+        """Start fetch() in the background; return False if one is already running"""
+        with self._lock:
+            if name in self._in_flight:
+                started = self._in_flight[name]
+                logger.debug(f"Fetch '{name}' still running after {time.time() - started:.0f}s")
+                return False
+            self._in_flight[name] = time.time()
+
+        thread = threading.Thread(target=self._run, args=(name, fetch, on_done),
+                                  name=f"fetch-{name}", daemon=True)
+        thread.start()
+        return True
+
+    def _run(self, name, fetch, on_done):
+        result, error = None, None
+        try:
+            result = fetch()
+        except Exception as e:
+            error = e
+
+        def deliver():
+            with self._lock:
+                self._in_flight.pop(name, None)
+            on_done(result, error)
+
+        self.scheduler.post(f"{name}-done", deliver)
+
+    def in_flight(self, name):
+        """True while a fetch for name is running"""
+        with self._lock:
+            return name in self._in_flight
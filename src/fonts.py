@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Process-wide TrueType font cache
+
+FontRegistry loads each (path, size, variant) face once and hands the
+same ImageFont object to every screen. Variants ('regular', 'bold', ...)
+map to an ordered list of candidate font files; the first one that loads
+wins, and PIL's built-in font is used only when none of them do.
+"""
+
+import logging
+import os
+import time
+
+from PIL import ImageFont
+
+logger = logging.getLogger(__name__)
+
+DEJAVU_DIR = "/usr/share/fonts/truetype/dejavu"
+LIBERATION_DIR = "/usr/share/fonts/truetype/liberation"
+
+DEFAULT_FONT_PATHS = {
+    'regular': [
+        os.path.join(DEJAVU_DIR, "DejaVuSans.ttf"),
+        os.path.join(LIBERATION_DIR, "LiberationSans-Regular.ttf"),
+    ],
+    'bold': [
+        os.path.join(DEJAVU_DIR, "DejaVuSans-Bold.ttf"),
+        os.path.join(LIBERATION_DIR, "LiberationSans-Bold.ttf"),
+    ],
+}
+
+
+def load_default_font(size):
+    """PIL's built-in font, scaled when the installed Pillow supports it"""
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 only has the fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+class FontRegistry:
+    """Load-once cache of ImageFont faces keyed by (path, size, variant)"""
+
+    def __init__(self, font_paths=None):
+        self.font_paths = {variant: [p for p in paths if p]
+                           for variant, paths in (font_paths or DEFAULT_FONT_PATHS).items()}
+        self._fonts = {}
+        self._resolved = {}
+        self.load_time = 0.0
+        self.load_count = 0
+        # Bumped whenever the configuration changes, so callers caching
+        # anything drawn with these fonts know to rebuild it
+        self.generation = 0
+
+    def configure(self, variant, paths):
+        """Set candidate font files for a variant, most preferred first"""
+        self.font_paths[variant] = [p for p in paths if p]
+        self._resolved.pop(variant, None)
+        self.generation += 1
+
+    def get(self, variant='regular', size=16):
+        """Return the shared font for a variant and pixel size"""
+        path = self._resolve(variant, size)
+        key = (path, size, variant)
+        font = self._fonts.get(key)
+        if font is None:
+            font = self._load(path, size, variant)
+            self._fonts[key] = font
+        return font
+
+    def _resolve(self, variant, size):
+        """Pick the first candidate path for a variant that loads"""
+        if variant in self._resolved:
+            return self._resolved[variant]
+
+        candidates = self.font_paths.get(variant)
+        if candidates is None:
+            raise KeyError(f"Unknown font variant: {variant}")
+
+        for path in candidates:
+            try:
+                font = self._load(path, size, variant)
+            except OSError as e:
+                logger.warning(f"Font '{variant}' not usable at {path}: {e}")
+                continue
+            self._fonts[(path, size, variant)] = font
+            self._resolved[variant] = path
+            return path
+
+        logger.error(f"No font file found for '{variant}', using PIL default font")
+        self._resolved[variant] = None
+        return None
+
+    def _load(self, path, size, variant):
+        start = time.perf_counter()
+        if path is None:
+            font = load_default_font(size)
+        else:
+            font = ImageFont.truetype(path, size)
+        elapsed = time.perf_counter() - start
+        self.load_time += elapsed
+        self.load_count += 1
+        logger.debug(f"Loaded font {variant} {size}px from {path} in {elapsed * 1000:.1f} ms")
+        return font
+
+    def preload(self, specs):
+        """Load every (variant, size) in specs up front and log the cost"""
+        start = time.perf_counter()
+        for variant, size in specs:
+            self.get(variant, size)
+        elapsed = time.perf_counter() - start
+        logger.info(f"Loaded {len(self._fonts)} font faces in {elapsed * 1000:.1f} ms")
+        return elapsed
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Cache of fully rendered screen frames
+
+The rotation shows the same few screens over and over, and most of them
+only change when data refreshes. FrameCache keeps the last frame rendered
+for each screen together with the inputs it was built from (data version,
+minute, theme, ...); showing a screen whose inputs have not changed
+reuses that frame instead of drawing it again. Entries are evicted least
+recently used first once the total size passes a memory budget.
+
+A frame that is shown again can also carry its packed framebuffer bytes
+(see FramebufferBackend), counted in the same budget and dropped with
+the frame.
+"""
+
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def frame_bytes(img):
+    """Approximate memory held by a PIL image"""
+    width, height = img.size
+    return width * height * len(img.getbands())
+
+
+class FrameCache:
+    """
+    LRU cache of rendered frames, at most one per screen, within max_bytes.
+
+    Cached frames are shared: callers must not draw on them.
+    """
+
+    def __init__(self, max_bytes=8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._frames = OrderedDict()  # screen -> [key, image, size, packed, reused]
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, screen, key, render):
+        """Return the frame for screen, calling render() if key changed"""
+        entry = self._frames.get(screen)
+        if entry is not None and entry[0] == key:
+            self._frames.move_to_end(screen)
+            entry[4] = True
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        img = render()
+        self._discard(screen)  # inputs only move forward; the old frame is dead
+        size = frame_bytes(img)
+        self._frames[screen] = [key, img, size, None, False]
+        self.total_bytes += size
+        self._evict()
+        return img
+
+    def _entry(self, img):
+        for entry in self._frames.values():
+            if entry[1] is img:
+                return entry
+        return None
+
+    def packed(self, img):
+        """Packed bytes attached to cached frame img, or None"""
+        entry = self._entry(img)
+        return entry[3] if entry is not None else None
+
+    def wants_packed(self, img):
+        """True if img is a cached frame being shown again with no packed bytes yet"""
+        entry = self._entry(img)
+        return entry is not None and entry[4] and entry[3] is None
+
+    def attach_packed(self, img, data):
+        """Keep packed bytes with cached frame img, within the budget"""
+        entry = self._entry(img)
+        if entry is None or entry[3] is not None:
+            return
+        entry[3] = data
+        entry[2] += len(data)
+        self.total_bytes += len(data)
+        self._evict()
+
+    def _discard(self, screen):
+        entry = self._frames.pop(screen, None)
+        if entry is not None:
+            self.total_bytes -= entry[2]
+
+    def _evict(self):
+        # Always keep the frame just added, even if it alone is over budget
+        while self.total_bytes > self.max_bytes and len(self._frames) > 1:
+            screen, (_, _, size, _, _) = self._frames.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            logger.debug(f"Evicted frame for screen {screen!r} ({size} bytes)")
+
+    def __len__(self):
+        return len(self._frames)
+
+    def clear(self):
+        """Drop all frames"""
+        self._frames.clear()
+        self.total_bytes = 0
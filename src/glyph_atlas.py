@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Pre-rasterized glyphs for numeric text
+
+The clock digits, temperatures and forecast labels are drawn from a
+handful of characters (digits, ':', '-', '.', '°', '%', ...). A
+GlyphAtlas rasterizes each of them once per font into an alpha mask,
+with its ink offset, and caches advance widths and kerning pairs.
+Drawing a string is then a paste of the fill color through each mask
+at its pen position; FreeType is not involved after the first use.
+
+Masks hold coverage only, so one atlas per font serves every color.
+Strings containing characters outside the atlas's set are drawn with
+draw.text instead, so callers never have to check.
+"""
+
+import logging
+from collections import namedtuple
+
+from PIL import Image, ImageDraw
+
+logger = logging.getLogger(__name__)
+
+# Clock, temperature and forecast label characters
+NUMERIC_CHARS = "0123456789:-+.,°C%hms/ "
+
+# One rasterized character: its alpha mask (None for blank glyphs such
+# as space), the mask's offset from the pen position and the advance
+Glyph = namedtuple('Glyph', ['mask', 'offset', 'advance'])
+
+
+class GlyphAtlas:
+    """
+    Alpha masks, advances and kerning for chars in one font.
+
+    draw() takes the same arguments as ImageDraw.text (left-ascender
+    anchor) and places glyphs at the pen positions FreeType would use,
+    rounded to whole pixels.
+    """
+
+    def __init__(self, font, chars=NUMERIC_CHARS):
+        self.font = font
+        self.chars = frozenset(chars)
+        self._glyphs = {}
+        self._kerning = {}
+        for char in self.chars:
+            self._glyphs[char] = self._rasterize(char)
+
+    def _rasterize(self, char):
+        left, top, right, bottom = self.font.getbbox(char)
+        advance = self.font.getlength(char)
+        if right <= left or bottom <= top:
+            return Glyph(None, (0, 0), advance)
+        mask = Image.new('L', (right - left, bottom - top))
+        ImageDraw.Draw(mask).text((-left, -top), char, font=self.font, fill=255)
+        return Glyph(mask, (left, top), advance)
+
+    def covers(self, text):
+        """True if every character of text is in the atlas"""
+        return all(char in self.chars for char in text)
+
+    def kerning(self, first, second):
+        """Pen adjustment between two characters (0.0 for most digit pairs)"""
+        pair = first + second
+        kern = self._kerning.get(pair)
+        if kern is None:
+            kern = (self.font.getlength(pair) - self._glyphs[first].advance
+                    - self._glyphs[second].advance)
+            self._kerning[pair] = kern
+        return kern
+
+    def layout(self, text):
+        """(glyph, x) for each character, x being the pen position from 0"""
+        placed = []
+        pen = 0.0
+        previous = None
+        for char in text:
+            if previous is not None:
+                pen += self.kerning(previous, char)
+            glyph = self._glyphs[char]
+            placed.append((glyph, pen))
+            pen += glyph.advance
+            previous = char
+        return placed
+
+    def draw(self, img, xy, text, fill):
+        """Draw text on img with its origin at xy, like ImageDraw.text"""
+        if not self.covers(text):
+            ImageDraw.Draw(img).text(xy, text, font=self.font, fill=fill)
+            return
+
+        x, y = xy
+        for glyph, pen in self.layout(text):
+            if glyph.mask is not None:
+                left, top = glyph.offset
+                img.paste(fill, (x + round(pen) + left, y + top), glyph.mask)
+
+
+_atlases = {}
+
+
+def atlas_for(font):
+    """Shared GlyphAtlas for font (fonts live for the whole process)"""
+    atlas = _atlases.get(font)
+    if atlas is None:
+        atlas = _atlases[font] = GlyphAtlas(font)
+        logger.debug(f"Built glyph atlas for {getattr(font, 'path', font)} "
+                     f"size {getattr(font, 'size', '?')}")
+    return atlas
+
+
+def clear():
+    """Drop all atlases, e.g. after the fonts are reconfigured"""
+    _atlases.clear()
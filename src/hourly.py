@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Compact storage for hourly forecast series
+
+HourlyForecast keeps each hourly series as a typed array (4-byte floats,
+2-byte weather codes) aligned to one array of epoch-second timestamps,
+instead of the decoded JSON lists of Python floats. Missing values are
+NaN (or -1 for weather codes).
+
+Windows are aligned to the clock: index_at() binary-searches the time
+axis for the hour containing a timestamp, so "the next 24 hours" starts
+at the current hour no matter where the API's series begins, and moves
+forward each hour without refetching. Summary stats for a window
+(min/max temperature, peak rain chance, rainy hours) and its local hour
+labels are computed once per window and cached on the object, so screens
+redrawn every minute only read ready values. A new HourlyForecast is
+built per fetch; it is never mutated afterwards except for that cache.
+"""
+
+import math
+import time
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+
+# Hours with at least this precipitation probability (%) count as rainy
+RAIN_HOUR_THRESHOLD = 30
+
+NO_CODE = -1
+
+HOUR = 3600
+
+# temperature/precipitation_probability/wind_speed/weather_code are array
+# slices for the window and hours the local hour of each entry; the stats
+# are None (or 0) when no values exist.
+ForecastWindow = namedtuple('ForecastWindow', [
+    'start', 'times', 'hours', 'temperature', 'precipitation_probability', 'wind_speed',
+    'weather_code', 'temp_min', 'temp_max', 'rain_chance', 'rain_hours'
+])
+
+
+def _floats(values, length):
+    out = array('f', (math.nan if v is None else v for v in (values or [])[:length]))
+    out.extend([math.nan] * (length - len(out)))
+    return out
+
+
+def _codes(values, length):
+    out = array('h', (NO_CODE if v is None else int(v) for v in (values or [])[:length]))
+    out.extend([NO_CODE] * (length - len(out)))
+    return out
+
+
+class HourlyForecast:
+    """Typed hourly series sharing one time axis, with cached window stats"""
+
+    def __init__(self, hourly):
+        """hourly is a normalized series dict (see weather_providers.HOURLY_FIELDS)"""
+        times = hourly.get('time') or []
+        length = len(times)
+        self.times = array('q', times)
+        self.temperature = _floats(hourly.get('temperature'), length)
+        self.precipitation_probability = _floats(hourly.get('precipitation_probability'), length)
+        self.wind_speed = _floats(hourly.get('wind_speed'), length)
+        self.weather_code = _codes(hourly.get('weather_code'), length)
+        self._windows = {}
+
+    def __len__(self):
+        return len(self.times)
+
+    def index_at(self, timestamp):
+        """
+        Index of the hour containing timestamp.
+
+        0 if the series starts later; len(self) once the series has run
+        out, so windows from there are empty rather than showing the past.
+        """
+        index = bisect_right(self.times, timestamp) - 1
+        if index < 0:
+            return 0
+        if index == len(self.times) - 1 and timestamp >= self.times[index] + HOUR:
+            return len(self.times)
+        return index
+
+    def window_at(self, timestamp, hours):
+        """ForecastWindow of up to hours entries starting at the hour containing timestamp"""
+        return self.window(self.index_at(timestamp), hours)
+
+    def window(self, start, hours):
+        """ForecastWindow for up to hours entries from index start (cached)"""
+        key = (start, hours)
+        cached = self._windows.get(key)
+        if cached is not None:
+            return cached
+
+        end = min(len(self.times), start + hours)
+        start = min(start, end)
+        temps = self.temperature[start:end]
+        precip = self.precipitation_probability[start:end]
+
+        valid_temps = [t for t in temps if not math.isnan(t)]
+        valid_precip = [p for p in precip if not math.isnan(p)]
+
+        times = self.times[start:end]
+        window = ForecastWindow(
+            start,
+            times,
+            tuple(time.localtime(t).tm_hour for t in times),
+            temps,
+            precip,
+            self.wind_speed[start:end],
+            self.weather_code[start:end],
+            min(valid_temps) if valid_temps else None,
+            max(valid_temps) if valid_temps else None,
+            round(max(valid_precip)) if valid_precip else 0,
+            sum(1 for p in valid_precip if p > RAIN_HOUR_THRESHOLD),
+        )
+        self._windows[key] = window
+        return window
+
+    def nbytes(self):
+        """Bytes held by the series arrays"""
+        return sum(a.itemsize * len(a) for a in (
+            self.times, self.temperature, self.precipitation_probability,
+            self.wind_speed, self.weather_code))
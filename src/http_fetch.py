@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Cache-aware JSON fetching over HTTP
+
+conditional_get_json() sits between a requests session and a DiskCache:
+it skips the request while the server's Cache-Control/Expires says the
+cached copy is still fresh, revalidates with If-None-Match /
+If-Modified-Since otherwise, negotiates gzip (and brotli when a decoder
+is installed), and reports how many body bytes crossed the wire.
+"""
+
+import logging
+import threading
+import time
+from collections import namedtuple
+from email.utils import parsedate_to_datetime
+from importlib.util import find_spec
+
+logger = logging.getLogger(__name__)
+
+# urllib3 decodes 'br' responses only when a brotli module is installed
+if find_spec('brotli') or find_spec('brotlicffi'):
+    ACCEPT_ENCODING = 'br, gzip, deflate'
+else:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+# status: 'fetched' (200), 'not_modified' (304) or 'fresh' (no request made)
+FetchResult = namedtuple('FetchResult', [
+    'payload', 'status', 'fetched_at', 'fresh_until', 'bytes_transferred', 'encoding'
+])
+
+
+class LazySession:
+    """
+    Stand-in for a requests.Session that is built on first use.
+
+    factory() creates the real session, so importing requests/urllib3
+    and setting up connection pools waits until the first fetch instead
+    of delaying the first frame. Safe to share between fetch threads.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                self._session = self._factory()
+            return self._session
+
+    def get(self, *args, **kwargs):
+        return self.session.get(*args, **kwargs)
+
+    def close(self):
+        """Close the session if it was ever created"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+def _http_date(value):
+    """Parse an HTTP date header into a POSIX timestamp, or None"""
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def freshness_deadline(headers, now=None):
+    """
+    Time until which a response may be reused without asking the server.
+
+    Follows Cache-Control max-age (minus Age) first, then Expires relative
+    to Date. Returns None when the response must be revalidated.
+    """
+    now = time.time() if now is None else now
+
+    directives = {}
+    for part in headers.get('Cache-Control', '').split(','):
+        name, _, value = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip().strip('"')
+
+    if 'no-store' in directives or 'no-cache' in directives:
+        return None
+
+    if 'max-age' in directives:
+        try:
+            max_age = int(directives['max-age'])
+            age = int(headers.get('Age', 0) or 0)
+        except ValueError:
+            return None
+        return now + max_age - age if max_age > age else None
+
+    expires = _http_date(headers.get('Expires'))
+    if expires is not None:
+        date = _http_date(headers.get('Date')) or now
+        lifetime = expires - date
+        return now + lifetime if lifetime > 0 else None
+
+    return None
+
+
+def conditional_get_json(session, url, cache, key, params=None, timeout=None, headers=None,
+                         force=False):
+    """
+    GET url as JSON, using the cached copy under key when possible.
+
+    headers are sent in addition to the validators and Accept-Encoding.
+    force asks the server even while the cached copy is still fresh, but
+    still sends its validators, so an unchanged document costs a 304.
+
+    Raises requests exceptions on network/HTTP errors, like session.get().
+    A 304 without a cached body to fall back on is treated as an error.
+    """
+    entry = cache.get(key)
+    now = time.time()
+
+    if not force and entry is not None and entry.fresh_until and entry.fresh_until > now:
+        logger.info(f"'{key}' still fresh for {entry.fresh_until - now:.0f}s, skipping request")
+        return FetchResult(entry.payload, 'fresh', entry.stored_at, entry.fresh_until, 0, None)
+
+    headers = {'Accept-Encoding': ACCEPT_ENCODING, **(headers or {})}
+    if entry is not None:
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+
+    response = session.get(url, params=params, headers=headers, timeout=timeout)
+    try:
+        fresh_until = freshness_deadline(response.headers, now)
+
+        if response.status_code == 304:
+            if entry is None:
+                raise ValueError(f"'{key}' got 304 Not Modified with nothing cached")
+            payload = entry.payload
+            # A 304 may omit validators; keep the ones we sent
+            validators = {
+                'ETag': response.headers.get('ETag') or entry.etag,
+                'Last-Modified': response.headers.get('Last-Modified') or entry.last_modified,
+            }
+            cache.put(key, payload, validators, fresh_until=fresh_until)
+            status = 'not_modified'
+        else:
+            response.raise_for_status()
+            payload = response.json()
+            cache.put(key, payload, response.headers, fresh_until=fresh_until)
+            status = 'fetched'
+
+        transferred = _body_bytes(response)
+        encoding = response.headers.get('Content-Encoding')
+    finally:
+        response.close()
+
+    logger.info(f"'{key}' refresh: HTTP {response.status_code}, "
+                f"{transferred / 1024:.1f} KB transferred"
+                f"{f' ({encoding})' if encoding else ''}")
+    return FetchResult(payload, status, now, fresh_until, transferred, encoding)
+
+
+def _body_bytes(response):
+    """Bytes of body read off the socket, before content decoding"""
+    raw = getattr(response, 'raw', None)
+    try:
+        return int(raw.tell())
+    except (AttributeError, TypeError, ValueError):
+        return len(response.content or b'')
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Retry and failure policy shared by the upstream HTTP clients
+
+ResilientSession wraps the requests session used for every upstream
+(weather providers, joke API) and decides when a request is worth
+making at all:
+
+- Transient failures (connection errors, timeouts, 429 and 5xx) are
+  retried with exponential backoff and jitter, honouring Retry-After.
+- Retries are paid from a RetryBudget shared by all endpoints: each
+  request earns a fraction of a retry, so during a wide outage retries
+  stay a small share of traffic instead of multiplying it.
+- Each endpoint (host) has a CircuitBreaker. After a few consecutive
+  failures it opens and requests fail immediately with CircuitOpenError,
+  without touching the network. Once the open period is over, a single
+  probe is let through (half-open): success closes the breaker, failure
+  opens it again for twice as long, up to a cap. A dead upstream thus
+  costs one request per open period.
+
+Breaker states are exported as the circuit_state gauge (0 closed,
+1 half-open, 2 open) with an endpoint label.
+"""
+
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Responses that mean "try again later" rather than "you asked wrongly"
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+metrics.describe('circuit_state',
+                 'Circuit breaker state per endpoint (0 closed, 1 half-open, 2 open)')
+metrics.describe('circuit_opens', 'Times an endpoint circuit breaker opened')
+metrics.describe('circuit_rejections', 'Requests refused without a network call by an open breaker')
+metrics.describe('http_retries', 'Upstream requests retried after a transient failure')
+metrics.describe('http_retries_denied', 'Retries skipped because the retry budget was spent')
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of making a request while an endpoint's breaker is open"""
+
+    def __init__(self, endpoint, retry_at):
+        super().__init__(f"{endpoint} unavailable, circuit open for "
+                         f"{max(0, retry_at - time.time()):.0f}s more")
+        self.endpoint = endpoint
+        self.retry_at = retry_at
+
+
+def backoff_delay(attempt, base, cap, rng=random.random):
+    """
+    Delay before retry number attempt (0-based): exponential with jitter.
+
+    The delay is between half and all of min(cap, base * 2**attempt), so
+    clients that failed together do not retry together.
+    """
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + rng() * delay / 2
+
+
+def retry_after_seconds(response):
+    """Seconds from a Retry-After header given in seconds, or None"""
+    value = response.headers.get('Retry-After')
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None  # HTTP-date form; the breaker's own timing applies
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker for one endpoint (thread-safe).
+
+    Opens after failure_threshold consecutive failures, for reset_timeout
+    seconds doubling (with jitter) on every failed probe up to
+    max_reset_timeout.
+    """
+
+    def __init__(self, endpoint, failure_threshold=3, reset_timeout=60.0,
+                 max_reset_timeout=3600.0, clock=time.time):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opens = 0
+        self.retry_at = 0.0
+        self._trips = 0  # consecutive opens without a success in between
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a request may be made now; in half-open, only one at a time"""
+        with self._lock:
+            if self.state == OPEN and self.clock() >= self.retry_at:
+                self.state = HALF_OPEN
+                self._probing = False
+                logger.info(f"Circuit for {self.endpoint} half-open, probing")
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return self.state != OPEN
+
+    def next_attempt(self):
+        """Earliest time a request will be allowed (0 if it is now)"""
+        with self._lock:
+            return self.retry_at if self.state == OPEN else 0.0
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"Circuit for {self.endpoint} closed, upstream is back")
+            self.state = CLOSED
+            self.failures = 0
+            self._trips = 0
+            self._probing = False
+
+    def record_failure(self, retry_after=None):
+        """Count a failure; retry_after (seconds) extends the open period"""
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self._open(retry_after)
+
+    def _open(self, retry_after):
+        timeout = backoff_delay(self._trips, self.reset_timeout, self.max_reset_timeout)
+        if retry_after:
+            timeout = max(timeout, min(retry_after, self.max_reset_timeout))
+        self._trips += 1
+        self.state = OPEN
+        self._probing = False
+        self.retry_at = self.clock() + timeout
+        self.opens += 1
+        metrics.inc('circuit_opens', endpoint=self.endpoint)
+        logger.warning(f"Circuit for {self.endpoint} open for {timeout:.0f}s "
+                       f"after {self.failures} consecutive failures")
+
+
+class RetryBudget:
+    """
+    Token bucket limiting retries to a share of requests (thread-safe).
+
+    Every request deposits ratio tokens and every retry spends one, so in
+    the long run at most ratio retries are made per request; max_tokens
+    lets a short burst of failures still be retried in full.
+    """
+
+    def __init__(self, ratio=0.2, max_tokens=10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        """Spend one retry; False if the budget is exhausted"""
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class ResilientSession:
+    """
+    requests-style get() with retries, a retry budget and per-host breakers.
+
+    session is anything with get() and close() (a LazySession in the
+    app). Exceptions from session.get() count as endpoint failures and
+    are re-raised once retries run out; a response with a retryable
+    status is returned after the last attempt for the caller to handle.
+    """
+
+    def __init__(self, session, retries=3, backoff_base=1.0, backoff_cap=8.0,
+                 budget=None, breaker_options=None, sleep=time.sleep):
+        self.session = session
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.budget = budget or RetryBudget()
+        self.breaker_options = breaker_options or {}
+        self.sleep = sleep
+        self.breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, url):
+        """The breaker for url's endpoint (scheme and host)"""
+        parts = urlsplit(url)
+        endpoint = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            breaker = self.breakers.get(endpoint)
+            if breaker is None:
+                breaker = self.breakers[endpoint] = CircuitBreaker(endpoint, **self.breaker_options)
+            return breaker
+
+    def next_attempt(self, urls):
+        """Earliest time any of urls can be requested (0 if one can be now)"""
+        return min((self.breaker(url).next_attempt() for url in urls), default=0.0)
+
+    def states(self):
+        """[(labels, value)] for the circuit_state gauge"""
+        with self._lock:
+            breakers = list(self.breakers.values())
+        return [({'endpoint': b.endpoint}, STATE_VALUES[b.state]) for b in breakers]
+
+    def get(self, url, **kwargs):
+        breaker = self.breaker(url)
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                metrics.inc('circuit_rejections', endpoint=breaker.endpoint)
+                raise CircuitOpenError(breaker.endpoint, breaker.next_attempt())
+
+            error = response = retry_after = None
+            try:
+                response = self.session.get(url, **kwargs)
+            except Exception as e:
+                error = e
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    breaker.record_success()
+                    return response
+                retry_after = retry_after_seconds(response)
+            breaker.record_failure(retry_after)
+
+            delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            if (attempt >= self.retries or breaker.state != CLOSED
+                    or delay > self.backoff_cap or not self._spend_retry(breaker)):
+                if error is not None:
+                    raise error
+                return response
+
+            if response is not None:
+                response.close()
+            attempt += 1
+            logger.debug(f"Retry {attempt}/{self.retries} for {breaker.endpoint} "
+                         f"in {delay:.1f}s: {error or f'HTTP {response.status_code}'}")
+            self.sleep(delay)
+
+    def _spend_retry(self, breaker):
+        if self.budget.withdraw():
+            metrics.inc('http_retries', endpoint=breaker.endpoint)
+            return True
+        metrics.inc('http_retries_denied', endpoint=breaker.endpoint)
+        return False
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Static background layers for the display screens
+
+Each screen draws its invariant chrome (background fill, titles,
+separators, labels) once into a background layer. Every tick copies that
+layer and draws only the changing fields on top. A layer is rebuilt when
+the key it was built for (theme, config, day, ...) changes.
+"""
+
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LayerCache:
+    """One cached background layer per screen, rebuilt when its key changes"""
+
+    def __init__(self):
+        self._layers = {}
+        self.builds = 0
+
+    def get(self, screen, key, build):
+        """
+        Return (image, layout) for screen, calling build() if key changed.
+
+        build() returns the background image and a dict of layout values
+        (y positions etc.) the dynamic layer needs. The cached image must
+        not be drawn on; copy it first.
+        """
+        entry = self._layers.get(screen)
+        if entry is None or entry[0] != key:
+            start = time.perf_counter()
+            layer = build()
+            entry = (key, layer)
+            self._layers[screen] = entry
+            self.builds += 1
+            logger.debug(f"Built '{screen}' background in "
+                         f"{(time.perf_counter() - start) * 1000:.1f} ms")
+        return entry[1]
+
+    def clear(self):
+        """Drop all layers, e.g. after a theme change"""
+        self._layers.clear()
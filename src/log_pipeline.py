@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Non-blocking log pipeline
+
+Every logger in the process feeds one QueueHandler. Emitting a record
+only formats it and puts it on a bounded queue; a QueueListener thread
+does the slow part (the size-rotated log file on tmpfs, stderr) so the
+display loop never waits on I/O. If the listener falls behind and the
+queue fills, records are dropped and counted instead of blocking.
+
+Before a record is queued, RateLimitFilter lets through at most `burst`
+records per message key (logger, level, and the message with numbers
+masked) per `interval`; the rest are counted and the next one that gets
+through says how many were suppressed. A network outage then costs a
+handful of lines per minute instead of one per retry.
+
+RingBufferHandler keeps the most recent formatted records in memory.
+LogPipeline.dump_recent() writes them out; the app calls it on SIGUSR1
+and when it crashes, so the context before a failure survives even when
+the file has rotated. The dump file is rotated under the log file's
+size cap, keeping one older file, so repeated signals or a crash loop
+cannot fill the tmpfs.
+"""
+
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+QUEUE_SIZE = 1000
+RATE_LIMIT_KEYS = 256  # message keys tracked at once, least recent dropped first
+
+_NUMBERS = re.compile(r'\d+')
+
+
+class RateLimitFilter(logging.Filter):
+    """Pass at most burst records per message key every interval seconds"""
+
+    def __init__(self, burst=5, interval=60.0, clock=time.monotonic):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.clock = clock
+        self.suppressed = 0
+        self._windows = OrderedDict()  # key -> [window start, passed, suppressed]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(record):
+        """Records differing only in numbers (counts, ports, timings) share a key"""
+        return (record.name, record.levelno, _NUMBERS.sub('#', str(record.msg)))
+
+    def filter(self, record):
+        key = self.key(record)
+        now = self.clock()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                held_back = window[2] if window is not None else 0
+                window = self._windows[key] = [now, 0, 0]
+            else:
+                held_back = 0
+                self._windows.move_to_end(key)
+            while len(self._windows) > RATE_LIMIT_KEYS:
+                self._windows.popitem(last=False)
+
+            if window[1] >= self.burst:
+                window[2] += 1
+                self.suppressed += 1
+                return False
+            window[1] += 1
+
+        if held_back:
+            record.msg = f"{record.getMessage()} ({held_back} similar messages suppressed)"
+            record.args = None
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RingBufferHandler(logging.Handler):
+    """Keep the last capacity formatted records in memory"""
+
+    def __init__(self, capacity=500):
+        super().__init__()
+        self.records = deque(maxlen=capacity)
+
+    def emit(self, record):
+        try:
+            self.records.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def snapshot(self):
+        """The buffered lines, oldest first"""
+        with self.lock:
+            return list(self.records)
+
+
+class LogPipeline:
+    """The queue, listener thread and handlers installed by setup_logging()"""
+
+    def __init__(self, queue_handler, listener, ring, rate_limit, dump_path,
+                 dump_max_bytes=1024 * 1024):
+        self.queue_handler = queue_handler
+        self.listener = listener
+        self.ring = ring
+        self.rate_limit = rate_limit
+        self.dump_path = dump_path
+        self.dump_max_bytes = dump_max_bytes
+        self._stopped = False
+
+    @property
+    def dropped(self):
+        return self.queue_handler.dropped
+
+    @property
+    def suppressed(self):
+        return self.rate_limit.suppressed
+
+    def stop(self):
+        """Write out everything still queued and stop the listener thread"""
+        if not self._stopped:
+            self._stopped = True
+            self.listener.stop()
+
+    def flush(self, timeout=1.0):
+        """Wait up to timeout for the listener to handle everything queued so far"""
+        log_queue = self.queue_handler.queue
+        deadline = time.monotonic() + timeout
+        while log_queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+    def dump_recent(self, reason):
+        """
+        Append the ring buffer to dump_path (stderr if that fails); returns where.
+
+        If that would take dump_path past dump_max_bytes, it is first
+        moved to dump_path + '.1', replacing the previous one.
+        """
+        self.flush()
+        lines = self.ring.snapshot()
+        header = (f"=== {len(lines)} most recent log records, {reason}, "
+                  f"{time.strftime('%Y-%m-%d %H:%M:%S')} ===\n")
+        text = header + ''.join(line + '\n' for line in lines)
+        try:
+            try:
+                if os.path.getsize(self.dump_path) + len(text.encode()) > self.dump_max_bytes:
+                    os.replace(self.dump_path, self.dump_path + '.1')
+            except FileNotFoundError:
+                pass
+            with open(self.dump_path, 'a', encoding='utf-8') as f:
+                f.write(text)
+            return self.dump_path
+        except OSError:
+            sys.stderr.write(text)
+            return '<stderr>'
+
+
+def setup_logging(path, level=logging.INFO, max_bytes=1024 * 1024, backup_count=2,
+                  ring_size=500, burst=5, interval=60.0):
+    """
+    Route all logging through a queue to a rotating file and stderr.
+
+    Replaces any handlers on the root logger and returns the LogPipeline;
+    the crash dump goes to path + '.recent', capped at max_bytes too.
+    """
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler()]
+    try:
+        handlers.append(logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'))
+    except OSError as e:
+        sys.stderr.write(f"Log file {path} unavailable, logging to stderr only: {e}\n")
+    ring = RingBufferHandler(ring_size)
+    handlers.append(ring)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    queue_handler = DroppingQueueHandler(queue.Queue(QUEUE_SIZE))
+    rate_limit = RateLimitFilter(burst, interval)
+    queue_handler.addFilter(rate_limit)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(queue_handler.queue, *handlers,
+                                              respect_handler_level=True)
+    listener.start()
+    return LogPipeline(queue_handler, listener, ring, rate_limit, path + '.recent', max_bytes)
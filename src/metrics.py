@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+In-process metrics and a Prometheus text endpoint
+
+Hot paths record stage timings (fetch, parse, render, encode, present)
+and counters into the module-level `metrics` registry; gauges are read
+through callbacks when scraped. MetricsServer serves the registry in the
+Prometheus text format on a local TCP port or a Unix socket, so alerts
+can scrape the app directly instead of polling systemctl/ps.
+"""
+
+import logging
+import os
+import resource
+import socketserver
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'cerberusgo'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+STAGE_METRIC = 'stage_duration_seconds'
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(key):
+    if not key:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in key) + '}'
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters, stage timings and callback gauges.
+
+    Timings keep count, sum, max and last value per (stage, labels); max
+    is the latency high-water mark since start. Nothing here allocates
+    per observation beyond the first one for a label set.
+    """
+
+    def __init__(self, prefix=PREFIX):
+        self.prefix = prefix
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timings = {}
+        self._gauges = {}
+        self._help = {}
+
+    def describe(self, name, help_text):
+        """Set the HELP text shown for a metric"""
+        self._help[name] = help_text
+
+    def inc(self, name, value=1, **labels):
+        """Add value to the counter name{labels}"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, stage, seconds, **labels):
+        """Record one duration for stage"""
+        key = _label_key({'stage': stage, **labels})
+        with self._lock:
+            stats = self._timings.get(key)
+            if stats is None:
+                self._timings[key] = [1, seconds, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                stats[3] = seconds
+                if seconds > stats[2]:
+                    stats[2] = seconds
+
+    @contextmanager
+    def time(self, stage, **labels):
+        """Time the with-block as one observation of stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def gauge(self, name, func, help_text=None):
+        """
+        Register func() as the value of gauge name, read at scrape time.
+
+        func may also return a list of (labels dict, value) pairs, one
+        sample per label set.
+        """
+        self._gauges[name] = func
+        if help_text:
+            self.describe(name, help_text)
+
+    def counter_value(self, name, **labels):
+        with self._lock:
+            return self._counters.get((name, _label_key(labels)), 0)
+
+    def timing(self, stage, **labels):
+        """(count, sum, max, last) for stage, or None"""
+        with self._lock:
+            stats = self._timings.get(_label_key({'stage': stage, **labels}))
+            return tuple(stats) if stats else None
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            counters = dict(self._counters)
+            timings = {key: tuple(stats) for key, stats in self._timings.items()}
+
+        lines = []
+
+        def header(name, kind, suffix=''):
+            full = f"{self.prefix}_{name}{suffix}"
+            if name in self._help:
+                lines.append(f"# HELP {full} {self._help[name]}")
+            lines.append(f"# TYPE {full} {kind}")
+            return full
+
+        by_name = {}
+        for (name, key), value in counters.items():
+            by_name.setdefault(name, []).append((key, value))
+        for name in sorted(by_name):
+            full = header(name, 'counter', '_total')
+            for key, value in sorted(by_name[name]):
+                lines.append(f"{full}{_format_labels(key)} {value}")
+
+        if timings:
+            full = header(STAGE_METRIC, 'summary')
+            for key, (count, total, _, _) in sorted(timings.items()):
+                lines.append(f"{full}_count{_format_labels(key)} {count}")
+                lines.append(f"{full}_sum{_format_labels(key)} {total:.6f}")
+            full = header(f"{STAGE_METRIC}_max", 'gauge')
+            for key, (_, _, peak, _) in sorted(timings.items()):
+                lines.append(f"{full}{_format_labels(key)} {peak:.6f}")
+            full = header(f"{STAGE_METRIC}_last", 'gauge')
+            for key, (_, _, _, last) in sorted(timings.items()):
+                lines.append(f"{full}{_format_labels(key)} {last:.6f}")
+
+        for name in sorted(self._gauges):
+            try:
+                value = self._gauges[name]()
+            except Exception as e:
+                logger.debug(f"Gauge {name} unavailable: {e}")
+                continue
+            if value is None:
+                continue
+            full = header(name, 'gauge')
+            if isinstance(value, list):
+                for labels, sample in value:
+                    lines.append(f"{full}{_format_labels(_label_key(labels))} {sample}")
+            else:
+                lines.append(f"{full} {value}")
+
+        return '\n'.join(lines) + '\n'
+
+
+def rss_bytes():
+    """Current resident set size, from /proc/self/statm"""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+def peak_rss_bytes():
+    """Resident set size high-water mark (ru_maxrss is in KB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def open_fds():
+    return len(os.listdir('/proc/self/fd'))
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return round(usage.ru_utime + usage.ru_stime, 3)
+
+
+# Shared registry for the whole process
+metrics = Metrics()
+metrics.gauge('process_start_time_seconds', lambda: int(metrics.started),
+              'Unix time the process started')
+metrics.gauge('resident_memory_bytes', rss_bytes, 'Current resident set size')
+metrics.gauge('resident_memory_peak_bytes', peak_rss_bytes, 'Peak resident set size')
+metrics.gauge('open_fds', open_fds, 'Open file descriptors')
+metrics.gauge('cpu_seconds', cpu_seconds, 'User + system CPU time used')
+metrics.describe('frames_presented', 'Frames written to the display')
+metrics.describe('frames_skipped', 'Frames skipped because nothing changed')
+metrics.describe('present_failures', 'Frames the display backend failed to show')
+metrics.describe('fbi_restarts', 'fbi processes spawned by the fbi backend')
+metrics.describe('fbi_start_failures', 'fbi processes that exited right after starting')
+metrics.describe('animation_frames', 'Transition and seconds-bar frames shown')
+metrics.describe('animation_frames_dropped', 'Animation frames skipped for missing their time slot')
+metrics.describe('touch_gestures', 'Touch gestures recognized, by kind')
+metrics.describe('weather_fetch_errors', 'Failed weather fetches')
+metrics.describe('weather_refreshes', 'Weather refreshes by outcome (fetched, not_modified, fresh)')
+metrics.describe('http_bytes', 'Response body bytes received per source')
+metrics.describe(STAGE_METRIC, 'Time spent per pipeline stage')
+metrics.describe(f"{STAGE_METRIC}_max", 'Slowest observation per stage since start')
+metrics.describe(f"{STAGE_METRIC}_last", 'Most recent observation per stage')
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket peers have no (host, port)
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        logger.debug(f"metrics {self.address_string()} {format % args}")
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class MetricsServer:
+    """
+    Serve a Metrics registry over HTTP on a background thread.
+
+    listen is 'host:port' or 'unix:/path/to.sock'.
+    """
+
+    def __init__(self, listen, registry=metrics):
+        self.listen = listen
+        self.registry = registry
+        self.server = None
+        self.thread = None
+        self._socket_path = None
+
+    def start(self):
+        if self.listen.startswith('unix:'):
+            path = self.listen[len('unix:'):]
+            if os.path.exists(path):
+                os.unlink(path)  # stale socket from a previous run
+            self.server = _UnixHTTPServer(path, _MetricsHandler)
+            self._socket_path = path
+        else:
+            host, _, port = self.listen.rpartition(':')
+            self.server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), _MetricsHandler)
+            self.server.daemon_threads = True
+        self.server.registry = self.registry
+
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       name='metrics', daemon=True)
+        self.thread.start()
+        logger.info(f"Metrics endpoint listening on {self.listen}")
+
+    def stop(self):
+        if self.server is None:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        self.server = None
+        if self._socket_path:
+            try:
+                os.unlink(self._socket_path)
+            except OSError:
+                pass
+            self._socket_path = None
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Pixel packing for framebuffer output
+
+Converts PIL RGB frames into the raw layout the framebuffer expects.
+The 16-bit packer keeps one preallocated output buffer and scratch
+planes per screen size, so packing a frame does no per-pixel Python and
+no per-frame allocations beyond reading the PIL image itself.
+NumPy is used when available; otherwise PIL lookup tables are used.
+NumPy is imported when the first packer is built rather than at import
+time, since it is the slowest module to load at startup.
+"""
+
+import logging
+
+np = None  # numpy once load_numpy() has found it
+_numpy_checked = False
+
+logger = logging.getLogger(__name__)
+
+PIXEL_FORMAT_RGB565 = 'RGB565'
+PIXEL_FORMAT_BGR565 = 'BGR565'
+PIXEL_FORMAT_XRGB8888 = 'XRGB8888'
+PIXEL_FORMAT_XBGR8888 = 'XBGR8888'
+
+# 4x4 ordered-dither (Bayer) matrix, values 0..15
+BAYER_4X4 = (
+    (0, 8, 2, 10),
+    (12, 4, 14, 6),
+    (3, 11, 1, 9),
+    (15, 7, 13, 5),
+)
+
+_HIGH_RED_LUT = [v & 0xF8 for v in range(256)]
+_HIGH_GREEN_LUT = [v >> 5 for v in range(256)]
+_LOW_GREEN_LUT = [(v & 0x1C) << 3 for v in range(256)]
+_LOW_BLUE_LUT = [v >> 3 for v in range(256)]
+
+
+def load_numpy():
+    """Import numpy on first use; returns the module, or None if it is not installed"""
+    global np, _numpy_checked
+    if not _numpy_checked:
+        _numpy_checked = True
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = None
+    return np
+
+
+def pack_color(pixel_format, rgb):
+    """Raw bytes of a single pixel of color rgb in pixel_format"""
+    red, green, blue = rgb
+    if pixel_format in (PIXEL_FORMAT_BGR565, PIXEL_FORMAT_XBGR8888):
+        red, blue = blue, red
+    if pixel_format in (PIXEL_FORMAT_RGB565, PIXEL_FORMAT_BGR565):
+        value = ((red & 0xF8) << 8) | ((green & 0xFC) << 3) | (blue >> 3)
+        return value.to_bytes(2, 'little')
+    # Little-endian XRGB8888 is B, G, R, X in memory
+    return bytes((blue, green, red, 0))
+
+
+class RGB565Packer:
+    """
+    Pack PIL RGB frames into little-endian RGB565 (or BGR565).
+
+    The returned memoryview aliases the packer's own buffer and is only
+    valid until the next call to pack().
+    """
+
+    def __init__(self, width, height, bgr=False, dither=False):
+        self.width = width
+        self.height = height
+        self.bgr = bgr
+        self.dither = dither
+
+        if load_numpy() is not None:
+            self._out = np.empty((height, width), dtype='<u2')
+            self._scratch = np.empty((height, width), dtype=np.uint16)
+            if dither:
+                self._threshold_5, self._threshold_6 = self._dither_planes(width, height)
+        else:
+            self._out = bytearray(width * height * 2)
+            if dither:
+                logger.warning("Dithering needs numpy, packing without it")
+
+        self._view = memoryview(self._out).cast('B')
+
+    @staticmethod
+    def _dither_planes(width, height):
+        """Full-frame Bayer thresholds for 5-bit (0..7) and 6-bit (0..3) channels"""
+        bayer = np.array(BAYER_4X4, dtype=np.uint16)
+        tiles = np.tile(bayer, (height // 4 + 1, width // 4 + 1))[:height, :width]
+        return np.ascontiguousarray(tiles >> 1), np.ascontiguousarray(tiles >> 2)
+
+    def pack(self, img):
+        """Pack img into the preallocated buffer and return a view of it"""
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        if img.size != (self.width, self.height):
+            raise ValueError(f"Frame is {img.size[0]}x{img.size[1]}, "
+                             f"packer expects {self.width}x{self.height}")
+
+        if np is None:
+            self._pack_pil(img)
+        else:
+            self._pack_numpy(np.asarray(img))
+        return self._view
+
+    def _channel(self, rgb, index, threshold):
+        """Widen one channel into the scratch plane, dithered if enabled"""
+        scratch = self._scratch
+        if threshold is None:
+            np.copyto(scratch, rgb[:, :, index])
+        else:
+            np.add(rgb[:, :, index], threshold, out=scratch)
+            np.minimum(scratch, 255, out=scratch)
+        return scratch
+
+    def _pack_numpy(self, rgb):
+        out = self._out
+        red, blue = (2, 0) if self.bgr else (0, 2)
+        t5, t6 = (self._threshold_5, self._threshold_6) if self.dither else (None, None)
+
+        # rrrrr......... -> out
+        channel = self._channel(rgb, red, t5)
+        np.bitwise_and(channel, 0xF8, out=out)
+        np.left_shift(out, 8, out=out)
+
+        # .....gggggg.....
+        channel = self._channel(rgb, 1, t6)
+        np.bitwise_and(channel, 0xFC, out=channel)
+        np.left_shift(channel, 3, out=channel)
+        np.bitwise_or(out, channel, out=out)
+
+        # ...........bbbbb
+        channel = self._channel(rgb, blue, t5)
+        np.right_shift(channel, 3, out=channel)
+        np.bitwise_or(out, channel, out=out)
+
+    def _pack_pil(self, img):
+        from PIL import Image, ImageChops
+
+        # Low byte gggbbbbb, high byte rrrrrggg. The bit fields never
+        # overlap, so a saturating add is the same as a bitwise or.
+        r, g, b = img.split()
+        if self.bgr:
+            r, b = b, r
+        high = ImageChops.add(r.point(_HIGH_RED_LUT), g.point(_HIGH_GREEN_LUT))
+        low = ImageChops.add(g.point(_LOW_GREEN_LUT), b.point(_LOW_BLUE_LUT))
+        self._out[:] = Image.merge('LA', (low, high)).tobytes()
+
+
+class XRGB8888Packer:
+    """Pack PIL RGB frames into 32-bit XRGB8888 (or XBGR8888)"""
+
+    def __init__(self, width, height, bgr=False, dither=False):
+        self.width = width
+        self.height = height
+        # Little-endian XRGB8888 is B, G, R, X in memory
+        self._rawmode = 'RGBX' if bgr else 'BGRX'
+
+    def pack(self, img):
+        """Return the raw bytes for img"""
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        if img.size != (self.width, self.height):
+            raise ValueError(f"Frame is {img.size[0]}x{img.size[1]}, "
+                             f"packer expects {self.width}x{self.height}")
+        return img.tobytes('raw', self._rawmode)
+
+
+def create_packer(pixel_format, width, height, dither=False):
+    """Create the packer for a framebuffer pixel format"""
+    if pixel_format == PIXEL_FORMAT_RGB565:
+        return RGB565Packer(width, height, dither=dither)
+    if pixel_format == PIXEL_FORMAT_BGR565:
+        return RGB565Packer(width, height, bgr=True, dither=dither)
+    if pixel_format == PIXEL_FORMAT_XRGB8888:
+        return XRGB8888Packer(width, height)
+    if pixel_format == PIXEL_FORMAT_XBGR8888:
+        return XRGB8888Packer(width, height, bgr=True)
+    raise ValueError(f"Unsupported pixel format: {pixel_format}")
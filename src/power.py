@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Quiet-hours power profile
+
+During the configured quiet hours (e.g. 23:00-06:30) the app runs in
+quiet mode. The backlight is dimmed through sysfs, or switched off at
+0%. Only the clock screen is shown, redrawn once a minute with no
+rotation, transitions or seconds bar, and the joke is not fetched. A
+touch wakes the display into full mode for a few minutes; the end of
+the quiet hours wakes it for good.
+
+Everything here works on timestamps handed in by the caller, and
+Backlight takes the sysfs root as a parameter, so the profile can be
+driven by a simulated clock against a fake /sys/class/backlight tree.
+
+PowerProfile also keeps, per mode, the time spent, display loop
+wakeups and CPU seconds, to report averages per hour.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+FULL = 'full'
+QUIET = 'quiet'
+MODES = (FULL, QUIET)
+
+BACKLIGHT_ROOT = '/sys/class/backlight'
+FB_BLANK_UNBLANK = 0
+FB_BLANK_POWERDOWN = 4
+
+
+class QuietHours:
+    """Daily local-time window, which may wrap past midnight"""
+
+    def __init__(self, start, end):
+        self.start = start  # (hour, minute)
+        self.end = end
+
+    @classmethod
+    def parse(cls, spec):
+        """QuietHours from 'HH:MM-HH:MM' (ValueError if malformed)"""
+        try:
+            start, end = (tuple(int(part) for part in side.strip().split(':'))
+                          for side in spec.split('-'))
+            if len(start) != 2 or len(end) != 2 or start == end:
+                raise ValueError
+            for hour, minute in (start, end):
+                if not (0 <= hour < 24 and 0 <= minute < 60):
+                    raise ValueError
+        except ValueError:
+            raise ValueError(f"Bad quiet hours '{spec}', expected HH:MM-HH:MM") from None
+        return cls(start, end)
+
+    def contains(self, timestamp):
+        """True if timestamp falls inside the quiet hours"""
+        local = datetime.fromtimestamp(timestamp)
+        now = (local.hour, local.minute)
+        if self.start < self.end:
+            return self.start <= now < self.end
+        return now >= self.start or now < self.end
+
+    def next_boundary(self, timestamp):
+        """Timestamp of the next start or end of the quiet hours after timestamp"""
+        day = datetime.fromtimestamp(timestamp).replace(hour=0, minute=0, second=0,
+                                                        microsecond=0)
+        candidates = []
+        for offset in (0, 1):
+            for hour, minute in (self.start, self.end):
+                when = (day + timedelta(days=offset)).replace(hour=hour, minute=minute)
+                candidates.append(time.mktime(when.timetuple()))
+        return min(when for when in candidates if when > timestamp)
+
+    def __str__(self):
+        return f"{self.start[0]:02d}:{self.start[1]:02d}-{self.end[0]:02d}:{self.end[1]:02d}"
+
+
+class Backlight:
+    """
+    A sysfs backlight: brightness, max_brightness and (if present) bl_power.
+
+    Full brightness is max_brightness rather than whatever was found at
+    startup, which may be the dimmed level left by a process that died
+    in quiet mode. Write failures (e.g. no permission) are logged, never
+    raised.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.max_brightness = int(self._read('max_brightness'))
+
+    @classmethod
+    def find(cls, root=BACKLIGHT_ROOT, name=None):
+        """The backlight called name (default: the first one) under root, or None"""
+        try:
+            names = sorted(os.listdir(root))
+        except OSError:
+            return None
+        if name is not None:
+            names = [name] if name in names else []
+        for candidate in names:
+            try:
+                return cls(os.path.join(root, candidate))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Backlight {candidate} unusable: {e}")
+        return None
+
+    def _read(self, attribute):
+        with open(os.path.join(self.path, attribute)) as f:
+            return f.read().strip()
+
+    def _write(self, attribute, value):
+        with open(os.path.join(self.path, attribute), 'w') as f:
+            f.write(f"{value}\n")
+
+    def brightness(self):
+        return int(self._read('brightness'))
+
+    def set_level(self, fraction):
+        """Set brightness to fraction (0..1) of the maximum; 0 powers the backlight down"""
+        value = 0 if fraction <= 0 else max(1, round(fraction * self.max_brightness))
+        return self._set(value)
+
+    def restore(self):
+        """Back to full brightness"""
+        return self._set(self.max_brightness)
+
+    def _set(self, value):
+        try:
+            if os.path.exists(os.path.join(self.path, 'bl_power')):
+                self._write('bl_power', FB_BLANK_UNBLANK if value else FB_BLANK_POWERDOWN)
+            self._write('brightness', value)
+            return True
+        except OSError as e:
+            logger.warning(f"Cannot set backlight {self.path} to {value}: {e}")
+            return False
+
+
+class PowerProfile:
+    """
+    Full/quiet mode from the quiet hours and touches, with per-mode usage.
+
+    usage() returns cumulative (display loop wakeups, CPU seconds); it is
+    sampled on every mode change to attribute usage to the mode it
+    happened in. update() runs on the scheduler thread and per_hour() on
+    the metrics thread, so the accounting is done under a lock. Without
+    quiet hours the profile stays in full mode.
+    """
+
+    def __init__(self, quiet_hours=None, backlight=None, quiet_level=0.1,
+                 wake_time=120, usage=None):
+        self.quiet_hours = quiet_hours
+        self.backlight = backlight
+        self.quiet_level = quiet_level
+        self.wake_time = wake_time
+        self.usage = usage or (lambda: (0, 0.0))
+        self.mode = FULL
+        self.awake_until = 0.0
+        self.totals = {mode: [0.0, 0, 0.0] for mode in MODES}  # seconds, wakeups, CPU
+        self._since = None  # (timestamp, wakeups, CPU) when last accounted
+        self._backlight_set = False
+        self._lock = threading.Lock()
+
+    @property
+    def blanked(self):
+        """True while quiet mode has the backlight off"""
+        return self.mode == QUIET and self.quiet_level <= 0
+
+    def mode_at(self, now):
+        if (self.quiet_hours is not None and self.quiet_hours.contains(now)
+                and now >= self.awake_until):
+            return QUIET
+        return FULL
+
+    def touched(self, now):
+        """Keep the display in full mode for wake_time after a touch in quiet hours"""
+        if self.quiet_hours is not None and self.quiet_hours.contains(now):
+            self.awake_until = now + self.wake_time
+
+    def next_change(self, now):
+        """When the mode may change next on its own, or None without quiet hours"""
+        if self.quiet_hours is None:
+            return None
+        boundary = self.quiet_hours.next_boundary(now)
+        if self.awake_until > now:
+            return min(boundary, self.awake_until)
+        return boundary
+
+    def update(self, now):
+        """
+        Switch to the mode for now; returns True if it changed.
+
+        The first call also sets the backlight for the current mode, so a
+        display left dimmed by an earlier run is brought back up.
+        """
+        with self._lock:
+            self._account(now)
+            mode = self.mode_at(now)
+            changed = mode != self.mode
+            self.mode = mode
+        if self.backlight is not None and (changed or not self._backlight_set):
+            self._backlight_set = True
+            if mode == QUIET:
+                self.backlight.set_level(self.quiet_level)
+            else:
+                self.backlight.restore()
+        return changed
+
+    def _account(self, now):
+        """Add usage since the last call to the current mode (hold _lock)"""
+        wakeups, cpu = self.usage()
+        if self._since is not None:
+            since, since_wakeups, since_cpu = self._since
+            totals = self.totals[self.mode]
+            totals[0] += now - since
+            totals[1] += wakeups - since_wakeups
+            totals[2] += cpu - since_cpu
+        self._since = (now, wakeups, cpu)
+
+    def per_hour(self, mode, now=None):
+        """(hours, wakeups per hour, CPU seconds per hour) spent in mode so far"""
+        with self._lock:
+            if now is not None:
+                self._account(now)
+            seconds, wakeups, cpu = self.totals[mode]
+        hours = seconds / 3600
+        if hours <= 0:
+            return 0.0, None, None
+        return hours, wakeups / hours, cpu / hours
+
+    def restore(self):
+        """Put the backlight back to full brightness (on exit)"""
+        if self.backlight is not None:
+            self.backlight.restore()
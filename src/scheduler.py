@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Deadline scheduler for the display loop
+
+Timers live in a heap ordered by due time. run_once() sleeps until the
+earliest deadline, or until another thread posts an event, then runs
+whatever is due. Nothing wakes up in between, so an idle display costs
+one wakeup per deadline instead of one per second.
+
+Deadlines are kept on the monotonic clock, so NTP stepping the wall
+clock (common on a Pi without an RTC) does not move them. Timers that
+belong to a wall-clock moment (the next minute, hour or quiet-hours
+change) are armed with call_at_wall(); when the wall clock steps they
+fall due at once, and their callbacks re-arm from the new time.
+
+The sleep is a select() on a self-pipe. post() and wake() write a byte
+to it from any thread, and it is the signal module's wakeup fd, so a
+signal handled with on_signal() ends the sleep and its callback runs on
+the loop, never inside the handler.
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import select
+import signal
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on a single sleep, so a wall-clock step is noticed (and the
+# wall-aligned timers re-armed) within this long even on an idle loop
+MAX_WAIT = 60.0
+
+# Change in the wall clock's offset from the monotonic clock that counts
+# as a step rather than NTP slewing it
+CLOCK_STEP = 1.0
+
+
+class Scheduler:
+    """
+    Named one-shot timers plus a thread-safe event queue.
+
+    Scheduling a timer under a name that is already pending replaces it.
+    Callbacks run on the thread calling run_once() and receive no
+    arguments; they reschedule themselves if they need to repeat.
+    Times passed to call_at() and returned by clock(), due() and
+    next_deadline() are on clock; call_at_wall() takes wall_clock times.
+    """
+
+    def __init__(self, clock=time.monotonic, wall_clock=time.time, max_wait=MAX_WAIT):
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.max_wait = max_wait
+        self._offset = wall_clock() - clock()
+        self._heap = []
+        self._timers = {}
+        self._counter = itertools.count()
+        self._events = deque()
+        self._signals = {}
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_read, False)
+        os.set_blocking(self._wake_write, False)
+        self.wakeups = 0
+
+    def call_at(self, when, name, callback, wall=False):
+        """Run callback at time when on clock, replacing any timer called name"""
+        self.cancel(name)
+        entry = [when, next(self._counter), name, callback, wall]
+        self._timers[name] = entry
+        heapq.heappush(self._heap, entry)
+
+    def call_at_wall(self, when, name, callback):
+        """
+        Run callback at wall-clock time when, or as soon as the wall clock
+        steps, whichever comes first
+        """
+        self.call_at(self.clock() + when - self.wall_clock(), name, callback, wall=True)
+
+    def call_later(self, delay, name, callback):
+        """Run callback delay seconds from now"""
+        self.call_at(self.clock() + delay, name, callback)
+
+    def cancel(self, name):
+        """Cancel the pending timer called name, if any"""
+        entry = self._timers.pop(name, None)
+        if entry is not None:
+            entry[3] = None
+
+    def due(self, name):
+        """Due time of the pending timer called name, or None"""
+        entry = self._timers.get(name)
+        return entry[0] if entry else None
+
+    def post(self, name, callback):
+        """Queue callback to run on the scheduler thread as soon as possible (thread-safe)"""
+        self._events.append((name, callback))
+        self.wake()
+
+    def on_signal(self, signum, name, callback):
+        """
+        Run callback on the scheduler thread when signal signum arrives.
+
+        The Python-level handler does nothing: the signal module writes
+        the signal number to the wakeup pipe and run_once() dispatches it,
+        so no lock is taken in signal context. Main thread only.
+        """
+        self._signals[signum] = (name, callback)
+        signal.set_wakeup_fd(self._wake_write, warn_on_full_buffer=False)
+        signal.signal(signum, lambda signum, frame: None)
+
+    def next_deadline(self):
+        """Earliest pending due time, or None"""
+        self._drop_cancelled()
+        return self._heap[0][0] if self._heap else None
+
+    def _drop_cancelled(self):
+        while self._heap and self._heap[0][3] is None:
+            heapq.heappop(self._heap)
+
+    def run_once(self):
+        """Sleep until the next deadline or event, run everything due, return the names run"""
+        deadline = self.next_deadline()
+        timeout = self.max_wait
+        if deadline is not None:
+            timeout = min(max(deadline - self.clock(), 0), self.max_wait)
+
+        if not self._events and timeout > 0:
+            select.select([self._wake_read], [], [], timeout)
+        signals = self._read_wakeups()
+        self.wakeups += 1
+        self._check_wall_clock()
+
+        ran = []
+        for signum in signals:
+            if signum in self._signals:
+                name, callback = self._signals[signum]
+                self._run(name, callback)
+                ran.append(name)
+        while self._events:
+            name, callback = self._events.popleft()
+            self._run(name, callback)
+            ran.append(name)
+
+        now = self.clock()
+        while True:
+            self._drop_cancelled()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            entry = heapq.heappop(self._heap)
+            name, callback = entry[2], entry[3]
+            if self._timers.get(name) is entry:
+                del self._timers[name]
+            self._run(name, callback)
+            ran.append(name)
+
+        return ran
+
+    def _read_wakeups(self):
+        """Empty the wakeup pipe; return the signals in it, once each"""
+        data = b''
+        while True:
+            try:
+                chunk = os.read(self._wake_read, 512)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            data += chunk
+        return [signum for signum in dict.fromkeys(data) if signum]
+
+    def _check_wall_clock(self):
+        """On a wall-clock step, make the wall-aligned timers due now"""
+        now = self.clock()
+        offset = self.wall_clock() - now
+        step = offset - self._offset
+        self._offset = offset
+        if abs(step) < CLOCK_STEP:
+            return
+        logger.info(f"Wall clock stepped {step:+.1f}s, re-arming wall-clock timers")
+        for entry in self._heap:
+            if entry[4] and entry[3] is not None:
+                entry[0] = min(entry[0], now)
+        heapq.heapify(self._heap)
+
+    def _run(self, name, callback):
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Error in scheduled task '{name}': {e}")
+
+    def wake(self):
+        """Interrupt a sleeping run_once() (thread-safe)"""
+        try:
+            os.write(self._wake_write, b'\0')
+        except BlockingIOError:
+            pass  # pipe full, so a wakeup is pending anyway
@@ -3,7 +3,7 @@
 Simple Display Test for PiTFT 3.5"
 
 This script tests the display by showing colored rectangles and text.
-Requires: PIL (Python Imaging Library)
+Requires: PIL (Python Imaging Library), fb_output.py from the same directory
 
 Usage: python3 simple-display-test.py
 """
@@ -21,6 +21,10 @@ except ImportError:
     print("Install with: sudo apt-get install python3-pil")
     sys.exit(1)
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import pixel_format
+from fb_output import FramebufferBackend
+
 def test_display():
     """Test the PiTFT display with colors and text"""
     
@@ -31,6 +35,8 @@ def test_display():
     print("PiTFT Display Test")
     print("==================")
     print(f"Display size: {WIDTH}x{HEIGHT}")
+    has_numpy = pixel_format.load_numpy() is not None
+    print(f"numpy packing: {'yes' if has_numpy else 'no (PIL fallback)'}")
     print()
     
     # Create blank image
@@ -81,10 +87,13 @@ def test_display():
     # Line
     draw.line([290, HEIGHT // 2 + 100, 390, HEIGHT - 20], fill='red', width=3)
     
-    # Save to framebuffer
+    # Pack and write to framebuffer
     print("Displaying on PiTFT...")
     try:
-        image.save('/dev/fb1')
+        backend = FramebufferBackend('/dev/fb1')
+        if not backend.present(image):
+            raise RuntimeError("could not write to /dev/fb1 (see log above)")
+        print(f"  Framebuffer: {backend.info}")
         print("✓ Image displayed successfully!")
         print()
         print("The display should now show:")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Startup phase timing
+
+The app marks the end of each startup phase (imports, module setup,
+display open, placeholder, fonts, cached data, first frame) on the
+module-level `profile`. Phases are measured from the moment the process
+started, read from /proc, so interpreter start-up is included and
+time-to-first-frame can be tracked across releases.
+"""
+
+import os
+import time
+
+
+def process_start_time():
+    """Wall-clock time this process started, or None if /proc is unavailable"""
+    try:
+        with open('/proc/self/stat') as f:
+            # Fields after the parenthesised command name; starttime is field 22
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + int(fields[19]) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupProfile:
+    """Named startup phases and how long each took"""
+
+    def __init__(self):
+        now = time.time()
+        self.started = process_start_time() or now
+        self.phases = []
+        self.finished = False
+        self._last = self.started
+        self.mark('interpreter')
+
+    def mark(self, phase):
+        """End phase now"""
+        now = time.time()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def finish(self, phase):
+        """End the last phase; later calls are ignored"""
+        if not self.finished:
+            self.mark(phase)
+            self.finished = True
+
+    def elapsed(self):
+        """Seconds from process start to the last mark"""
+        return self._last - self.started
+
+    def report(self):
+        """Phase breakdown as text"""
+        lines = [f"{'phase':<16} {'ms':>8} {'total ms':>9}"]
+        total = 0.0
+        for phase, seconds in self.phases:
+            total += seconds
+            lines.append(f"{phase:<16} {seconds * 1000:8.1f} {total * 1000:9.1f}")
+        return '\n'.join(lines)
+
+
+# Created when the app starts importing; imported first for that reason
+profile = StartupProfile()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Text measurement and word wrapping shared by all screens
+
+measure(), advance() and wrap() are LRU-cached on (text, font[, width]),
+so text that only changes when weather, advice or jokes refresh is laid
+out once and then reused every frame. Fonts come from the shared FontRegistry and
+live for the whole process, so caching on the font object is safe.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+from PIL import Image, ImageDraw
+
+MEASURE_CACHE_SIZE = 2048
+WRAP_CACHE_SIZE = 256
+
+# How far (in pixels per point of font size) a line's summed word
+# advances may be from its real width; lines closer than this to the
+# wrap width are measured exactly. DEFAULT_SLACK is for bitmap fonts.
+SLACK_PER_SIZE = 0.5
+DEFAULT_SLACK = 12
+
+# One wrapped line: its text, bounding box and the box's width/height
+LineBox = namedtuple('LineBox', ['text', 'bbox', 'width', 'height'])
+
+# Measuring through an ImageDraw keeps results identical to draw.textbbox
+_measure_draw = ImageDraw.Draw(Image.new('L', (1, 1)))
+
+
+@lru_cache(maxsize=MEASURE_CACHE_SIZE)
+def measure(text, font):
+    """Bounding box (left, top, right, bottom) of text drawn at (0, 0)"""
+    return _measure_draw.textbbox((0, 0), text, font=font)
+
+
+@lru_cache(maxsize=MEASURE_CACHE_SIZE)
+def advance(text, font):
+    """Horizontal advance of text: how far along the next text would start"""
+    return _measure_draw.textlength(text, font=font)
+
+
+@lru_cache(maxsize=WRAP_CACHE_SIZE)
+def wrap(text, font, max_width):
+    """
+    Greedy word wrap of text into lines no wider than max_width.
+
+    Returns a tuple of LineBox. A single word wider than max_width gets
+    a line of its own rather than being broken.
+
+    Line widths are added up from per-word advances, each measured once.
+    Only a line that comes within a few pixels of max_width is measured
+    as a whole, since the sum misses kerning and side bearings; those
+    measurements bypass the measure() cache.
+    """
+    space = advance(' ', font)
+    slack = getattr(font, 'size', DEFAULT_SLACK) * SLACK_PER_SIZE
+    lines = []
+    current = ''
+    current_width = 0.0
+
+    for word in text.split():
+        word_width = advance(word, font)
+        if not current:
+            current, current_width = word, word_width
+            continue
+        width = current_width + space + word_width
+        if abs(width - max_width) <= slack:
+            bbox = _measure_draw.textbbox((0, 0), f"{current} {word}", font=font)
+            fits = bbox[2] - bbox[0] <= max_width
+        else:
+            fits = width < max_width
+        if fits:
+            current, current_width = f"{current} {word}", width
+        else:
+            lines.append(current)
+            current, current_width = word, word_width
+
+    if current:
+        lines.append(current)
+
+    return tuple(_line_box(line, font) for line in lines)
+
+
+def _line_box(text, font):
+    bbox = measure(text, font)
+    return LineBox(text, bbox, bbox[2] - bbox[0], bbox[3] - bbox[1])
+
+
+def line_box(text, font):
+    """LineBox for a single, unwrapped line of text"""
+    return _line_box(text, font)
+
+
+def cache_info():
+    """Hit/miss statistics for the measure, advance and wrap caches"""
+    return {'measure': measure.cache_info(), 'advance': advance.cache_info(),
+            'wrap': wrap.cache_info()}
+
+
+def cache_clear():
+    """Drop all cached layouts, e.g. after the fonts are reconfigured"""
+    measure.cache_clear()
+    advance.cache_clear()
+    wrap.cache_clear()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Touchscreen gestures from the Linux evdev interface
+
+TouchReader reads struct input_event records from /dev/input/eventN on
+a daemon thread. The read blocks in the kernel until the panel reports
+something, so an untouched screen costs nothing. GestureRecognizer turns
+each touch (BTN_TOUCH down ... up) into a tap, long press or swipe in
+screen coordinates, and the reader hands it to a callback. The app's
+callback posts it to the scheduler, which wakes the display loop right
+away.
+
+A regular file is replayed with the timing recorded in its events, so a
+session captured with `cat /dev/input/event0 > touches.bin` (or built by
+write_events()) can be fed back through the same code path.
+"""
+
+import logging
+import os
+import stat
+import struct
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# struct input_event: struct timeval, __u16 type, __u16 code, __s32 value
+# (native sizes, so 24 bytes on 64-bit and 16 bytes on 32-bit Raspberry Pi OS)
+EVENT_FORMAT = 'llHHi'
+EVENT_SIZE = struct.calcsize(EVENT_FORMAT)
+
+EV_SYN = 0x00
+EV_KEY = 0x01
+EV_ABS = 0x03
+SYN_REPORT = 0
+BTN_TOUCH = 0x14a
+ABS_X = 0x00
+ABS_Y = 0x01
+ABS_MT_POSITION_X = 0x35
+ABS_MT_POSITION_Y = 0x36
+
+# Gesture thresholds, in screen pixels and seconds
+TAP_MAX_MOVE = 20
+SWIPE_MIN_MOVE = 80
+LONG_PRESS_TIME = 0.8
+
+# Same order as the xorg "Calibration" option: min x, max x, min y, max y
+DEFAULT_CALIBRATION = '3800 200 200 3800'
+
+# Event timestamps further than this from time.time() are not on the
+# wall clock (e.g. a device switched to CLOCK_MONOTONIC) and are not used
+# for Gesture.received
+MAX_CLOCK_SKEW = 5.0
+
+# kind is 'tap', 'long_press', 'swipe_left', 'swipe_right', 'swipe_up' or
+# 'swipe_down'; x/y is where the touch started, dx/dy how far it moved
+# (screen pixels), duration is from the event timestamps and received is
+# the kernel timestamp of the BTN_TOUCH release that ended the touch, so
+# latency measured from it includes the time the event waited to be read.
+Gesture = namedtuple('Gesture', ['kind', 'x', 'y', 'dx', 'dy', 'duration', 'received'])
+
+
+class Calibration:
+    """Map raw panel coordinates to screen pixels"""
+
+    def __init__(self, x_min, x_max, y_min, y_max, width, height, swap_xy=False):
+        self.x_range = (x_min, x_max)
+        self.y_range = (y_min, y_max)
+        self.width = width
+        self.height = height
+        self.swap_xy = swap_xy
+
+    @classmethod
+    def parse(cls, spec, width, height, swap_xy=False):
+        """Calibration from 'x_min x_max y_min y_max' (ValueError if malformed)"""
+        values = [int(v) for v in spec.replace(',', ' ').split()]
+        if len(values) != 4 or values[0] == values[1] or values[2] == values[3]:
+            raise ValueError(f"Bad touch calibration '{spec}'")
+        return cls(*values, width, height, swap_xy)
+
+    def to_screen(self, raw_x, raw_y):
+        if self.swap_xy:
+            raw_x, raw_y = raw_y, raw_x
+        return (_scale(raw_x, self.x_range, self.width),
+                _scale(raw_y, self.y_range, self.height))
+
+
+def _scale(value, value_range, size):
+    low, high = value_range
+    position = (value - low) * (size - 1) / (high - low)
+    return max(0, min(size - 1, round(position)))
+
+
+class GestureRecognizer:
+    """Turn a stream of evdev events into Gestures"""
+
+    def __init__(self, calibration):
+        self.calibration = calibration
+        self._raw = [None, None]
+        self._down = False
+        self._release = None  # timestamp of the BTN_TOUCH release, once seen
+        self._start = None  # (x, y, timestamp) once the first position arrives
+
+    def feed(self, ev_type, code, value, timestamp):
+        """Process one event; returns a Gesture when a touch ends, else None"""
+        if ev_type == EV_ABS:
+            if code in (ABS_X, ABS_MT_POSITION_X):
+                self._raw[0] = value
+            elif code in (ABS_Y, ABS_MT_POSITION_Y):
+                self._raw[1] = value
+        elif ev_type == EV_KEY and code == BTN_TOUCH:
+            if value:
+                self._down, self._release, self._start = True, None, None
+            elif self._down:
+                self._release = timestamp
+        elif ev_type == EV_SYN and code == SYN_REPORT:
+            return self._report(timestamp)
+        return None
+
+    def _report(self, timestamp):
+        if not self._down or None in self._raw:
+            return None
+
+        x, y = self.calibration.to_screen(*self._raw)
+        if self._start is None:
+            self._start = (x, y, timestamp)
+        if self._release is None:
+            return None
+
+        released = self._release
+        self._down, self._release = False, None
+        start_x, start_y, start_time = self._start
+        return classify(start_x, start_y, x - start_x, y - start_y, timestamp - start_time,
+                        released)
+
+
+def classify(x, y, dx, dy, duration, received=None):
+    """
+    Gesture for a touch starting at (x, y) that moved (dx, dy), or None.
+
+    received is when the touch ended (default: now).
+    """
+    distance = max(abs(dx), abs(dy))
+    if distance <= TAP_MAX_MOVE:
+        kind = 'long_press' if duration >= LONG_PRESS_TIME else 'tap'
+    elif distance < SWIPE_MIN_MOVE:
+        return None  # neither a tap nor a deliberate swipe
+    elif abs(dx) >= abs(dy):
+        kind = 'swipe_right' if dx > 0 else 'swipe_left'
+    else:
+        kind = 'swipe_down' if dy > 0 else 'swipe_up'
+    return Gesture(kind, x, y, dx, dy, duration, time.time() if received is None else received)
+
+
+def find_touch_device(proc_devices='/proc/bus/input/devices'):
+    """Event device of the first touchscreen (STMPE or anything named touch), or None"""
+    try:
+        with open(proc_devices) as f:
+            blocks = f.read().split('\n\n')
+    except OSError:
+        return None
+
+    for block in blocks:
+        name = next((line for line in block.splitlines() if line.startswith('N:')), '').lower()
+        if 'stmpe' not in name and 'touch' not in name:
+            continue
+        for line in block.splitlines():
+            if line.startswith('H:'):
+                for handler in line.split('=', 1)[-1].split():
+                    if handler.startswith('event'):
+                        return f"/dev/input/{handler}"
+    return None
+
+
+def write_events(path, events):
+    """Write (seconds, type, code, value) tuples as raw input_event records"""
+    with open(path, 'wb') as f:
+        for seconds, ev_type, code, value in events:
+            sec = int(seconds)
+            usec = int(round((seconds - sec) * 1e6))
+            f.write(struct.pack(EVENT_FORMAT, sec, usec, ev_type, code, value))
+
+
+class TouchReader:
+    """
+    Read touch events from path on a daemon thread and report gestures.
+
+    on_gesture(gesture) is called on the reader thread. Regular files are
+    replayed with their recorded timing; replay_speed > 1 replays faster.
+    A replayed gesture's received time is when its release event was due
+    in the replay, standing in for the kernel timestamp.
+    """
+
+    def __init__(self, path, calibration, on_gesture, replay_speed=1.0):
+        self.path = path
+        self.recognizer = GestureRecognizer(calibration)
+        self.on_gesture = on_gesture
+        self.replay_speed = replay_speed
+        self.thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Open the device and start reading (OSError if it cannot be opened)"""
+        fd = os.open(self.path, os.O_RDONLY)
+        replay = stat.S_ISREG(os.fstat(fd).st_mode)
+        self.thread = threading.Thread(target=self._run, args=(fd, replay),
+                                       name='touch', daemon=True)
+        self.thread.start()
+        logger.info(f"Reading touch input from {self.path}"
+                    f"{' (replay)' if replay else ''}")
+
+    def stop(self):
+        """Stop after the current read; a blocked device read ends with the process"""
+        self._stop.set()
+
+    def _run(self, fd, replay):
+        first = None
+        started = time.monotonic()
+        started_wall = time.time()
+        try:
+            with os.fdopen(fd, 'rb', buffering=0) as f:
+                while not self._stop.is_set():
+                    data = f.read(EVENT_SIZE)
+                    if len(data) < EVENT_SIZE:
+                        break  # end of a replay file, or the device went away
+                    sec, usec, ev_type, code, value = struct.unpack(EVENT_FORMAT, data)
+                    timestamp = sec + usec / 1e6
+
+                    if replay:
+                        if first is None:
+                            first = timestamp
+                        delay = started + (timestamp - first) / self.replay_speed - time.monotonic()
+                        if delay > 0 and self._stop.wait(delay):
+                            break
+
+                    gesture = self.recognizer.feed(ev_type, code, value, timestamp)
+                    if gesture is not None:
+                        if replay:
+                            received = started_wall + (gesture.received - first) / self.replay_speed
+                            gesture = gesture._replace(received=received)
+                        elif abs(time.time() - gesture.received) > MAX_CLOCK_SKEW:
+                            gesture = gesture._replace(received=time.time())
+                        logger.debug(f"Touch gesture: {gesture}")
+                        self.on_gesture(gesture)
+        except OSError as e:
+            logger.error(f"Touch input {self.path} failed: {e}")
+        logger.info(f"Touch input {self.path} closed")
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Weather providers and a normalized forecast model
+
+Each provider turns its API's response into a WeatherReport with the same
+units everywhere (°C, %, m/s, WMO weather codes, epoch-second hourly
+times), so the screens never see provider-specific JSON. fetch_reports()
+queries several providers at once, each on its own persistent thread;
+choose_report() picks the freshest, fastest answer and fills its gaps
+from the others.
+
+Raw responses are cached per provider and location through DiskCache, and
+refreshed with conditional requests (see http_fetch). Several locations
+are fetched with fetch_many(); Open-Meteo answers all of them in a single
+batched request.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from http_fetch import conditional_get_json
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+metrics.describe('weather_provider_late',
+                 'Providers left out of a refresh for answering after the others')
+
+Location = namedtuple('Location', ['name', 'latitude', 'longitude'])
+
+# Current conditions; any field may be None if the provider lacks it
+Conditions = namedtuple('Conditions', ['temperature', 'humidity', 'wind_speed', 'weather_code'])
+
+# hourly maps each HOURLY_FIELDS name to a list aligned with hourly['time'].
+# fetched_at is when the data was obtained from the provider (the cache
+# time for responses reused without a request); issued_at is the
+# provider's own update time when it reports one.
+WeatherReport = namedtuple('WeatherReport', [
+    'provider', 'title', 'location', 'fetched_at', 'issued_at',
+    'current', 'hourly', 'latency', 'fetch'
+])
+
+HOURLY_FIELDS = ('time', 'temperature', 'precipitation_probability', 'wind_speed', 'weather_code')
+
+# Reports fetched within this many seconds of the freshest one count as
+# equally fresh, and the quickest of those wins
+FRESHNESS_TOLERANCE = 300
+
+# Once one provider has answered, wait at most this long for the others
+FIRST_ANSWER_GRACE = 2.0
+
+
+class WeatherProvider:
+    """
+    Base class: subclasses set name/title/url and implement
+    request_params() and parse().
+    """
+
+    name = None
+    title = None
+    url = None
+    headers = None
+    # True if fetch_many() gets any number of locations in one request
+    batched = False
+
+    def __init__(self, session, cache, timeout=(5, 10)):
+        self.session = session
+        self.cache = cache
+        self.timeout = timeout
+
+    def cache_key(self, location):
+        return f"weather-{self.name}-{location.latitude:.4f}_{location.longitude:.4f}"
+
+    def request_params(self, location):
+        raise NotImplementedError
+
+    def parse(self, payload, location, fetched_at):
+        """Build a WeatherReport from a decoded response"""
+        raise NotImplementedError
+
+    def fetch(self, location, force=False):
+        """Fetch (or revalidate, even if still fresh with force) and parse the forecast"""
+        start = time.perf_counter()
+        result = conditional_get_json(self.session, self.url, self.cache,
+                                      self.cache_key(location),
+                                      params=self.request_params(location),
+                                      timeout=self.timeout, headers=self.headers, force=force)
+        latency = time.perf_counter() - start
+        report = self.parse(result.payload, location, result.fetched_at)
+        return report._replace(latency=latency, fetch=result)
+
+    def fetch_many(self, locations, force=False):
+        """Reports for several locations, in order (one request each by default)"""
+        return [self.fetch(location, force) for location in locations]
+
+    def load_cached(self, location, max_age=None):
+        """Report from the last response on disk, or None"""
+        entry = self.cache.get(self.cache_key(location), max_age)
+        if entry is None:
+            return None
+        try:
+            return self.parse(entry.payload, location, entry.stored_at)
+        except (KeyError, TypeError, ValueError, IndexError) as e:
+            logger.warning(f"Cached {self.name} forecast unusable: {e}")
+            return None
+
+
+class OpenMeteoProvider(WeatherProvider):
+    """api.open-meteo.com forecast API"""
+
+    name = 'open-meteo'
+    title = 'Open-Meteo'
+    url = 'https://api.open-meteo.com/v1/forecast'
+    batched = True
+
+    def request_params(self, location):
+        return {
+            'latitude': location.latitude,
+            'longitude': location.longitude,
+            'current': ('temperature_2m,relative_humidity_2m,'
+                        'wind_speed_10m,weather_code'),
+            'hourly': ('temperature_2m,precipitation_probability,'
+                       'wind_speed_10m,weather_code'),
+            # Two days so a full window from the current hour always exists
+            'forecast_days': 2,
+            'timezone': 'Europe/Oslo'
+        }
+
+    def parse(self, payload, location, fetched_at):
+        current = payload.get('current', {})
+        hourly = payload.get('hourly', {})
+        offset = payload.get('utc_offset_seconds', 0)
+
+        # Wind comes in km/h unless wind_speed_unit=ms was requested
+        current_scale = _wind_scale(payload.get('current_units', {}))
+        hourly_scale = _wind_scale(payload.get('hourly_units', {}))
+
+        wind = current.get('wind_speed_10m')
+        conditions = Conditions(
+            current.get('temperature_2m'),
+            current.get('relative_humidity_2m'),
+            wind / current_scale if wind is not None else None,
+            current.get('weather_code'),
+        )
+
+        series = {
+            'time': [_open_meteo_time(t, offset) for t in hourly.get('time', [])],
+            'temperature': hourly.get('temperature_2m', []),
+            'precipitation_probability': hourly.get('precipitation_probability', []),
+            'wind_speed': [w / hourly_scale if w is not None else None
+                           for w in hourly.get('wind_speed_10m', [])],
+            'weather_code': hourly.get('weather_code', []),
+        }
+
+        return WeatherReport(self.name, self.title, location, fetched_at, None,
+                             conditions, series, None, None)
+
+    def fetch_many(self, locations, force=False):
+        """
+        All locations in one request: Open-Meteo takes comma-separated
+        latitude/longitude lists and answers with a list of forecasts.
+
+        The batch response is revalidated under its own cache key; each
+        location's forecast is also stored under its usual key so single
+        lookups and warm starts work the same as for one location.
+        """
+        if len(locations) == 1:
+            return [self.fetch(locations[0], force)]
+
+        params = self.request_params(locations[0])
+        params['latitude'] = ','.join(str(location.latitude) for location in locations)
+        params['longitude'] = ','.join(str(location.longitude) for location in locations)
+        batch_key = 'weather-{}-batch-{}'.format(
+            self.name, '-'.join(f"{l.latitude:.4f}_{l.longitude:.4f}" for l in locations))
+
+        start = time.perf_counter()
+        result = conditional_get_json(self.session, self.url, self.cache, batch_key,
+                                      params=params, timeout=self.timeout, headers=self.headers,
+                                      force=force)
+        latency = time.perf_counter() - start
+
+        payloads = result.payload if isinstance(result.payload, list) else [result.payload]
+        if len(payloads) != len(locations):
+            raise ValueError(f"Open-Meteo returned {len(payloads)} forecasts "
+                             f"for {len(locations)} locations")
+
+        reports = []
+        for index, (location, payload) in enumerate(zip(locations, payloads)):
+            if result.status == 'fetched':
+                self.cache.put(self.cache_key(location), payload, fresh_until=result.fresh_until)
+            # Book the transfer once, on the first location
+            fetch = result if index == 0 else result._replace(bytes_transferred=0)
+            report = self.parse(payload, location, result.fetched_at)
+            reports.append(report._replace(latency=latency, fetch=fetch))
+        return reports
+
+
+class MetNorwayProvider(WeatherProvider):
+    """api.met.no Locationforecast 2.0 (yr.no), 'complete' variant"""
+
+    name = 'met-norway'
+    title = 'MET Norway'
+    url = 'https://api.met.no/weatherapi/locationforecast/2.0/complete'
+    # MET's terms require an identifying User-Agent
+    headers = {'User-Agent': 'cerberusgo/1.0 github.com/oveku/cerberusgo'}
+
+    def request_params(self, location):
+        # MET asks for at most four decimals so responses stay cacheable
+        return {
+            'lat': round(location.latitude, 4),
+            'lon': round(location.longitude, 4),
+        }
+
+    def parse(self, payload, location, fetched_at):
+        properties = payload['properties']
+        issued_at = _utc_timestamp(properties.get('meta', {}).get('updated_at'))
+
+        series = {field: [] for field in HOURLY_FIELDS}
+        conditions = None
+        hour_start = fetched_at - fetched_at % 3600
+
+        for step in properties['timeseries']:
+            next_hour = step['data'].get('next_1_hours')
+            if next_hour is None:
+                break  # the rest of the series is 6-hourly
+            when = _utc_timestamp(step['time'])
+            instant = step['data']['instant']['details']
+            code = met_symbol_to_wmo(next_hour.get('summary', {}).get('symbol_code'))
+
+            if conditions is None or when <= fetched_at:
+                humidity = instant.get('relative_humidity')
+                conditions = Conditions(instant.get('air_temperature'),
+                                        round(humidity) if humidity is not None else None,
+                                        instant.get('wind_speed'), code)
+            if when < hour_start:
+                continue
+
+            series['time'].append(when)
+            series['temperature'].append(instant.get('air_temperature'))
+            series['precipitation_probability'].append(
+                next_hour.get('details', {}).get('probability_of_precipitation'))
+            series['wind_speed'].append(instant.get('wind_speed'))
+            series['weather_code'].append(code)
+
+        if conditions is None:
+            raise ValueError("MET Norway response has no hourly steps")
+
+        return WeatherReport(self.name, self.title, location, fetched_at, issued_at,
+                             conditions, series, None, None)
+
+
+# MET symbol codes without the _day/_night/_polartwilight suffix
+MET_SKY_CODES = {'clearsky': 0, 'fair': 1, 'partlycloudy': 2, 'cloudy': 3, 'fog': 45}
+
+# (precipitation kind, showers) -> WMO code for (light, normal, heavy).
+# WMO has no plain sleet code in the set we display, so sleet reads as snow.
+MET_PRECIP_CODES = {
+    ('rain', False): (61, 63, 65),
+    ('rain', True): (80, 81, 82),
+    ('snow', False): (71, 73, 75),
+    ('snow', True): (85, 85, 86),
+}
+
+
+def met_symbol_to_wmo(symbol):
+    """WMO weather code for a MET Norway symbol_code, or None"""
+    if not symbol:
+        return None
+    base = symbol.split('_')[0]
+    if base in MET_SKY_CODES:
+        return MET_SKY_CODES[base]
+    if 'thunder' in base:
+        return 95
+
+    kind = 'rain' if 'rain' in base else 'snow'
+    intensity = 0 if base.startswith('light') else 2 if base.startswith('heavy') else 1
+    return MET_PRECIP_CODES[(kind, 'showers' in base)][intensity]
+
+
+PROVIDERS = {
+    OpenMeteoProvider.name: OpenMeteoProvider,
+    MetNorwayProvider.name: MetNorwayProvider,
+}
+
+
+def default_providers(location_count):
+    """
+    Provider names to use when none are configured: all of them for one
+    location, only the batched ones for several, so a refresh stays one
+    request per provider however many locations there are.
+    """
+    return ','.join(name for name, provider in PROVIDERS.items()
+                    if location_count == 1 or provider.batched)
+
+
+def create_provider(name, session, cache, **kwargs):
+    """Create a weather provider by name ('open-meteo' or 'met-norway')"""
+    try:
+        return PROVIDERS[name](session, cache, **kwargs)
+    except KeyError:
+        raise ValueError(f"Unknown weather provider: {name}") from None
+
+
+def _wind_scale(units):
+    return 3.6 if units.get('wind_speed_10m', 'km/h') == 'km/h' else 1.0
+
+
+def _open_meteo_time(value, utc_offset):
+    """Epoch seconds from an Open-Meteo local ISO time (or unixtime)"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    local = datetime.fromisoformat(value).replace(tzinfo=timezone(timedelta(seconds=utc_offset)))
+    return int(local.timestamp())
+
+
+def _utc_timestamp(value):
+    if not value:
+        return None
+    return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp())
+
+
+class ProviderWorkers:
+    """
+    One persistent daemon thread per provider, running its fetches.
+
+    submit() refuses a provider whose previous call is still running, so
+    a hanging upstream holds one thread and one connection, however many
+    refreshes come and go while it hangs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues = {}  # provider name -> job queue of its thread
+        self._busy = set()
+
+    def submit(self, provider, job):
+        """Queue job() on provider's thread; False if its last job is still running"""
+        with self._lock:
+            if provider.name in self._busy:
+                return False
+            self._busy.add(provider.name)
+            jobs = self._queues.get(provider.name)
+            if jobs is None:
+                jobs = self._queues[provider.name] = queue.SimpleQueue()
+                threading.Thread(target=self._run, args=(provider.name, jobs),
+                                 name=f"weather-{provider.name}", daemon=True).start()
+        jobs.put(job)
+        return True
+
+    def busy(self, provider):
+        """True while provider's last job is still running"""
+        with self._lock:
+            return provider.name in self._busy
+
+    def _run(self, name, jobs):
+        while True:
+            job = jobs.get()
+            try:
+                job()
+            finally:
+                with self._lock:
+                    self._busy.discard(name)
+
+
+workers = ProviderWorkers()
+
+
+def fetch_reports(providers, locations, deadline, grace=FIRST_ANSWER_GRACE, pool=None,
+                  force=False):
+    """
+    Fetch all locations from all providers concurrently (on pool, default
+    the shared workers); force revalidates responses that are still fresh.
+
+    Waits up to deadline seconds, but no more than grace seconds past the
+    first successful answer. Returns (reports, errors): reports maps each
+    location to the list of reports received for it, errors maps provider
+    name to the exception. A provider still running at the deadline, or
+    still busy with an earlier refresh, gets a TimeoutError. One that is
+    only cut off by the grace period lost the race, which is not an
+    error: it is counted in weather_provider_late and left out of both.
+    """
+    pool = pool or workers
+    results = queue.Queue()
+
+    def run(provider):
+        try:
+            with metrics.time('fetch', source=provider.name):
+                provider_reports = provider.fetch_many(locations, force)
+            results.put((provider, provider_reports, None))
+        except Exception as e:
+            results.put((provider, None, e))
+
+    errors = {}
+    pending = set()
+    for provider in providers:
+        if pool.submit(provider, lambda provider=provider: run(provider)):
+            pending.add(provider.name)
+        else:
+            errors[provider.name] = TimeoutError(
+                f"{provider.name} still busy with an earlier refresh")
+
+    reports = {location: [] for location in locations}
+    answered = False
+    end = time.monotonic() + deadline
+    while pending:
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            provider, provider_reports, error = results.get(timeout=remaining)
+        except queue.Empty:
+            break
+        pending.discard(provider.name)
+        if error is not None:
+            errors[provider.name] = error
+            continue
+        for location, report in zip(locations, provider_reports):
+            reports[location].append(report)
+        if not answered:
+            answered = True
+            end = min(end, time.monotonic() + grace)
+
+    for name in pending:
+        if answered:
+            logger.info(f"Weather provider {name} too slow this time, using the others")
+            metrics.inc('weather_provider_late', provider=name)
+        else:
+            errors[name] = TimeoutError(f"{name} did not answer in time")
+    return reports, errors
+
+
+def choose_report(reports, tolerance=FRESHNESS_TOLERANCE):
+    """
+    Pick the report to show and fill its gaps from the others.
+
+    The freshest report wins; reports fetched within tolerance seconds of
+    it count as equally fresh and the one with the lowest latency is used.
+    """
+    freshest = max(report.fetched_at for report in reports)
+    candidates = [r for r in reports if freshest - r.fetched_at <= tolerance]
+    primary = min(candidates, key=lambda r: r.latency if r.latency is not None else float('inf'))
+    others = sorted((r for r in reports if r is not primary), key=lambda r: -r.fetched_at)
+    return merge_reports(primary, others)
+
+
+def merge_reports(primary, others):
+    """primary with missing current fields and hourly values taken from others"""
+    current = primary.current
+    hourly = dict(primary.hourly)
+
+    for other in others:
+        if None in current:
+            current = Conditions(*(mine if mine is not None else theirs
+                                   for mine, theirs in zip(current, other.current)))
+        for field in HOURLY_FIELDS[1:]:
+            hourly[field] = _fill_series(hourly['time'], hourly.get(field), other.hourly, field)
+
+    return primary._replace(current=current, hourly=hourly)
+
+
+def _fill_series(times, values, other, field):
+    """values with None entries (or a missing series) filled in by time from other"""
+    values = list(values or [])
+    if len(values) == len(times) and None not in values:
+        return values
+
+    values.extend([None] * (len(times) - len(values)))
+    by_time = dict(zip(other.get('time', []), other.get(field, [])))
+    return [value if value is not None else by_time.get(when)
+            for when, value in zip(times, values)]